@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """
+    Página de resultados da paginação por cursor.
+
+    Pode ser iterada no template como um Page do Django. Em vez de números de página,
+    expõe os cursores da próxima página e da anterior.
+    """
+
+    def __init__(self, object_list, cursor, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.cursor = cursor or ''
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginação por cursor (keyset) em ordem decrescente de (campo de data, id).
+
+    Diferente do Paginator do Django, não executa COUNT(*) nem OFFSET: cada página
+    filtra a partir da última linha já exibida ("WHERE (data, id) < (...)") e usa o
+    índice da ordenação, mantendo o mesmo custo na primeira e na milésima página.
+    O id desempata registros com a mesma data, garantindo uma ordenação estável.
+    """
+
+    def __init__(self, queryset, per_page, date_field='data_criacao'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.date_field = date_field
+
+    # --- CURSORES ---
+
+    def _encode_cursor(self, obj, direction):
+        """Gera o cursor opaco (base64) apontando para a linha 'obj'."""
+        payload = {
+            'd': direction,
+            'v': getattr(obj, self.date_field).isoformat(),
+            'id': obj.pk,
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor):
+        """
+        Lê um cursor recebido na URL.
+
+        Returns:
+            Tupla (direção, data, id), ou None se o cursor for inválido.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value = parse_datetime(payload['v'])
+            pk = int(payload['id'])
+        except (ValueError, TypeError, KeyError):
+            return None
+
+        if value is None or payload.get('d') not in ('proxima', 'anterior'):
+            return None
+        return payload['d'], value, pk
+
+    # --- PÁGINAS ---
+
+    def get_page(self, cursor=None):
+        """
+        Retorna a página indicada pelo cursor.
+
+        Args:
+            cursor: Cursor recebido na URL. Vazio ou inválido retorna a primeira página.
+
+        Returns:
+            KeysetPage com os registros e os cursores de navegação.
+        """
+        decoded = self._decode_cursor(cursor) if cursor else None
+        field = self.date_field
+
+        if decoded is None:
+            rows = list(self.queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(
+                rows, None,
+                self._encode_cursor(rows[-1], 'proxima') if has_more else None,
+                None)
+
+        direction, value, pk = decoded
+
+        if direction == 'proxima':
+            # Linhas "depois" do cursor na ordem decrescente
+            rows = list(self.queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+            ).order_by(f'-{field}', '-pk')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_before = True
+        else:
+            # Voltando: busca em ordem crescente a partir do cursor e inverte
+            rows = list(self.queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')[:self.per_page + 1])
+            has_before = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_more = True
+
+        if not rows:
+            # Cursor apontando para além do fim (ex: registros removidos): recomeça
+            return self.get_page(None)
+
+        return KeysetPage(
+            rows, cursor,
+            self._encode_cursor(rows[-1], 'proxima') if has_more else None,
+            self._encode_cursor(rows[0], 'anterior') if has_before else None)
+
+
+def get_cached_count(queryset, timeout=None):
+    """
+    Retorna o total de registros do queryset, guardado em cache por alguns segundos.
+
+    O total é aproximado (pode estar defasado em até 'timeout' segundos), evitando
+    um COUNT(*) completo a cada página da listagem.
+
+    Args:
+        queryset: Queryset a contar. A chave do cache é derivada do seu SQL.
+        timeout: Segundos em cache (padrão: settings.LISTAGEM_CONTAGEM_CACHE_TTL).
+            Zero desativa o cache.
+
+    Returns:
+        Número de registros.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'LISTAGEM_CONTAGEM_CACHE_TTL', 60)
+    if not timeout:
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+    cache_key = f"listagem_contagem:{queryset.model._meta.label_lower}:{digest}"
+
+    total = cache.get(cache_key)
+    if total is None:
+        total = queryset.count()
+        cache.set(cache_key, total, timeout=timeout)
+    return total
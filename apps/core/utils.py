@@ -0,0 +1,39 @@
+import re
+import unicodedata
+
+
+def normalizar_texto_busca(*partes):
+    """
+    Normaliza textos para busca: sem acentos, minúsculo e apenas letras e números.
+
+    Ex: normalizar_texto_busca('São Paulo', 'PRC-2025-0001') -> 'sao paulo prc 2025 0001'
+
+    A remoção de acentos é feita aqui (e não com a função unaccent do PostgreSQL) para
+    que o texto gravado já esteja normalizado e possa ser indexado diretamente.
+
+    Args:
+        *partes: Textos a normalizar e concatenar. Valores vazios ou None são ignorados.
+
+    Returns:
+        String normalizada, com as partes separadas por espaço.
+    """
+    texto = ' '.join(str(parte) for parte in partes if parte)
+    sem_acentos = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caractere)
+    )
+    return re.sub(r'[\W_]+', ' ', sem_acentos.lower()).strip()
+
+
+def termos_busca(texto, limite=8):
+    """
+    Quebra o texto digitado pelo usuário em termos normalizados para a busca.
+
+    Args:
+        texto: Texto digitado.
+        limite: Número máximo de termos considerados.
+
+    Returns:
+        Lista de termos (sem acentos, minúsculos), na ordem em que foram digitados.
+    """
+    return normalizar_texto_busca(texto).split()[:limite]
@@ -1,3 +1,30 @@
 from django.contrib import admin
+from .models import ExecucaoRastreio, FaixaCep, RastreioEvento
 
-# Register your models here.
+
+@admin.register(FaixaCep)
+class FaixaCepAdmin(admin.ModelAdmin):
+    """Consulta da base local de CEPs importada via 'import_zipcodes'."""
+    list_display = ('cep_inicial', 'cep_final', 'logradouro',
+                    'bairro', 'cidade', 'estado', 'faixa')
+    list_filter = ('faixa', 'estado')
+    search_fields = ('cep_inicial', 'logradouro', 'cidade')
+
+
+@admin.register(RastreioEvento)
+class RastreioEventoAdmin(admin.ModelAdmin):
+    """Eventos estruturados recebidos da API SRO (somente consulta)."""
+    list_display = ('processo', 'codigo', 'tipo',
+                    'data_hora', 'descricao', 'cidade', 'uf')
+    list_filter = ('codigo',)
+    search_fields = ('processo__codigo', 'processo__codigo_rastreio')
+    readonly_fields = [field.name for field in RastreioEvento._meta.fields]
+
+
+@admin.register(ExecucaoRastreio)
+class ExecucaoRastreioAdmin(admin.ModelAdmin):
+    """Checkpoints das execuções do comando update_tracking (somente consulta)."""
+    list_display = ('run_id', 'shard', 'ultimo_pk', 'processados', 'atualizados',
+                    'falhas', 'iniciado_em', 'finalizado_em')
+    list_filter = ('shard',)
+    readonly_fields = [field.name for field in ExecucaoRastreio._meta.fields]
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache em memória (por processo) com descarte LRU e expiração por item.
+
+    Usado como primeira camada de cache para consultas repetidas à API dos Correios,
+    respondendo em microssegundos sem acessar o cache compartilhado do Django.
+    É seguro para uso entre threads (gunicorn com threads, pools do update_tracking).
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Retorna o valor armazenado para a chave, se existir e não estiver expirado.
+
+        Args:
+            key: Chave procurada.
+            default: Valor retornado quando a chave não existe ou expirou.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return default
+
+            # Marca o item como usado recentemente
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        """
+        Armazena um valor por 'timeout' segundos, descartando o item menos usado se cheio.
+        """
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + timeout)
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a chave do cache, se existir."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Remove todos os itens do cache."""
+        with self._lock:
+            self._items.clear()
@@ -1,118 +1,922 @@
+import hashlib
+import json
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from apps.samples.models import Processo, EventoTimeline
+from .models import RastreioEvento
+from .resilience import PRIORITY_BACKGROUND, CircuitBreaker, CorreiosIndisponivelError
 from .services import CorreiosService
 
+# ==============================================================================
+# BLOCO 1: RASTREAMENTO
+# ==============================================================================
+
 
-def update_process_tracking(processo):
+def update_process_tracking(processo, tracking_data=None):
     """
     Função principal (CORE) para atualização de rastreamento de um processo.
 
     O fluxo de execução é:
-    1. Consulta API dos Correios (track_object).
-    2. Compara eventos recebidos com a Timeline existente no banco (SGA).
-    3. Atualiza o Status do Processo se houver entrega ou devolução.
-    4. Retorna um booleano indicando se houve alterações.
+    1. Consulta API dos Correios (track_object), caso os dados não tenham sido informados.
+       A consulta é incremental: primeiro só o último evento; o histórico completo é
+       buscado apenas se ele for diferente do último evento já gravado.
+    2. Grava os eventos recebidos em RastreioEvento (upsert idempotente por código,
+       tipo e data/hora do evento).
+    3. Projeta na Timeline (SGA) apenas os eventos realmente novos.
+    4. Atualiza o Status do Processo se houver entrega ou devolução.
+    5. Retorna um booleano indicando se houve alterações.
 
     Args:
         processo: Instância do modelo Processo que será atualizada.
+        tracking_data: (Opcional) Resposta da API SRO já obtida para este objeto.
+            Permite que a consulta HTTP seja feita fora desta função (ex: em paralelo
+            pelo comando update_tracking), deixando aqui apenas a gravação no banco.
 
     Returns:
-        True se novos eventos foram adicionados ou o status mudou, False caso contrário.
+        True se novos eventos foram adicionados à Timeline, False caso contrário.
     """
 
     # Validação inicial: se não tem código, não há o que rastrear
     if not processo.codigo_rastreio:
         return False
 
-    # Instancia o serviço e consulta a API
-    service = CorreiosService()
-    tracking_data = service.track_object(processo.codigo_rastreio)
+    # Instancia o serviço e consulta a API (apenas se os dados não vieram prontos)
+    if tracking_data is None:
+        service = CorreiosService()
+        latest_data = service.track_object(
+            processo.codigo_rastreio, resultado='U')
+        last_key = get_last_tracking_event_keys([processo]).get(processo.pk)
+
+        if not has_new_tracking_event(latest_data, last_key):
+            # Nada mudou desde a última consulta: não baixa o histórico completo
+            schedule_tracking_check(processo, latest_data)
+            return False
+
+        tracking_data = service.track_object(processo.codigo_rastreio)
+
+    # Registra a consulta e agenda a próxima conforme o estágio do objeto
+    schedule_tracking_check(processo, tracking_data)
 
     # Verifica se houve retorno válido e se há eventos na resposta
     if not tracking_data or 'eventos' not in tracking_data:
         return False
 
-    has_updates = False
-
     # Os eventos vêm da API ordenados do mais recente para o mais antigo.
     # Obtemos a lista para processamento.
     api_events_list = tracking_data.get('eventos', [])
 
+    # --- VERIFICAÇÃO DE DUPLICIDADE ---
+    # Eventos estruturados já gravados, identificados por (código, tipo, data/hora).
+    # Só eventos com chave nova são projetados: a mesma descrição pode se repetir
+    # legitimamente (ex: "Objeto saiu para entrega" após uma tentativa frustrada).
+    existing_keys = set(
+        RastreioEvento.objects.filter(
+            processo=processo
+        ).values_list('codigo', 'tipo', 'data_hora')
+    )
+
+    tracking_events = [
+        (event_data, _build_tracking_event(processo, event_data))
+        for event_data in api_events_list
+    ]
+
+    # Descrições já projetadas na Timeline, usadas apenas quando não há chave:
+    # - processos legados (rastreados antes do RastreioEvento), para não reprojetar
+    #   o histórico que já está na Timeline;
+    # - eventos sem código ou data/hora válida, que não têm chave estruturada.
+    is_legacy = not existing_keys
+    existing_descriptions = set()
+    if is_legacy or any(event is None for _, event in tracking_events):
+        existing_descriptions = set(
+            EventoTimeline.objects.filter(
+                processo=processo,
+                titulo="Rastreio Correios"
+            ).values_list('descricao', flat=True)
+        )
+
+    new_tracking_events = []
+    new_timeline_events = []
+    new_status = None
+
     # Iteramos a lista ao contrário (reversed) para inserir na timeline cronologicamente
     # (do evento mais antigo para o mais novo), mantendo a coerência histórica.
-    for event_data in reversed(api_events_list):
-
-        description = event_data.get('descricao')
-        detail = event_data.get('detalhe', '')
-
-        # Constrói o texto completo para a timeline
-        full_description_text = description
-        if detail:
-            full_description_text += f" - {detail}"
-
-        # Extrai dados da unidade/localização para enriquecer a descrição
-        unit_data = event_data.get('unidade', {})
-        if 'endereco' in unit_data:
-            address = unit_data['endereco']
-            location_info = f" ({address.get('cidade', '')}/{address.get('uf', '')})"
-            full_description_text += location_info
-
-        # --- VERIFICAÇÃO DE DUPLICIDADE ---
-        # Consulta o banco para ver se este evento específico já foi registrado
-        event_already_exists = EventoTimeline.objects.filter(
+    for event_data, tracking_event in reversed(tracking_events):
+
+        description = event_data.get('descricao') or ''
+        full_description_text = _format_timeline_description(event_data)
+
+        if tracking_event is not None:
+            if tracking_event.chave in existing_keys:
+                continue
+            # Evita duplicar eventos repetidos dentro da mesma resposta da API
+            existing_keys.add(tracking_event.chave)
+            new_tracking_events.append(tracking_event)
+
+            # Processo legado: o evento é gravado, mas não reprojetado se já estiver na Timeline
+            if is_legacy and full_description_text in existing_descriptions:
+                continue
+        else:
+            if full_description_text in existing_descriptions:
+                continue
+            existing_descriptions.add(full_description_text)
+
+        # --- MAPA DE ÍCONES E CÓDIGOS ---
+        # Define ícones visuais baseados no código do evento (tipo)
+        icon_class = "bi-truck"  # Ícone padrão (em trânsito)
+        event_code = event_data.get('codigo')
+        event_type = event_data.get('tipo')
+
+        # BDE = Baixa de Distribuição (Entrega)
+        if event_code == 'BDE' or 'entregue' in description.lower():
+            icon_class = "bi-box-seam-fill"
+        # OEC = Objeto Saiu para Entrega ao Destinatário
+        elif event_code == 'OEC':
+            icon_class = "bi-bicycle"
+        # PO = Postagem
+        elif event_code == 'PO':
+            icon_class = "bi-box"
+
+        # Prepara o novo evento na timeline do sistema (gravado em lote abaixo)
+        new_timeline_events.append(EventoTimeline(
             processo=processo,
             titulo="Rastreio Correios",
-            descricao=full_description_text
-        ).exists()
-
-        if not event_already_exists:
-            # --- MAPA DE ÍCONES E CÓDIGOS ---
-            # Define ícones visuais baseados no código do evento (tipo)
-            icon_class = "bi-truck"  # Ícone padrão (em trânsito)
-            event_code = event_data.get('codigo')
-            event_type = event_data.get('tipo')
-
-            # BDE = Baixa de Distribuição (Entrega)
-            if event_code == 'BDE' or 'entregue' in description.lower():
-                icon_class = "bi-box-seam-fill"
-            # OEC = Objeto Saiu para Entrega ao Destinatário
-            elif event_code == 'OEC':
-                icon_class = "bi-bicycle"
-            # PO = Postagem
-            elif event_code == 'PO':
-                icon_class = "bi-box"
-
-            # Registra o novo evento na timeline do sistema
-            EventoTimeline.objects.create(
-                processo=processo,
-                titulo="Rastreio Correios",
-                descricao=full_description_text,
-                icone=icon_class,
-                autor=None  # Autor é o sistema
-            )
-            has_updates = True
-
-            # --- AUTOMAÇÃO DE STATUS DO PROCESSO ---
-
-            # Caso 1: Entrega confirmada
-            # O código 'BDE' com tipo '01' indica entrega bem sucedida ao destinatário
-            if event_code == 'BDE' and event_type == '01':
-                if processo.status != 'entregue':
-                    processo.status = 'entregue'
-                    processo.save()
-
-                    # Adiciona um evento extra informando a mudança de status automática
-                    EventoTimeline.objects.create(
-                        processo=processo,
-                        titulo="Status Atualizado",
-                        descricao="Processo finalizado automaticamente via confirmação dos Correios.",
-                        icone="bi-check-circle-fill"
-                    )
-
-            # Caso 2: Devolução ou Falha na entrega
-            # Lógica baseada em texto para capturar recusas ou impossibilidades
-            elif 'não entregue' in description.lower():
-                if processo.status != 'nao_entregue':
-                    processo.status = 'nao_entregue'
-                    processo.save()
-
-    return has_updates
+            descricao=full_description_text,
+            icone=icon_class,
+            autor=None  # Autor é o sistema
+        ))
+
+        # --- AUTOMAÇÃO DE STATUS DO PROCESSO ---
+        # Apenas registramos o status resultante; como a lista é cronológica,
+        # prevalece o último evento relevante. A gravação é feita uma única vez no final.
+
+        # Caso 1: Entrega confirmada
+        # O código 'BDE' com tipo '01' indica entrega bem sucedida ao destinatário
+        if event_code == 'BDE' and event_type == '01':
+            new_status = 'entregue'
+
+        # Caso 2: Devolução ou Falha na entrega
+        # Lógica baseada em texto para capturar recusas ou impossibilidades
+        elif 'não entregue' in description.lower():
+            new_status = 'nao_entregue'
+
+    if not new_tracking_events and not new_timeline_events:
+        return False
+
+    # Eventos, status e timeline são gravados juntos: ou tudo entra, ou nada entra
+    with transaction.atomic():
+        # ignore_conflicts: se outra execução gravou o mesmo evento, a constraint única vence
+        RastreioEvento.objects.bulk_create(
+            new_tracking_events, ignore_conflicts=True)
+
+        if new_status and processo.status != new_status:
+            processo.status = new_status
+            processo.save()
+
+            if new_status == 'entregue':
+                # Adiciona um evento extra informando a mudança de status automática
+                new_timeline_events.append(EventoTimeline(
+                    processo=processo,
+                    titulo="Status Atualizado",
+                    descricao="Processo finalizado automaticamente via confirmação dos Correios.",
+                    icone="bi-check-circle-fill"
+                ))
+
+        # Grava todos os novos eventos da timeline em uma única consulta
+        EventoTimeline.objects.bulk_create(new_timeline_events)
+
+    return bool(new_timeline_events)
+
+
+# --- ATUALIZAÇÃO MANUAL (BOTÃO "ATUALIZAR RASTREIO") ---
+
+TRACKING_REFRESH_LOCK_KEY = 'correios_rastreio_atualizando'
+TRACKING_REFRESH_RESULT_KEY = 'correios_rastreio_resultado'
+# A trava expira sozinha se quem está consultando morrer no meio da consulta
+TRACKING_REFRESH_LOCK_TIMEOUT = 60
+# Tempo máximo que uma requisição aguarda a consulta em andamento de outra
+TRACKING_REFRESH_WAIT_SECONDS = 20
+
+
+def refresh_process_tracking(processo):
+    """
+    Atualização manual do rastreio de um processo, com intervalo mínimo e coalescência.
+
+    1. Se o processo foi consultado há menos de CORREIOS_RASTREIO_INTERVALO_MINIMO
+       segundos (pelo botão ou pelo update_tracking), a API não é chamada de novo.
+    2. Requisições simultâneas para o mesmo processo compartilham uma única consulta
+       (single-flight): apenas quem obtém a trava consulta a API; as demais aguardam
+       e recebem o resultado dela.
+
+    Args:
+        processo: Instância do Processo a ser atualizado.
+
+    Returns:
+        Dicionário {'atualizado': bool, 'consultado_em': datetime, 'reaproveitado': bool,
+        'em_andamento': bool}. 'em_andamento' indica que a consulta de outra requisição
+        não terminou dentro de TRACKING_REFRESH_WAIT_SECONDS.
+    """
+    min_interval = getattr(settings, 'CORREIOS_RASTREIO_INTERVALO_MINIMO', 60)
+    lock_key = f"{TRACKING_REFRESH_LOCK_KEY}:{processo.pk}"
+    result_key = f"{TRACKING_REFRESH_RESULT_KEY}:{processo.pk}"
+    requested_at = timezone.now()
+
+    # 1. Resultado recente de outra requisição (cache) ou consulta recente (banco)
+    result = cache.get(result_key)
+    if result:
+        return {**result, 'reaproveitado': True, 'em_andamento': False}
+
+    last_check = Processo.objects.filter(pk=processo.pk).values_list(
+        'ultima_consulta_rastreio', flat=True).first()
+    if last_check and (requested_at - last_check).total_seconds() < min_interval:
+        return {'atualizado': False, 'consultado_em': last_check,
+                'reaproveitado': True, 'em_andamento': False}
+
+    # 2. Single-flight: aguarda a consulta em andamento de outra requisição
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + TRACKING_REFRESH_WAIT_SECONDS
+    while not cache.add(lock_key, owner, timeout=TRACKING_REFRESH_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return {'atualizado': False, 'consultado_em': last_check,
+                    'reaproveitado': False, 'em_andamento': True}
+
+        time.sleep(0.25)
+        result = cache.get(result_key)
+        if result and result['consultado_em'] >= requested_at:
+            return {**result, 'reaproveitado': True, 'em_andamento': False}
+
+    try:
+        was_updated = update_process_tracking(processo)
+        result = {
+            'atualizado': was_updated,
+            'consultado_em': processo.ultima_consulta_rastreio or timezone.now(),
+        }
+        # Guarda o resultado durante o intervalo mínimo para as próximas requisições
+        cache.set(result_key, result, timeout=min_interval)
+        return {**result, 'reaproveitado': False, 'em_andamento': False}
+    finally:
+        if cache.get(lock_key) == owner:
+            cache.delete(lock_key)
+
+
+# --- CONSULTA INCREMENTAL ---
+
+def get_last_tracking_event_keys(processos):
+    """
+    Retorna a chave do evento de rastreio mais recente já gravado de cada processo.
+
+    Args:
+        processos: Lista de instâncias de Processo.
+
+    Returns:
+        Dicionário {processo.pk: (codigo, tipo, data_hora)}; processos sem eventos
+        gravados ficam de fora.
+    """
+    last_keys = {}
+    latest_events = RastreioEvento.objects.filter(
+        processo__in=[processo.pk for processo in processos]
+    ).order_by('processo_id', '-data_hora').values_list(
+        'processo_id', 'codigo', 'tipo', 'data_hora')
+
+    for processo_id, code, event_type, event_datetime in latest_events:
+        # O primeiro de cada processo é o mais recente (ordenação por -data_hora)
+        last_keys.setdefault(processo_id, (code, event_type, event_datetime))
+
+    return last_keys
+
+
+def has_new_tracking_event(latest_data, last_key):
+    """
+    Compara o último evento informado pela API (consulta 'resultado=U') com o último
+    evento gravado, indicando se vale a pena buscar o histórico completo.
+
+    Args:
+        latest_data: Resposta da API SRO com apenas o último evento (ou None).
+        last_key: Chave (codigo, tipo, data_hora) do último evento gravado, ou None.
+
+    Returns:
+        True se a API tem um evento diferente do último gravado.
+    """
+    events = (latest_data or {}).get('eventos') or []
+    if not events:
+        return False
+
+    latest_key = _tracking_event_key(events[0])
+    return latest_key is None or latest_key != last_key
+
+
+# --- AGENDA ADAPTATIVA DE CONSULTA ---
+# Quanto mais tempo o objeto está parado, mais espaçadas ficam as consultas.
+
+# Objeto saiu para entrega (OEC): a entrega deve acontecer nas próximas horas
+TRACKING_INTERVAL_OUT_FOR_DELIVERY = timedelta(minutes=30)
+# Objeto ainda sem eventos (ex: código cadastrado, mas ainda não postado)
+TRACKING_INTERVAL_NO_EVENTS = timedelta(hours=2)
+# Falha na consulta (API fora do ar, objeto não encontrado)
+TRACKING_INTERVAL_FAILURE = timedelta(hours=1)
+# (idade máxima do último evento, intervalo até a próxima consulta)
+TRACKING_INTERVALS_BY_EVENT_AGE = [
+    (timedelta(hours=6), timedelta(hours=1)),
+    (timedelta(days=1), timedelta(hours=2)),
+    (timedelta(days=3), timedelta(hours=4)),
+    (timedelta(days=7), timedelta(hours=12)),
+]
+# Objeto parado há mais de uma semana
+TRACKING_INTERVAL_STALLED = timedelta(hours=24)
+
+
+def get_tracking_check_interval(tracking_data, now=None):
+    """
+    Define o intervalo até a próxima consulta com base no último evento do objeto.
+
+    Args:
+        tracking_data: Resposta da API SRO para o objeto (ou None se a consulta falhou).
+        now: Data/hora de referência (padrão: agora).
+
+    Returns:
+        Um timedelta com o intervalo até a próxima consulta.
+    """
+    now = now or timezone.now()
+
+    if not tracking_data:
+        return TRACKING_INTERVAL_FAILURE
+
+    events = tracking_data.get('eventos') or []
+    if not events:
+        return TRACKING_INTERVAL_NO_EVENTS
+
+    # A API retorna os eventos do mais recente para o mais antigo
+    last_event = events[0]
+    if last_event.get('codigo') == 'OEC':
+        return TRACKING_INTERVAL_OUT_FOR_DELIVERY
+
+    last_event_time = parse_datetime(last_event.get('dtHrCriado') or '')
+    if last_event_time is None:
+        return TRACKING_INTERVAL_NO_EVENTS
+    if timezone.is_naive(last_event_time):
+        last_event_time = timezone.make_aware(last_event_time)
+
+    event_age = now - last_event_time
+    for max_age, interval in TRACKING_INTERVALS_BY_EVENT_AGE:
+        if event_age <= max_age:
+            return interval
+    return TRACKING_INTERVAL_STALLED
+
+
+def schedule_tracking_check(processo, tracking_data):
+    """
+    Registra a consulta de rastreio feita agora e agenda a próxima.
+
+    Grava diretamente com update() para não alterar 'ultima_atualizacao' do processo.
+
+    Args:
+        processo: Instância do Processo consultado.
+        tracking_data: Resposta da API SRO (ou None se a consulta falhou).
+    """
+    now = timezone.now()
+    processo.ultima_consulta_rastreio = now
+    processo.proxima_consulta_rastreio = now + \
+        get_tracking_check_interval(tracking_data, now)
+
+    Processo.objects.filter(pk=processo.pk).update(
+        ultima_consulta_rastreio=processo.ultima_consulta_rastreio,
+        proxima_consulta_rastreio=processo.proxima_consulta_rastreio,
+    )
+
+
+def _format_timeline_description(event_data):
+    """
+    Monta o texto exibido na Timeline para um evento da API SRO.
+    Ex: "Objeto em trânsito - por favor aguarde (VITORIA/ES)"
+    """
+    description = event_data.get('descricao') or ''
+    detail = event_data.get('detalhe', '')
+
+    # Constrói o texto completo para a timeline
+    full_description_text = description
+    if detail:
+        full_description_text += f" - {detail}"
+
+    # Extrai dados da unidade/localização para enriquecer a descrição
+    unit_data = event_data.get('unidade', {})
+    if 'endereco' in unit_data:
+        address = unit_data['endereco']
+        location_info = f" ({address.get('cidade', '')}/{address.get('uf', '')})"
+        full_description_text += location_info
+
+    return full_description_text
+
+
+def _tracking_event_key(event_data):
+    """
+    Retorna a chave de identidade (código, tipo, data/hora) de um evento da API SRO,
+    no mesmo formato de RastreioEvento.chave.
+
+    Returns:
+        A tupla, ou None se o evento não tiver código ou data/hora válida.
+    """
+    event_datetime = parse_datetime(event_data.get('dtHrCriado') or '')
+    if not event_data.get('codigo') or event_datetime is None:
+        return None
+
+    # A API informa horário local de Brasília, sem fuso
+    if timezone.is_naive(event_datetime):
+        event_datetime = timezone.make_aware(event_datetime)
+
+    return (event_data['codigo'], event_data.get('tipo', '') or '', event_datetime)
+
+
+def _build_tracking_event(processo, event_data):
+    """
+    Converte um evento da API SRO em uma instância (não salva) de RastreioEvento.
+
+    Returns:
+        A instância, ou None se o evento não tiver código ou data/hora válida
+        (nesse caso, a deduplicação fica apenas pela descrição na Timeline).
+    """
+    event_key = _tracking_event_key(event_data)
+    if event_key is None:
+        return None
+
+    code, event_type, event_datetime = event_key
+    address = event_data.get('unidade', {}).get('endereco', {})
+
+    return RastreioEvento(
+        processo=processo,
+        codigo=code,
+        tipo=event_type,
+        data_hora=event_datetime,
+        descricao=(event_data.get('descricao') or '')[:255],
+        detalhe=event_data.get('detalhe', '') or '',
+        cidade=address.get('cidade', '') or '',
+        uf=(address.get('uf', '') or '')[:2],
+        payload=event_data,
+    )
+
+
+# ==============================================================================
+# BLOCO 2: COTAÇÃO DE FRETE (PREÇO E PRAZO)
+# ==============================================================================
+
+# Serviços cotados por padrão na tela de detalhes do processo
+DEFAULT_SHIPPING_SERVICES = [
+    {'coProduto': '03220', 'nome': 'SEDEX'},
+    {'coProduto': '03298', 'nome': 'PAC'},
+]
+
+# Prefixo das chaves de cotação no cache (ex: 'correios_cotacao:3f2a...')
+QUOTE_CACHE_KEY = 'correios_cotacao'
+
+
+def _to_number(value):
+    """
+    Converte texto numérico para float, aceitando vírgula decimal (ex: '10,5') e
+    separador de milhar no formato brasileiro (ex: '1.234,56', como em 'pcFinal').
+    """
+    text = str(value or 0)
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    return float(text)
+
+
+def _round_up(value, step):
+    """Arredonda um valor para cima, no próximo múltiplo de 'step'."""
+    number = _to_number(value)
+    return int(math.ceil(number / step) * step) if step > 0 else int(math.ceil(number))
+
+
+def normalize_package_profile(peso, formato, comprimento, altura, largura, valor_declarado='0'):
+    """
+    Normaliza o pacote em faixas (buckets) de peso e dimensão.
+
+    Pacotes parecidos passam a ter o mesmo perfil e, portanto, a mesma cotação em cache.
+    O arredondamento é sempre para cima, então a cotação do perfil nunca fica abaixo
+    do valor real do pacote.
+
+    Args:
+        peso: Peso em gramas.
+        formato: Código do formato Correios (1=Caixa, 2=Rolo, 3=Envelope).
+        comprimento, altura, largura: Dimensões em centímetros.
+        valor_declarado: Valor declarado em reais.
+
+    Returns:
+        Dicionário com os valores já no formato de texto esperado pela API.
+
+    Raises:
+        ValueError: Se algum valor numérico for inválido.
+    """
+    cache_settings = getattr(settings, 'CORREIOS_COTACAO_CACHE', {})
+    weight_step = cache_settings.get('faixa_peso', 100)
+    dimension_step = cache_settings.get('faixa_dimensao', 5)
+
+    return {
+        'psObjeto': str(_round_up(peso, weight_step)),
+        'tpObjeto': str(formato),
+        'comprimento': str(_round_up(comprimento, dimension_step)),
+        'altura': str(_round_up(altura, dimension_step)),
+        'largura': str(_round_up(largura, dimension_step)),
+        'vlDeclarado': f"{_to_number(valor_declarado):.2f}",
+    }
+
+
+def get_quote_cache_key(cep_origem, cep_destino, perfil, servicos):
+    """Monta a chave de cache da cotação a partir da rota, do perfil e dos serviços."""
+    raw_key = json.dumps({
+        'origem': cep_origem,
+        'destino': cep_destino,
+        'perfil': perfil,
+        'servicos': sorted(servico['coProduto'] for servico in servicos),
+    }, sort_keys=True)
+    return f"{QUOTE_CACHE_KEY}:{hashlib.sha1(raw_key.encode()).hexdigest()}"
+
+
+def seconds_until_end_of_business_day():
+    """
+    Calcula quantos segundos faltam para o fim do expediente (CORREIOS_COTACAO_FIM_EXPEDIENTE).
+    Depois do expediente, a cotação vale até a meia-noite.
+    """
+    now = timezone.localtime()
+    end_hour, end_minute = map(
+        int, getattr(settings, 'CORREIOS_COTACAO_FIM_EXPEDIENTE', '18:00').split(':'))
+
+    expires_at = now.replace(
+        hour=end_hour, minute=end_minute, second=0, microsecond=0)
+    if now >= expires_at:
+        expires_at = timezone.make_aware(
+            datetime.combine(now.date() + timedelta(days=1), dt_time.min))
+
+    return max(60, int((expires_at - now).total_seconds()))
+
+
+def get_shipping_services(codigos=None):
+    """
+    Monta a lista de serviços a cotar a partir dos códigos informados.
+
+    Args:
+        codigos: Lista de códigos de serviço (coProduto), ex: ['03220', '03298'].
+            Se vazia, usa DEFAULT_SHIPPING_SERVICES.
+
+    Returns:
+        Lista de dicionários {'coProduto', 'nome'}; códigos sem nome conhecido usam o
+        próprio código como nome.
+    """
+    if not codigos:
+        return DEFAULT_SHIPPING_SERVICES
+
+    known_names = {servico['coProduto']: servico['nome']
+                   for servico in DEFAULT_SHIPPING_SERVICES}
+    codigos = dict.fromkeys(str(codigo).strip() for codigo in codigos if str(codigo).strip())
+    return [{'coProduto': codigo, 'nome': known_names.get(codigo, codigo)} for codigo in codigos]
+
+
+def quote_shipping(service, cep_origem, cep_destino, perfil, servicos):
+    """
+    Consulta as APIs de Preço e Prazo e unifica as respostas por serviço (coProduto).
+
+    Args:
+        service: Instância de CorreiosService.
+        cep_origem, cep_destino: CEPs com 8 dígitos.
+        perfil: Pacote normalizado (ver normalize_package_profile).
+        servicos: Lista de dicionários {'coProduto', 'nome'}.
+
+    Returns:
+        Lista de opções (ver quote_shipping_batch).
+
+    Raises:
+        CorreiosIndisponivelError: Se os circuitos de Preço e de Prazo estiverem abertos.
+    """
+    return quote_shipping_batch(
+        service, cep_origem, [cep_destino], perfil, servicos)[cep_destino]
+
+
+def quote_shipping_batch(service, cep_origem, ceps_destino, perfil, servicos):
+    """
+    Cota vários destinos de uma vez, agrupando os itens (destino x serviço) em lotes.
+
+    Cada lote tem até CORREIOS_COTACAO_LOTE_MAXIMO itens ('parametrosProduto' /
+    'parametrosPrazo') e é enviado em uma única requisição às APIs de Preço e Prazo.
+    As requisições usam no máximo CORREIOS_COTACAO_CONCORRENCIA threads, para não
+    esgotar de uma vez a cota do limitador de taxa. Se uma delas falhar ou estourar
+    o tempo, as demais ainda são aproveitadas.
+
+    Rotinas em lote devem informar um 'service' com PRIORITY_BACKGROUND: assim elas
+    aguardam a cota em vez de disputá-la com as telas do sistema, e os lotes que
+    falharem são repetidos uma vez (nas telas, a resposta parcial volta na hora).
+
+    Args:
+        service: Instância de CorreiosService.
+        cep_origem: CEP de origem com 8 dígitos.
+        ceps_destino: Lista de CEPs de destino com 8 dígitos.
+        perfil: Pacote normalizado (ver normalize_package_profile).
+        servicos: Lista de dicionários {'coProduto', 'nome'}.
+
+    Returns:
+        Dicionário {cep_destino: opcoes}, onde opcoes é a lista {'servico', 'codigo',
+        'preco', 'prazo', 'entrega_prevista', 'preco_indisponivel', 'prazo_indisponivel'};
+        serviços com erro de cálculo de preço são omitidos. A lista fica vazia se as
+        duas APIs falharem para aquele destino.
+
+    Raises:
+        CorreiosIndisponivelError: Se os circuitos de Preço e de Prazo estiverem abertos.
+    """
+    # Com as duas APIs fora do ar não há cotação possível: falha sem abrir threads
+    price_breaker = CircuitBreaker('preco')
+    if price_breaker.is_open() and CircuitBreaker('prazo').is_open():
+        raise CorreiosIndisponivelError(
+            'preco', price_breaker.get_state()['reabre_em'])
+
+    data_atual = datetime.now().strftime('%d/%m/%Y')
+    ceps_destino = list(dict.fromkeys(ceps_destino))
+
+    # Um item por destino e serviço; 'nuRequisicao' identifica o item na resposta
+    itens = []
+    for cep_destino in ceps_destino:
+        for servico in servicos:
+            itens.append({
+                "coProduto": servico['coProduto'],
+                "nuRequisicao": str(len(itens) + 1),
+                "cepOrigem": cep_origem,
+                "cepDestino": cep_destino,
+                "dtEvento": data_atual
+            })
+
+    lot_size = max(1, getattr(settings, 'CORREIOS_COTACAO_LOTE_MAXIMO', 50))
+    lotes = [itens[start:start + lot_size]
+             for start in range(0, len(itens), lot_size)]
+
+    calls = []
+    for numero_lote, lote in enumerate(lotes, start=1):
+        # Payload PREÇO (Usa 'parametrosProduto', com dimensões, peso e valor)
+        calls.append((service.calculate_prices, {
+            "idLote": str(numero_lote),
+            "parametrosProduto": [{**item, **perfil} for item in lote],
+        }))
+        # Payload PRAZO (Usa 'parametrosPrazo', só precisa dos CEPs e código)
+        calls.append((service.calculate_deadlines, {
+            "idLote": str(numero_lote),
+            "parametrosPrazo": [dict(item) for item in lote],
+        }))
+
+    # Chamadas aos Serviços, em paralelo (com poucas threads) e com um orçamento de
+    # tempo proporcional ao número de rodadas necessárias
+    max_workers = max(1, getattr(settings, 'CORREIOS_COTACAO_CONCORRENCIA', 4))
+    timeout = getattr(settings, 'CORREIOS_COTACAO_TIMEOUT', 12)
+    results = _call_in_parallel(
+        *calls, timeout=timeout * math.ceil(len(calls) / max_workers),
+        max_workers=max_workers)
+
+    # Em background, repete uma vez os lotes que falharam (ex: cota do limitador
+    # esgotada), exceto quando o circuito da API já abriu: aí falharia na hora
+    failed = []
+    if service.prioridade == PRIORITY_BACKGROUND:
+        failed = [index for index, result in enumerate(results)
+                  if result is None and not CircuitBreaker(
+                      'preco' if index % 2 == 0 else 'prazo').is_open()]
+    if failed:
+        retried = _call_in_parallel(
+            *(calls[index] for index in failed),
+            timeout=timeout * math.ceil(len(failed) / max_workers),
+            max_workers=max_workers)
+        for index, result in zip(failed, retried):
+            results[index] = result
+
+    # Indexa as respostas pelo 'nuRequisicao' de cada item. Uma lista vazia (ou None,
+    # se estourou o tempo) indica que aquela API falhou para o lote inteiro.
+    mapa_precos = {}
+    mapa_prazos = {}
+    for numero_lote, lote in enumerate(lotes):
+        for mapa, resposta in ((mapa_precos, results[2 * numero_lote]),
+                               (mapa_prazos, results[2 * numero_lote + 1])):
+            if not resposta:
+                continue
+            for posicao, dados in enumerate(resposta):
+                numero = dados.get('nuRequisicao')
+                if not numero and posicao < len(lote):
+                    # Sem 'nuRequisicao' na resposta, vale a ordem dos itens enviados
+                    numero = lote[posicao]['nuRequisicao']
+                mapa[str(numero)] = dados
+
+    cotacoes = {}
+    for indice, cep_destino in enumerate(ceps_destino):
+        itens_destino = itens[indice * len(servicos):(indice + 1) * len(servicos)]
+        precos_indisponiveis = not any(
+            item['nuRequisicao'] in mapa_precos for item in itens_destino)
+        prazos_indisponiveis = not any(
+            item['nuRequisicao'] in mapa_prazos for item in itens_destino)
+
+        opcoes_formatadas = []
+        if not (precos_indisponiveis and prazos_indisponiveis):
+            for servico, item in zip(servicos, itens_destino):
+                dados_preco = mapa_precos.get(item['nuRequisicao'], {})
+                dados_prazo = mapa_prazos.get(item['nuRequisicao'], {})
+
+                # Checa erros individuais
+                erro_preco = dados_preco.get(
+                    'msgErro', '') or dados_preco.get('erro', '')
+
+                if erro_preco:
+                    continue  # Pula se deu erro no cálculo
+
+                # Resultado parcial: o lado que falhou fica como None e marcado como indisponível
+                opcoes_formatadas.append({
+                    'servico': servico['nome'],
+                    'codigo': servico['coProduto'],
+                    'preco': None if precos_indisponiveis else dados_preco.get('pcFinal', '---'),
+                    'prazo': None if prazos_indisponiveis else str(dados_prazo.get('prazoEntrega', '-')),
+                    'entrega_prevista': dados_prazo.get('dataMaxima', ''),
+                    'preco_indisponivel': precos_indisponiveis,
+                    'prazo_indisponivel': prazos_indisponiveis,
+                })
+
+        cotacoes[cep_destino] = opcoes_formatadas
+
+    return cotacoes
+
+
+def _call_in_parallel(*calls, timeout, max_workers=None):
+    """
+    Executa chamadas (função, argumento) em threads e aguarda todas dentro do mesmo prazo.
+
+    Args:
+        *calls: Tuplas (funcao, argumento).
+        timeout: Tempo máximo total, em segundos, para todas as chamadas.
+        max_workers: (Opcional) Número máximo de threads; as demais chamadas aguardam
+            na fila. Padrão: uma thread por chamada.
+
+    Returns:
+        Lista com o resultado de cada chamada, na mesma ordem. Chamadas que não
+        terminaram no prazo ou lançaram exceção retornam None.
+    """
+    def run(function, argument):
+        try:
+            return function(argument)
+        finally:
+            # Conexões de banco abertas na thread (ex: cache em banco) são fechadas aqui
+            connections.close_all()
+
+    executor = ThreadPoolExecutor(max_workers=min(len(calls), max_workers or len(calls)))
+    futures = [executor.submit(run, function, argument)
+               for function, argument in calls]
+    wait(futures, timeout=timeout)
+
+    # Não espera as threads que estouraram o prazo (elas terminam pelo timeout HTTP)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = []
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results.append(future.result())
+        else:
+            results.append(None)
+    return results
+
+
+def get_cached_shipping_quote(cep_origem, cep_destino, perfil, servicos=None):
+    """
+    Retorna a cotação da rota/perfil, usando o cache do dia quando disponível.
+
+    Cotações com resultado são guardadas até o fim do expediente, pois preço e prazo
+    para a mesma rota e pacote não mudam ao longo do dia.
+
+    Returns:
+        Tupla (opcoes, dados_cache), onde dados_cache é None para cotações novas ou
+        {'cotado_em': 'ISO 8601'} quando a resposta veio do cache.
+    """
+    return get_cached_shipping_quotes(
+        cep_origem, [cep_destino], perfil, servicos)[cep_destino]
+
+
+def get_cached_shipping_quotes(cep_origem, ceps_destino, perfil, servicos=None, service=None):
+    """
+    Versão em lote de get_cached_shipping_quote: destinos já cotados no dia vêm do
+    cache e os demais são cotados juntos, em lotes (ver quote_shipping_batch).
+
+    Args:
+        service: (Opcional) Instância de CorreiosService a reutilizar.
+
+    Returns:
+        Dicionário {cep_destino: (opcoes, dados_cache)}.
+    """
+    servicos = servicos or DEFAULT_SHIPPING_SERVICES
+    cache_keys = {
+        cep_destino: get_quote_cache_key(cep_origem, cep_destino, perfil, servicos)
+        for cep_destino in ceps_destino
+    }
+    cached_quotes = cache.get_many(list(cache_keys.values()))
+
+    cotacoes = {}
+    for cep_destino, cache_key in cache_keys.items():
+        cached_quote = cached_quotes.get(cache_key)
+        if cached_quote is not None:
+            cotacoes[cep_destino] = (
+                cached_quote['opcoes'], {'cotado_em': cached_quote['cotado_em']})
+
+    pendentes = [cep for cep in cache_keys if cep not in cotacoes]
+    if not pendentes:
+        return cotacoes
+
+    novas_cotacoes = quote_shipping_batch(
+        service or CorreiosService(), cep_origem, pendentes, perfil, servicos)
+
+    to_cache = {}
+    cotado_em = timezone.localtime().isoformat()
+    for cep_destino, opcoes in novas_cotacoes.items():
+        cotacoes[cep_destino] = (opcoes, None)
+
+        # Não guarda respostas vazias ou parciais (podem ser falhas temporárias da API)
+        is_complete = all(
+            not opcao['preco_indisponivel'] and not opcao['prazo_indisponivel']
+            for opcao in opcoes
+        )
+        if opcoes and is_complete:
+            to_cache[cache_keys[cep_destino]] = {
+                'opcoes': opcoes, 'cotado_em': cotado_em}
+
+    if to_cache:
+        cache.set_many(to_cache, timeout=seconds_until_end_of_business_day())
+
+    return cotacoes
+
+
+def compare_shipping_quotes(processos, perfil, servicos=None, service=None):
+    """
+    Monta a tabela comparativa de frete de vários processos (ex: expedição do dia).
+
+    Todos os processos usam o mesmo perfil de pacote; destinos repetidos são cotados
+    uma única vez.
+
+    Args:
+        processos: Processos a cotar (com o cliente carregado, para o CEP de destino).
+        perfil: Pacote normalizado (ver normalize_package_profile).
+        servicos: Lista de serviços {'coProduto', 'nome'} (padrão: SEDEX e PAC).
+        service: (Opcional) Instância de CorreiosService a reutilizar.
+
+    Returns:
+        Lista (na ordem dos processos) de dicionários {'processo_id', 'codigo', 'cliente',
+        'cep_destino', 'opcoes', 'mais_barato', 'mais_rapido', 'cache', 'erro'}.
+
+    Raises:
+        ValueError: Se o CEP de origem (CEP_ORIGEM_EMPRESA) não estiver configurado.
+    """
+    cep_origem = getattr(settings, 'CEP_ORIGEM_EMPRESA', None)
+    if not cep_origem:
+        raise ValueError("CEP Origem não configurado.")
+
+    destinos = {}
+    for processo in processos:
+        destinos[processo.pk] = processo.cliente.cep.replace(
+            '-', '').replace('.', '').strip()
+
+    ceps_validos = [cep for cep in destinos.values() if len(cep) == 8]
+    cotacoes = get_cached_shipping_quotes(
+        cep_origem, ceps_validos, perfil, servicos, service) if ceps_validos else {}
+
+    tabela = []
+    for processo in processos:
+        cep_destino = destinos[processo.pk]
+        linha = {
+            'processo_id': processo.pk,
+            'codigo': processo.codigo,
+            'cliente': processo.cliente.nome,
+            'cep_destino': cep_destino,
+            'opcoes': [],
+            'mais_barato': None,
+            'mais_rapido': None,
+            'cache': False,
+            'erro': None,
+        }
+
+        if len(cep_destino) != 8:
+            linha['erro'] = "CEP destino inválido."
+            tabela.append(linha)
+            continue
+
+        opcoes, dados_cache = cotacoes.get(cep_destino, ([], None))
+        linha['opcoes'] = opcoes
+        linha['cache'] = dados_cache is not None
+        if not opcoes:
+            linha['erro'] = "Serviços indisponíveis para este trecho."
+
+        # Destaques da comparação (apenas entre opções com o valor disponível)
+        com_preco = [opcao for opcao in opcoes if opcao['preco'] not in (None, '---')]
+        if com_preco:
+            linha['mais_barato'] = min(
+                com_preco, key=lambda opcao: _to_number(opcao['preco']))['servico']
+
+        com_prazo = [opcao for opcao in opcoes
+                     if opcao['prazo'] is not None and opcao['prazo'].isdigit()]
+        if com_prazo:
+            linha['mais_rapido'] = min(
+                com_prazo, key=lambda opcao: int(opcao['prazo']))['servico']
+
+        tabela.append(linha)
+
+    return tabela
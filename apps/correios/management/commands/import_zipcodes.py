@@ -0,0 +1,116 @@
+import csv
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from apps.correios.models import FaixaCep
+
+
+class Command(BaseCommand):
+    """
+    Importa para a base local (FaixaCep) um arquivo CSV de CEPs no padrão DNE dos Correios.
+
+    Uso: python manage.py import_zipcodes caminho/arquivo.csv [--delimiter ';'] [--replace]
+
+    Colunas reconhecidas no cabeçalho (sem diferenciar maiúsculas):
+    - 'cep' ou 'cep_inicial' (obrigatória) e 'cep_final' (opcional, indica faixa);
+    - 'logradouro', 'complemento', 'bairro', 'cidade' (ou 'localidade') e 'uf' (ou 'estado').
+
+    Linhas com cep_final diferente do cep_inicial são gravadas como faixas de localidade.
+    CEPs/faixas que já existem na base são mantidos como estão: para atualizá-los
+    (nova versão do DNE), importe com --replace.
+    """
+    help = 'Importa CEPs e faixas de CEP (padrão DNE) para consulta offline'
+
+    # Quantidade de registros gravados por INSERT
+    BULK_SIZE = 5000
+
+    COLUMN_ALIASES = {
+        'cep': 'cep_inicial',
+        'localidade': 'cidade',
+        'uf': 'estado',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Caminho do arquivo CSV.')
+        parser.add_argument(
+            '--delimiter', default=';', help="Separador de colunas (padrão: ';').")
+        parser.add_argument(
+            '--encoding', default='latin-1', help='Codificação do arquivo (padrão: latin-1, usada no DNE).')
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Apaga a base local antes de importar (necessário para atualizar CEPs já existentes).')
+
+    def _sanitize_zipcode(self, value):
+        """Mantém apenas os dígitos do CEP."""
+        return re.sub(r'\D', '', value or '')
+
+    def handle(self, *args, **options):
+        try:
+            csv_file = open(options['csv_path'], newline='',
+                            encoding=options['encoding'])
+        except OSError as error:
+            raise CommandError(f"Não foi possível abrir o arquivo: {error}")
+
+        read_count = 0
+        skipped_count = 0
+
+        with csv_file, transaction.atomic():
+            reader = csv.DictReader(csv_file, delimiter=options['delimiter'])
+
+            # Normaliza os nomes das colunas do cabeçalho
+            reader.fieldnames = [
+                self.COLUMN_ALIASES.get(name.strip().lower(), name.strip().lower())
+                for name in (reader.fieldnames or [])
+            ]
+            if 'cep_inicial' not in reader.fieldnames:
+                raise CommandError(
+                    "Cabeçalho inválido: a coluna 'cep' (ou 'cep_inicial') é obrigatória.")
+
+            if options['replace']:
+                FaixaCep.objects.all().delete()
+            initial_total = FaixaCep.objects.count()
+
+            pending = []
+            for row in reader:
+                start_zipcode = self._sanitize_zipcode(row.get('cep_inicial'))
+                end_zipcode = self._sanitize_zipcode(
+                    row.get('cep_final')) or start_zipcode
+
+                if len(start_zipcode) != 8 or len(end_zipcode) != 8 or end_zipcode < start_zipcode:
+                    skipped_count += 1
+                    continue
+
+                pending.append(FaixaCep(
+                    cep_inicial=start_zipcode,
+                    cep_final=end_zipcode,
+                    faixa=start_zipcode != end_zipcode,
+                    logradouro=(row.get('logradouro') or '').strip(),
+                    complemento=(row.get('complemento') or '').strip(),
+                    bairro=(row.get('bairro') or '').strip(),
+                    cidade=(row.get('cidade') or '').strip(),
+                    estado=(row.get('estado') or '').strip().upper()[:2],
+                ))
+
+                read_count += 1
+                if len(pending) >= self.BULK_SIZE:
+                    FaixaCep.objects.bulk_create(pending, ignore_conflicts=True)
+                    pending = []
+
+            if pending:
+                FaixaCep.objects.bulk_create(pending, ignore_conflicts=True)
+
+            # O ignore_conflicts não informa quantas linhas entraram: conta pela base
+            final_total = FaixaCep.objects.count()
+            imported_count = final_total - initial_total
+
+        self.stdout.write(self.style.SUCCESS(
+            f"FIM. Linhas válidas: {read_count}. Importadas: {imported_count}. "
+            f"Ignoradas (CEP inválido): {skipped_count}. Total na base local: {final_total}."
+        ))
+        existing_count = read_count - imported_count
+        if existing_count:
+            self.stdout.write(self.style.WARNING(
+                f"{existing_count} linha(s) já existiam na base (ou se repetiam no arquivo) "
+                f"e foram mantidas sem alteração. Para atualizar CEPs existentes, use --replace."
+            ))
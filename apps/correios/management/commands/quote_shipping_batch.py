@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.samples.models import Processo
+from apps.correios.logic import (
+    normalize_package_profile, get_shipping_services, compare_shipping_quotes,
+)
+from apps.correios.resilience import PRIORITY_BACKGROUND, CorreiosIndisponivelError
+from apps.correios.services import CorreiosService
+
+
+class Command(BaseCommand):
+    """
+    Cota o frete de vários processos de uma vez e imprime uma tabela comparativa.
+
+    Uso: python manage.py quote_shipping_batch [ID ...] [--prontos] --peso 500
+         [--formato 1] [--comprimento 20] [--altura 10] [--largura 15]
+         [--valor-declarado 0] [--servicos 03220,03298]
+
+    Com --prontos, cota todos os processos dos Correios prontos para envio (expedição
+    do dia). Os destinos são agrupados em lotes nas APIs de Preço e Prazo e destinos
+    repetidos são cotados uma única vez. As chamadas usam a prioridade de background
+    do limitador de taxa, cedendo a vez às telas do sistema.
+    """
+    help = 'Cota o frete de vários processos em lote e compara os serviços dos Correios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('processos', nargs='*', type=int,
+                            help='IDs dos processos a cotar.')
+        parser.add_argument('--prontos', action='store_true',
+                            help='Inclui todos os processos dos Correios prontos para envio.')
+        parser.add_argument('--servicos', default='',
+                            help='Códigos dos serviços separados por vírgula (padrão: SEDEX e PAC).')
+        parser.add_argument('--peso', required=True,
+                            help='Peso do pacote em gramas.')
+        parser.add_argument('--formato', default='1',
+                            help='Formato Correios: 1=Caixa, 2=Rolo, 3=Envelope (padrão: 1).')
+        parser.add_argument('--comprimento', default='20',
+                            help='Comprimento em cm (padrão: 20).')
+        parser.add_argument('--altura', default='10',
+                            help='Altura em cm (padrão: 10).')
+        parser.add_argument('--largura', default='15',
+                            help='Largura em cm (padrão: 15).')
+        parser.add_argument('--valor-declarado', default='0',
+                            help='Valor declarado em reais (padrão: 0).')
+
+    def handle(self, *args, **options):
+        try:
+            perfil = normalize_package_profile(
+                options['peso'], options['formato'], options['comprimento'],
+                options['altura'], options['largura'], options['valor_declarado'])
+        except (TypeError, ValueError):
+            raise CommandError("Peso, dimensões ou valor inválidos.")
+
+        processos = Processo.objects.select_related('cliente')
+        if options['prontos']:
+            processos = processos.filter(
+                tipo_transporte='correios', status='pronto_envio')
+            if options['processos']:
+                processos = processos | Processo.objects.select_related(
+                    'cliente').filter(pk__in=options['processos'])
+        elif options['processos']:
+            processos = processos.filter(pk__in=options['processos'])
+        else:
+            raise CommandError("Informe os IDs dos processos ou use --prontos.")
+
+        processos = list(processos.order_by('pk'))
+        if not processos:
+            self.stdout.write("Nenhum processo para cotar.")
+            return
+
+        servicos = get_shipping_services(
+            [codigo for codigo in options['servicos'].split(',') if codigo.strip()])
+        self.stdout.write(
+            f"Cotando {len(processos)} processo(s) em "
+            f"{', '.join(servico['nome'] for servico in servicos)}...")
+
+        try:
+            tabela = compare_shipping_quotes(
+                processos, perfil, servicos,
+                service=CorreiosService(prioridade=PRIORITY_BACKGROUND))
+        except (CorreiosIndisponivelError, ValueError) as error:
+            raise CommandError(str(error))
+
+        # --- TABELA COMPARATIVA ---
+        header = ['Processo', 'Cliente', 'CEP'] + \
+            [servico['nome'] for servico in servicos] + ['Mais barato', 'Mais rápido']
+        rows = [header]
+        for linha in tabela:
+            opcoes = {opcao['codigo']: opcao for opcao in linha['opcoes']}
+            colunas = [linha['codigo'], linha['cliente'][:30], linha['cep_destino']]
+            for servico in servicos:
+                colunas.append(self._format_option(opcoes.get(servico['coProduto'])))
+            colunas += [linha['mais_barato'] or '-', linha['mais_rapido'] or '-']
+            if linha['erro']:
+                colunas[-1] = f"{colunas[-1]} ({linha['erro']})"
+            rows.append(colunas)
+
+        widths = [max(len(str(row[index])) for row in rows)
+                  for index in range(len(header))]
+        for row in rows:
+            self.stdout.write('  '.join(
+                str(value).ljust(width) for value, width in zip(row, widths)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"FIM. Cotados: {sum(1 for linha in tabela if linha['opcoes'])}. "
+            f"Sem cotação: {sum(1 for linha in tabela if not linha['opcoes'])}. "
+            f"Do cache: {sum(1 for linha in tabela if linha['cache'])}."
+        ))
+
+    def _format_option(self, opcao):
+        """Formata uma opção da cotação como 'R$ 25,50 / 3d' para a tabela."""
+        if not opcao:
+            return '-'
+
+        preco = 'Indisponível' if opcao['preco'] is None else f"R$ {opcao['preco']}"
+        prazo = 'Indisponível' if opcao['prazo'] is None else f"{opcao['prazo']}d"
+        return f"{preco} / {prazo}"
@@ -0,0 +1,371 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, time as dt_time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Sequência de eventos dos objetos sintéticos (do mais antigo para o mais recente)
+SYNTHETIC_EVENTS = [
+    ('PO', 'Objeto postado'),
+    ('RO', 'Objeto em trânsito - por favor aguarde'),
+    ('RO', 'Objeto em trânsito - por favor aguarde'),
+    ('OEC', 'Objeto saiu para entrega ao destinatário'),
+    ('BDE', 'Objeto entregue ao destinatário'),
+]
+
+
+def _stable_number(text, modulo):
+    """Número determinístico (0 a modulo-1) derivado do texto, igual entre execuções."""
+    return int(hashlib.md5(text.encode()).hexdigest(), 16) % modulo
+
+
+class CorreiosStub:
+    """
+    Estado do simulador: fixtures gravadas, parâmetros de degradação e estatísticas.
+
+    As fixtures são um dicionário {'METODO /caminho?query': {'status', 'body'}}. Sem
+    fixture para a requisição, a resposta é gerada de forma determinística (o mesmo
+    código de rastreio ou CEP sempre gera os mesmos dados no mesmo dia).
+    """
+
+    def __init__(self, fixtures, latency, jitter, error_rate, rate_limit, record_url,
+                 log=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.record_url = record_url.rstrip('/') if record_url else None
+        # Função que registra cada requisição atendida (None = sem registro)
+        self.log = log
+
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_count = 0
+
+    def is_throttled(self):
+        """Limite de requisições por segundo (janela de 1 segundo, todas as rotas)."""
+        if not self.rate_limit:
+            return False
+
+        with self._lock:
+            window = int(time.time())
+            if window != self._window:
+                self._window = window
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.rate_limit
+
+    def wait_latency(self):
+        """Simula o tempo de resposta da API (média e variação em milissegundos)."""
+        delay = random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def record(self, key, status, body):
+        """Guarda uma resposta real nas fixtures (modo --record)."""
+        with self._lock:
+            self.fixtures[key] = {'status': status, 'body': body}
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Atende as rotas da API dos Correios usadas pelo CorreiosService."""
+
+    # Definido pelo comando antes de iniciar o servidor
+    stub = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Registro de cada requisição pelo comando (apenas com verbosity >= 2)
+        if self.stub.log:
+            self.stub.log(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _dispatch(self, method):
+        stub = self.stub
+        url = urlsplit(self.path)
+        family = url.path.strip('/').split('/')[0] or 'raiz'
+        body = self._read_body() if method == 'POST' else {}
+        stub.stats[f'{family}:requisicoes'] += 1
+
+        # Degradações configuradas: limitação de taxa, latência e erros aleatórios
+        if stub.is_throttled():
+            stub.stats[f'{family}:429'] += 1
+            return self._send_json(429, {'msgs': ['Limite de requisições excedido (simulado).']},
+                                   headers={'Retry-After': '1'})
+
+        stub.wait_latency()
+
+        if stub.error_rate and random.random() < stub.error_rate:
+            stub.stats[f'{family}:503'] += 1
+            return self._send_json(503, {'msgs': ['Serviço indisponível (simulado).']})
+
+        if family != 'token' and not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send_json(401, {'msgs': ['Token ausente.']})
+
+        # 1. Fixture gravada para esta requisição exata
+        key = f"{method} {self.path}"
+        fixture = stub.fixtures.get(key)
+        if fixture is not None:
+            stub.stats[f'{family}:fixture'] += 1
+            return self._send_json(fixture['status'], fixture['body'])
+
+        # 2. Modo gravação: repassa para a API real e guarda a resposta. As respostas
+        #    de /token não são gravadas: contêm o token de acesso real (Bearer)
+        if stub.record_url:
+            return self._forward_and_record(method, key, body, save=family != 'token')
+
+        # 3. Resposta sintética determinística
+        handler = {
+            'token': self._token,
+            'cep': self._zipcode,
+            'srorastro': self._tracking,
+            'preco': self._prices,
+            'prazo': self._deadlines,
+        }.get(family)
+
+        if handler is None:
+            return self._send_json(404, {'msgs': ['Rota não simulada.']})
+        return handler(url, body)
+
+    def _forward_and_record(self, method, key, body, save=True):
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() in ('authorization', 'content-type', 'accept')}
+        try:
+            response = requests.request(
+                method, f"{self.stub.record_url}{self.path}", headers=headers,
+                json=body if method == 'POST' else None, timeout=30)
+            response_body = response.json()
+        except (requests.RequestException, ValueError) as error:
+            return self._send_json(502, {'msgs': [f'Falha ao gravar: {error}']})
+
+        if save:
+            self.stub.record(key, response.status_code, response_body)
+        return self._send_json(response.status_code, response_body)
+
+    # --- RESPOSTAS SINTÉTICAS ---
+
+    def _token(self, url, body):
+        expires_at = datetime.now() + timedelta(hours=24)
+        return self._send_json(201, {
+            'token': f'stub-{uuid.uuid4().hex}',
+            'expiraEm': expires_at.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+
+    def _zipcode(self, url, body):
+        zipcode = url.path.rstrip('/').split('/')[-1]
+        if not zipcode.isdigit() or len(zipcode) != 8 or zipcode == '00000000':
+            return self._send_json(404, {'msgs': ['CEP não encontrado.']})
+
+        return self._send_json(200, {
+            'cep': zipcode,
+            'logradouro': f'Rua Simulada {_stable_number(zipcode, 900) + 1}',
+            'complemento': '',
+            'bairro': 'Centro',
+            'localidade': 'Cidade Simulada',
+            'uf': 'ES',
+        })
+
+    def _synthetic_object(self, code, result_type):
+        """Gera o histórico de um objeto: de 1 a 5 eventos, ancorados no dia atual."""
+        event_count = _stable_number(code, len(SYNTHETIC_EVENTS)) + 1
+        # Âncora fixa no dia: o mesmo objeto mantém os mesmos eventos durante o dia
+        anchor = datetime.combine(date.today(), dt_time(8, 0))
+
+        events = []
+        for index, (event_code, description) in enumerate(SYNTHETIC_EVENTS[:event_count]):
+            created_at = anchor - timedelta(hours=6 * (event_count - 1 - index))
+            events.append({
+                'codigo': event_code,
+                'tipo': '01',
+                'dtHrCriado': created_at.strftime('%Y-%m-%dT%H:%M:%S'),
+                'descricao': description,
+                'unidade': {'endereco': {'cidade': 'VITORIA', 'uf': 'ES'}},
+            })
+
+        # A API retorna do evento mais recente para o mais antigo
+        events.reverse()
+        if result_type == 'U':
+            events = events[:1]
+        return {'codObjeto': code, 'eventos': events}
+
+    def _tracking(self, url, body):
+        query = parse_qs(url.query)
+        result_type = (query.get('resultado') or ['T'])[0]
+
+        codes = query.get('codigosObjetos') or []
+        last_segment = url.path.rstrip('/').split('/')[-1]
+        if not codes and last_segment != 'objetos':
+            codes = [last_segment]
+
+        objects = []
+        for code in codes:
+            # Fixture gravada de um objeto isolado também atende consultas em lote
+            fixture = self.stub.fixtures.get(
+                f"GET /srorastro/v1/objetos/{code}?resultado={result_type}")
+            if fixture is not None and fixture['body'].get('objetos'):
+                objects.append(fixture['body']['objetos'][0])
+            else:
+                objects.append(self._synthetic_object(code, result_type))
+
+        return self._send_json(200, {'objetos': objects})
+
+    def _prices(self, url, body):
+        items = []
+        for item in body.get('parametrosProduto', []):
+            weight = float(str(item.get('psObjeto') or 0).replace(',', '.'))
+            base = 18 if item.get('coProduto') == '03298' else 32
+            price = base + weight / 100 + _stable_number(item.get('cepDestino', ''), 20)
+            items.append({
+                'coProduto': item.get('coProduto'),
+                'nuRequisicao': item.get('nuRequisicao'),
+                'pcFinal': f"{price:.2f}".replace('.', ','),
+            })
+        return self._send_json(200, items)
+
+    def _deadlines(self, url, body):
+        items = []
+        for item in body.get('parametrosPrazo', []):
+            days = (7 if item.get('coProduto') == '03298' else 2) + \
+                _stable_number(item.get('cepDestino', ''), 4)
+            items.append({
+                'coProduto': item.get('coProduto'),
+                'nuRequisicao': item.get('nuRequisicao'),
+                'prazoEntrega': days,
+                'dataMaxima': (date.today() + timedelta(days=days)).strftime('%Y-%m-%dT23:59:59'),
+            })
+        return self._send_json(200, items)
+
+
+class Command(BaseCommand):
+    """
+    Simulador local da API dos Correios para testes de carga e benchmarks offline.
+
+    Uso: python manage.py serve_correios_stub [--port 8099] [--fixtures arquivo.json]
+         [--latency 120] [--jitter 40] [--error-rate 0.02] [--rate-limit 20]
+         [--record https://api.correios.com.br]
+
+    Atende /token, /cep, /srorastro, /preco e /prazo. Para usá-lo, aponte
+    CORREIOS_URL_BASE para o endereço do simulador (ex: http://127.0.0.1:8099).
+
+    Com --record, as requisições sem fixture são repassadas à API real e as respostas
+    são gravadas no arquivo de --fixtures ao encerrar, para serem reproduzidas depois.
+    As respostas de /token não são gravadas (contêm o token real); na reprodução, o
+    token é sintético.
+
+    Com -v 2, cada requisição atendida é registrada (método, caminho e status).
+    """
+    help = 'Inicia um simulador local da API dos Correios (fixtures, latência, erros e limitação)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1',
+                            help='Endereço de escuta (padrão: 127.0.0.1).')
+        parser.add_argument('--port', type=int, default=8099,
+                            help='Porta de escuta (padrão: 8099).')
+        parser.add_argument('--fixtures', default=None,
+                            help='Arquivo JSON de respostas gravadas a reproduzir.')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Latência média das respostas em ms (padrão: 0).')
+        parser.add_argument('--jitter', type=float, default=0,
+                            help='Desvio padrão da latência em ms (padrão: 0).')
+        parser.add_argument('--error-rate', type=float, default=0,
+                            help='Fração das requisições respondidas com 503 (0 a 1).')
+        parser.add_argument('--rate-limit', type=int, default=0,
+                            help='Requisições por segundo antes de responder 429 (0 = sem limite).')
+        parser.add_argument('--record', default=None, metavar='URL_BASE',
+                            help='Repassa as requisições sem fixture à API real e grava as respostas.')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError("--error-rate deve estar entre 0 e 1.")
+        if options['record'] and not options['fixtures']:
+            raise CommandError("--record exige --fixtures (arquivo onde as respostas são gravadas).")
+
+        fixtures = {}
+        if options['fixtures']:
+            try:
+                with open(options['fixtures'], encoding='utf-8') as fixtures_file:
+                    fixtures = json.load(fixtures_file)
+            except FileNotFoundError:
+                if not options['record']:
+                    raise CommandError(
+                        f"Arquivo de fixtures não encontrado: {options['fixtures']}")
+            except ValueError as error:
+                raise CommandError(f"Fixtures inválidas: {error}")
+
+        log = None
+        if options['verbosity'] >= 2:
+            log_lock = threading.Lock()
+
+            def write_log(message):
+                # O servidor atende cada requisição em uma thread
+                with log_lock:
+                    self.stdout.write(message)
+
+            log = write_log
+
+        stub = CorreiosStub(
+            fixtures, options['latency'], options['jitter'],
+            options['error_rate'], options['rate_limit'], options['record'], log=log)
+        StubRequestHandler.stub = stub
+
+        server = ThreadingHTTPServer(
+            (options['host'], options['port']), StubRequestHandler)
+        server.daemon_threads = True
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulador Correios em http://{options['host']}:{options['port']} "
+            f"({len(fixtures)} fixture(s), latência {options['latency']:.0f}ms, "
+            f"erros {options['error_rate']:.0%}, limite {options['rate_limit'] or '-'} req/s). "
+            f"Ctrl+C para encerrar."))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+            if options['record']:
+                with open(options['fixtures'], 'w', encoding='utf-8') as fixtures_file:
+                    json.dump(stub.fixtures, fixtures_file, ensure_ascii=False, indent=2)
+                self.stdout.write(
+                    f"{len(stub.fixtures)} fixture(s) gravada(s) em {options['fixtures']}.")
+
+            self.stdout.write("Requisições atendidas:")
+            for key, total in sorted(stub.stats.items()):
+                self.stdout.write(f"  {key}: {total}")
@@ -1,6 +1,54 @@
-from django.core.management.base import BaseCommand
-from apps.samples.models import Processo
-from apps.correios.logic import update_process_tracking
+import math
+import signal
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Min, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+from apps.samples.models import Processo, FILTRO_RASTREIO_ATIVO
+from apps.correios.logic import (
+    update_process_tracking, schedule_tracking_check,
+    get_last_tracking_event_keys, has_new_tracking_event,
+)
+from apps.correios.models import ExecucaoRastreio, TravaExecucao
+from apps.correios.resilience import (
+    PRIORITY_BACKGROUND, STATE_OPEN, CircuitBreaker, CorreiosIndisponivelError,
+)
+from apps.correios.services import CorreiosService
+
+
+def _percentile(values, percent):
+    """
+    Calcula o percentil (método nearest-rank) de uma lista de valores.
+
+    Args:
+        values: Lista de números (ex: latências em segundos).
+        percent: Percentil desejado entre 0 e 100 (ex: 95).
+
+    Returns:
+        O valor correspondente ao percentil, ou 0.0 se a lista estiver vazia.
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _chunked(iterable, size):
+    """Divide um iterável em listas de até 'size' itens, sem carregá-lo inteiro."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 class Command(BaseCommand):
@@ -8,44 +56,323 @@ class Command(BaseCommand):
     Comando de gerenciamento (Django Management Command) para atualização em massa
     dos rastreios dos Correios.
 
-    Uso: python manage.py update_tracking
-    Geralmente configurado para rodar via CRON ou Celery Beat periodicamente.
+    Uso: python manage.py update_tracking [--workers N] [--batch-size N] [--shard i/n]
+                                          [--all] [--full] [--resume] [--daemon]
+    Pode rodar periodicamente (CRON ou Celery Beat) ou como processo residente com
+    --daemon (ver 'worker' no Procfile).
+
+    Cada processo possui uma agenda própria (proxima_consulta_rastreio), definida a
+    cada consulta conforme o estágio do objeto; apenas os processos vencidos são
+    consultados, a menos que --all seja informado.
+
+    Os códigos são agrupados em lotes (--batch-size) consultados de uma só vez na
+    API SRO. Os lotes são distribuídos em um pool de threads limitado (--workers),
+    enquanto a gravação no banco é feita na thread principal, um processo por vez.
+
+    A consulta é incremental: cada lote pede primeiro apenas o último evento
+    (resultado=U) e o histórico completo só é buscado para os objetos cujo último
+    evento difere do último gravado. Use --full para sempre buscar o histórico.
+
+    Várias instâncias podem rodar ao mesmo tempo (outros dynos/hosts):
+    - --shard i/n divide os processos pelo resto do id (id % n == i);
+    - uma trava global por shard (TravaExecucao, no banco) impede que execuções
+      sobrepostas (ex: cron) rodem juntas; ela é renovada a cada lote;
+    - cada lote é reservado antes da consulta, adiando a próxima consulta dos processos
+      por CLAIM_LEASE (com select_for_update(skip_locked=True) no PostgreSQL, ou com um
+      UPDATE condicional por processo nos bancos sem esse recurso, como o SQLite).
+      Processos reservados por outra execução são ignorados.
+
+    Os processos são lidos em ordem de id, em blocos e apenas com os campos usados,
+    mantendo a memória constante. O progresso é gravado em ExecucaoRastreio; uma
+    execução interrompida pode continuar de onde parou com --resume.
+
+    No modo --daemon o comando permanece em execução: a cada passagem consulta os
+    processos vencidos e dorme até o próximo vencimento, reaproveitando a sessão HTTP
+    e o token. Após passagens com falha, espera com backoff exponencial (ou até o
+    circuito da API liberar nova tentativa). SIGTERM/SIGINT encerram o laço ao fim do lote em andamento, e as
+    estatísticas acumuladas são registradas a cada --stats-interval segundos.
+
+    Se o circuito da API SRO (ou do token) estiver aberto, a execução não começa; se
+    abrir no meio dela, os lotes restantes são descartados e ficam para a próxima.
     """
     help = 'Atualiza o rastreamento de todos os processos ativos via API Correios'
 
-    def handle(self, *args, **kwargs):
+    # Trava global da execução (por shard); expira sozinha se o processo morrer e é
+    # renovada a cada lote, de modo que execuções longas não a percam
+    RUN_LOCK_KEY = 'update_tracking_execucao'
+    RUN_LOCK_TIMEOUT = 3600  # segundos
+
+    # Reserva de cada processo durante a consulta
+    CLAIM_LEASE = timedelta(minutes=15)
+
+    # Leitura dos processos em blocos (iterator), apenas com os campos usados
+    STREAM_CHUNK_SIZE = 500
+    PROCESS_FIELDS = (
+        'id', 'codigo', 'codigo_rastreio', 'status', 'tipo_transporte',
+        'ultima_consulta_rastreio', 'proxima_consulta_rastreio', 'ultima_atualizacao',
+    )
+
+    # Checkpoints finalizados são mantidos por este período
+    CHECKPOINT_RETENTION = timedelta(days=30)
+    # Execuções interrompidas sem progresso há mais tempo que isso não são retomadas
+    # (o cursor já não reflete a agenda dos processos); ver _close_stale_checkpoints
+    CHECKPOINT_MAX_IDLE = timedelta(seconds=RUN_LOCK_TIMEOUT)
+
+    # Modo daemon: limites do intervalo entre passagens (segundos). Após passagens
+    # com falha seguidas, o intervalo dobra a partir do mínimo até o máximo.
+    DAEMON_MIN_SLEEP = 5
+    DAEMON_MAX_SLEEP = 300
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sinalizado por SIGTERM/SIGINT no modo daemon
+        self._stop_event = threading.Event()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Quantidade de consultas simultâneas à API SRO (padrão: 1, sequencial).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CorreiosService.SRO_BATCH_SIZE,
+            help=f'Objetos por consulta à API SRO (padrão e máximo: {CorreiosService.SRO_BATCH_SIZE}).'
+        )
+        parser.add_argument(
+            '--shard',
+            default=None,
+            help="Processa apenas a fração i de n dos processos (ex: '0/3', '1/3', '2/3')."
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Ignora a agenda e consulta todos os processos ativos.'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Busca sempre o histórico completo, sem a verificação prévia do último evento.'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Retoma a última execução interrompida do shard a partir do checkpoint.'
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Permanece em execução, consultando os processos conforme vencem.'
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=int,
+            default=600,
+            help='Modo daemon: intervalo (segundos) entre os registros de estatísticas (padrão: 600).'
+        )
+
+    def _parse_shard(self, value):
+        """
+        Converte o argumento --shard ('i/n') em uma tupla (i, n).
+
+        Raises:
+            CommandError: Se o formato for inválido ou i não estiver entre 0 e n-1.
+        """
+        if not value:
+            return 0, 1
+
+        try:
+            index, total = (int(part) for part in value.split('/'))
+        except ValueError:
+            raise CommandError(
+                f"Shard inválido: '{value}'. Use o formato i/n (ex: 0/3).")
+
+        if total < 1 or not 0 <= index < total:
+            raise CommandError(
+                f"Shard inválido: '{value}'. O índice deve estar entre 0 e {total - 1}.")
+        return index, total
+
+    def _acquire_run_lock(self, lock_key, owner):
+        """
+        Tenta adquirir a trava global da execução (linha de TravaExecucao no banco).
+
+        A aquisição é atômica em qualquer banco: a linha é assumida com um UPDATE
+        condicional (apenas se estiver vencida) ou criada, e o 'nome' único impede
+        que duas execuções a criem ao mesmo tempo.
+
+        Returns:
+            True se a trava pertence a esta execução.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.RUN_LOCK_TIMEOUT)
+
+        if TravaExecucao.objects.filter(nome=lock_key, expira_em__lte=now).update(
+                dono=owner, expira_em=expires_at):
+            return True
+
+        try:
+            with transaction.atomic():
+                TravaExecucao.objects.create(
+                    nome=lock_key, dono=owner, expira_em=expires_at)
+        except IntegrityError:
+            # Trava válida de outra execução
+            return False
+        return True
+
+    def _refresh_run_lock(self, lock_key, owner):
+        """
+        Renova a validade da trava global (chamado a cada lote).
+
+        Returns:
+            False se a trava não pertence mais a esta execução (ex: expirou e foi
+            assumida por outra).
+        """
+        return bool(TravaExecucao.objects.filter(nome=lock_key, dono=owner).update(
+            expira_em=timezone.now() + timedelta(seconds=self.RUN_LOCK_TIMEOUT)))
+
+    def _release_run_lock(self, lock_key, owner):
+        """Libera a trava global, apenas se ela ainda pertencer a esta execução."""
+        TravaExecucao.objects.filter(nome=lock_key, dono=owner).delete()
+
+    def _claim_processes(self, processes, respect_schedule):
+        """
+        Reserva os processos do lote para esta execução.
+
+        No PostgreSQL, as linhas são travadas com select_for_update(skip_locked=True):
+        linhas já travadas por outra execução são puladas, sem espera. A reserva é
+        gravada adiando a próxima consulta por CLAIM_LEASE, o que tira os processos do
+        filtro de vencidos das demais execuções até que a consulta os reagende.
+
+        Em bancos sem skip_locked (ex: SQLite), cada processo é reservado com um UPDATE
+        condicional (compare-and-set): a próxima consulta só é adiada se ainda tiver o
+        valor lido no início do lote. Se outra execução reservou o processo antes, o
+        valor mudou e o UPDATE não altera nenhuma linha.
+
+        Args:
+            processes: Processos candidatos do lote.
+            respect_schedule: Se True, só reserva processos ainda vencidos (ignora os
+                já reservados por outra execução).
+
+        Returns:
+            Lista com os processos efetivamente reservados.
+        """
+        candidate_ids = [process.pk for process in processes]
+        lease_until = timezone.now() + self.CLAIM_LEASE
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                claimable = Processo.objects.filter(pk__in=candidate_ids)
+                if respect_schedule:
+                    claimable = claimable.filter(self._due_filter())
+
+                claimed_ids = set(claimable.select_for_update(
+                    skip_locked=True).values_list('pk', flat=True))
+                Processo.objects.filter(pk__in=claimed_ids).update(
+                    proxima_consulta_rastreio=lease_until)
+        else:
+            now = timezone.now()
+            claimed_ids = set()
+            for process in processes:
+                scheduled_at = process.proxima_consulta_rastreio
+                if respect_schedule and scheduled_at is not None and scheduled_at > now:
+                    continue
+                if Processo.objects.filter(
+                        pk=process.pk, proxima_consulta_rastreio=scheduled_at
+                ).update(proxima_consulta_rastreio=lease_until):
+                    claimed_ids.add(process.pk)
+
+        return [process for process in processes if process.pk in claimed_ids]
+
+    def _due_filter(self):
+        """Filtro dos processos com a próxima consulta vencida (ou nunca consultados)."""
+        return (
+            Q(proxima_consulta_rastreio__isnull=True) |
+            Q(proxima_consulta_rastreio__lte=timezone.now())
+        )
+
+    def _fetch_tracking_batch(self, service, processes, last_keys, incremental):
+        """
+        Executado dentro do pool de threads: consulta um lote na API e mede a latência.
+
+        No modo incremental, consulta primeiro apenas o último evento de cada objeto e
+        busca o histórico completo somente dos que tiveram novidade.
+
+        Args:
+            service: Instância compartilhada de CorreiosService.
+            processes: Processos do lote.
+            last_keys: Dicionário {codigo_sanitizado: chave do último evento gravado}.
+            incremental: Se False, busca direto o histórico completo.
+
+        Returns:
+            Tupla (dicionario_codigo_para_dados, codigos_sem_novidade, latencias_em_segundos).
+        """
+        codes = [service.sanitize_tracking_code(process.codigo_rastreio)
+                 for process in processes]
+        latencies = []
+
+        if not incremental:
+            started_at = time.monotonic()
+            tracking_results = service.track_objects(codes)
+            latencies.append(time.monotonic() - started_at)
+            return tracking_results, set(), latencies
+
+        started_at = time.monotonic()
+        tracking_results = service.track_objects(codes, resultado='U')
+        latencies.append(time.monotonic() - started_at)
+
+        changed_codes = [
+            code for code in codes
+            if has_new_tracking_event(tracking_results.get(code), last_keys.get(code))
+        ]
+        unchanged_codes = {
+            code for code in codes
+            if tracking_results.get(code) is not None and code not in changed_codes
+        }
+
+        if changed_codes:
+            started_at = time.monotonic()
+            tracking_results.update(service.track_objects(changed_codes))
+            latencies.append(time.monotonic() - started_at)
+
+        return tracking_results, unchanged_codes, latencies
+
+    def _apply_tracking_batch(self, service, batch, tracking_results, unchanged_codes):
+        """
+        Grava no banco (thread principal) o resultado da consulta de um lote.
+
+        Returns:
+            Tupla (quantidade_atualizados, quantidade_falhas).
         """
-        Método principal executado ao chamar o comando.
-        Seleciona processos elegíveis e invoca a lógica de atualização para cada um.
-        """
-        self.stdout.write("Iniciando atualização massiva de rastreios...")
-
-        # --- FILTRAGEM DE PROCESSOS ---
-        # Seleciona apenas processos que:
-        # 1. Utilizam Correios como transporte.
-        # 2. NÃO estão em status finalizados (entregue, cancelado, etc).
-        # 3. Possuem código de rastreio preenchido.
-        eligible_processes = Processo.objects.filter(
-            tipo_transporte='correios'
-        ).exclude(
-            status__in=['entregue', 'cancelado', 'nao_entregue']
-        ).exclude(
-            codigo_rastreio__isnull=True
-        ).exclude(
-            codigo_rastreio=''
-        )
-
-        total_processes = eligible_processes.count()
         updated_count = 0
+        failed_count = 0
 
-        # Itera sobre cada processo elegível
-        for process in eligible_processes:
+        for process in batch:
             try:
                 self.stdout.write(
                     f"Verificando {process.codigo} ({process.codigo_rastreio})...")
 
+                sanitized_code = service.sanitize_tracking_code(
+                    process.codigo_rastreio)
+                tracking_data = tracking_results.get(sanitized_code)
+
+                if sanitized_code in unchanged_codes:
+                    # Último evento já gravado: apenas reagenda a próxima consulta
+                    schedule_tracking_check(process, tracking_data)
+                    continue
+
+                if tracking_data is None:
+                    # Reagenda com o intervalo de falha para não insistir a cada execução
+                    schedule_tracking_check(process, None)
+                    failed_count += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"-> {process.codigo}: sem retorno da API."))
+                    continue
+
                 # Chama a lógica centralizada (mesma usada na View)
-                was_updated = update_process_tracking(process)
+                was_updated = update_process_tracking(
+                    process, tracking_data=tracking_data)
 
                 if was_updated:
                     updated_count += 1
@@ -54,10 +381,465 @@ class Command(BaseCommand):
 
             except Exception as error:
                 # Em caso de erro num processo específico, loga e continua para o próximo
+                failed_count += 1
                 self.stdout.write(self.style.ERROR(
                     f"-> Erro em {process.codigo}: {error}"))
 
+        return updated_count, failed_count
+
+    def _close_stale_checkpoints(self):
+        """
+        Encerra as execuções não finalizadas sem progresso há mais de CHECKPOINT_MAX_IDLE.
+
+        Execuções em andamento gravam o checkpoint a cada lote (e renovam a trava), então
+        um checkpoint parado por mais tempo pertence a uma execução que morreu. Ele é
+        marcado como finalizado para não ser retomado e segue a retenção normal.
+
+        Returns:
+            Quantidade de checkpoints encerrados.
+        """
+        return ExecucaoRastreio.objects.filter(
+            finalizado_em__isnull=True,
+            atualizado_em__lt=timezone.now() - self.CHECKPOINT_MAX_IDLE,
+        ).update(finalizado_em=timezone.now())
+
+    def _get_checkpoint(self, shard, owner, resume, persist):
+        """
+        Obtém o ponto de controle da execução.
+
+        Args:
+            shard: Tupla (i, n) do shard processado.
+            owner: Identificador desta execução (usado como run_id de uma nova).
+            resume: Se True, retoma a última execução não finalizada (e não abandonada,
+                ver _close_stale_checkpoints) do shard.
+            persist: Se False (modo daemon), o checkpoint não é gravado no banco.
+
+        Returns:
+            Uma instância de ExecucaoRastreio.
+        """
+        shard_label = f"{shard[0]}/{shard[1]}"
+
+        if resume or persist:
+            closed_count = self._close_stale_checkpoints()
+            if closed_count:
+                self.stdout.write(self.style.WARNING(
+                    f"{closed_count} execução(ões) interrompida(s) há mais de "
+                    f"{self.CHECKPOINT_MAX_IDLE} encerrada(s) sem retomada."))
+
+        if resume:
+            checkpoint = ExecucaoRastreio.objects.filter(
+                shard=shard_label, finalizado_em__isnull=True
+            ).order_by('-iniciado_em').first()
+            if checkpoint:
+                return checkpoint
+            self.stdout.write(
+                "Nenhuma execução interrompida para retomar. Iniciando uma nova.")
+
+        checkpoint = ExecucaoRastreio(run_id=owner, shard=shard_label)
+        if persist:
+            # Remove checkpoints antigos já finalizados
+            ExecucaoRastreio.objects.filter(
+                finalizado_em__lt=timezone.now() - self.CHECKPOINT_RETENTION
+            ).delete()
+            checkpoint.save()
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint):
+        """Grava o progresso do checkpoint (ignorado quando ele não é persistido)."""
+        if checkpoint.pk:
+            checkpoint.save(update_fields=[
+                'ultimo_pk', 'processados', 'atualizados', 'falhas',
+                'atualizado_em', 'finalizado_em'])
+
+    def _get_eligible_processes(self, shard):
+        """
+        Monta a consulta dos processos rastreáveis do shard.
+
+        Seleciona apenas processos que:
+        1. Utilizam Correios como transporte.
+        2. NÃO estão em status finalizados (entregue, cancelado, etc).
+        3. Possuem código de rastreio preenchido.
+        4. Pertencem ao shard informado (id % n == i).
+        """
+        shard_index, shard_total = shard
+
+        # Mesmo filtro da condição do índice parcial de envios ativos
+        eligible_processes = Processo.objects.filter(FILTRO_RASTREIO_ATIVO)
+
+        if shard_total > 1:
+            eligible_processes = eligible_processes.alias(
+                shard=Mod('pk', shard_total)).filter(shard=shard_index)
+
+        return eligible_processes
+
+    def handle(self, *args, **options):
+        """
+        Método principal executado ao chamar o comando.
+        Executa uma passagem única ou, com --daemon, o laço contínuo.
+        """
+        shard = self._parse_shard(options['shard'])
+
+        if options['daemon']:
+            self._run_daemon(options, shard)
+        else:
+            self._run_locked(options, shard)
+
+    def _run_locked(self, options, shard, service=None):
+        """
+        Executa uma passagem de atualização com a trava global do shard.
+
+        Returns:
+            As estatísticas da passagem (ver _run), ou None se outra execução do
+            mesmo shard estiver em andamento.
+        """
+        owner = uuid.uuid4().hex
+        lock_key = f"{self.RUN_LOCK_KEY}:{shard[0]}/{shard[1]}"
+
+        if not self._acquire_run_lock(lock_key, owner):
+            self.stdout.write(self.style.WARNING(
+                f"Outra execução do shard {shard[0]}/{shard[1]} está em andamento. Nada a fazer."))
+            return None
+
+        try:
+            return self._run(options, shard, owner, lock_key, service)
+        finally:
+            self._release_run_lock(lock_key, owner)
+
+    def _seconds_until_next_due(self, shard):
+        """
+        Calcula quanto o daemon pode dormir até o próximo processo vencer.
+
+        Returns:
+            Segundos até o próximo vencimento, limitados a DAEMON_MIN_SLEEP e DAEMON_MAX_SLEEP.
+        """
+        eligible_processes = self._get_eligible_processes(shard)
+        if eligible_processes.filter(proxima_consulta_rastreio__isnull=True).exists():
+            return self.DAEMON_MIN_SLEEP
+
+        next_due = eligible_processes.aggregate(
+            next_due=Min('proxima_consulta_rastreio'))['next_due']
+        if next_due is None:
+            return self.DAEMON_MAX_SLEEP
+
+        seconds = (next_due - timezone.now()).total_seconds()
+        return min(max(seconds, self.DAEMON_MIN_SLEEP), self.DAEMON_MAX_SLEEP)
+
+    def _run_daemon(self, options, shard):
+        """
+        Laço do modo daemon: executa passagens até receber SIGTERM/SIGINT, dormindo
+        entre elas até o próximo vencimento e registrando a vazão periodicamente.
+        """
+        def request_stop(signum, frame):
+            self.stdout.write(self.style.WARNING(
+                f"Sinal {signal.Signals(signum).name} recebido: encerrando após o lote atual..."))
+            self._stop_event.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        # Serviço único durante toda a vida do daemon (sessão HTTP e token reaproveitados)
+        service = CorreiosService(prioridade=PRIORITY_BACKGROUND)
+        totals = {'processados': 0, 'atualizados': 0, 'falhas': 0, 'requisicoes': 0}
+        stats_started_at = time.monotonic()
+        stats_interval = max(1, options['stats_interval'])
+
+        # Passagens seguidas que falharam (erro, abortadas ou sem nenhum sucesso)
+        consecutive_failures = 0
+
+        self.stdout.write(
+            f"Daemon de rastreio iniciado (shard {shard[0]}/{shard[1]}).")
+
+        while not self._stop_event.is_set():
+            # Conexões de banco de longa duração podem ter sido encerradas pelo servidor
+            close_old_connections()
+
+            run_stats = None
+            pass_failed = False
+            try:
+                run_stats = self._run_locked(options, shard, service)
+            except Exception as error:
+                pass_failed = True
+                self.stdout.write(self.style.ERROR(f"Erro na passagem: {error}"))
+
+            # Sem estatísticas (outra execução com a trava) o contador não muda
+            if run_stats:
+                pass_failed = self._pass_failed(run_stats)
+            if pass_failed:
+                consecutive_failures += 1
+            elif run_stats:
+                consecutive_failures = 0
+
+            if run_stats:
+                for key in totals:
+                    totals[key] += run_stats[key]
+
+            elapsed = time.monotonic() - stats_started_at
+            if elapsed >= stats_interval:
+                self.stdout.write(
+                    f"[stats] {elapsed:.0f}s | Processados: {totals['processados']} | "
+                    f"Atualizados: {totals['atualizados']} | Falhas: {totals['falhas']} | "
+                    f"Requisições SRO: {totals['requisicoes']} | "
+                    f"Vazão: {totals['processados'] / elapsed:.2f} processos/s")
+                totals = dict.fromkeys(totals, 0)
+                stats_started_at = time.monotonic()
+
+            if self._stop_event.is_set():
+                break
+
+            # Com o circuito aberto, espera a liberação da chamada de teste
+            if run_stats and run_stats['reabre_em']:
+                sleep_seconds = min(max(run_stats['reabre_em'], self.DAEMON_MIN_SLEEP),
+                                    self.DAEMON_MAX_SLEEP)
+            elif consecutive_failures:
+                sleep_seconds = min(self.DAEMON_MIN_SLEEP * 2 ** consecutive_failures,
+                                    self.DAEMON_MAX_SLEEP)
+                self.stdout.write(self.style.WARNING(
+                    f"{consecutive_failures} passagem(ns) com falha seguida(s). "
+                    f"Nova tentativa em {sleep_seconds}s."))
+            else:
+                try:
+                    sleep_seconds = self._seconds_until_next_due(shard)
+                except Exception as error:
+                    self.stdout.write(self.style.ERROR(
+                        f"Erro ao calcular o próximo vencimento: {error}"))
+                    sleep_seconds = self.DAEMON_MAX_SLEEP
+
+            # Espera interrompível pelo sinal de parada
+            self._stop_event.wait(sleep_seconds)
+
+        self.stdout.write(self.style.SUCCESS("Daemon de rastreio encerrado."))
+
+    def _run(self, options, shard, owner, lock_key, service=None):
+        """
+        Seleciona os processos vencidos do shard e invoca a lógica de atualização
+        para cada um.
+
+        Returns:
+            Dicionário com 'processados', 'atualizados', 'falhas', 'requisicoes' (à API
+            SRO), 'reabre_em' (segundos até o circuito da API liberar nova tentativa,
+            0 se a passagem não foi interrompida por ele) e 'erro' (passagem abortada
+            por outro erro).
+        """
+        workers = max(1, options['workers'])
+        batch_size = min(max(1, options['batch_size']),
+                         CorreiosService.SRO_BATCH_SIZE)
+        shard_index, shard_total = shard
+        self.stdout.write(
+            f"Iniciando atualização massiva de rastreios "
+            f"({workers} worker(s), lotes de {batch_size}, shard {shard_index}/{shard_total})...")
+
+        # Processos do shard com a próxima consulta vencida (ou nunca consultados)
+        eligible_processes = self._get_eligible_processes(shard)
+        if not options['all']:
+            eligible_processes = eligible_processes.filter(self._due_filter())
+
+        total_processes = 0
+        updated_count = 0
+        failed_count = 0
+        # Processos reservados por outra execução no momento da consulta
+        claimed_elsewhere_count = 0
+        # Processos não consultados porque o circuito da API abriu durante a execução
+        skipped_count = 0
+        circuit_open = False
+        retry_after = 0
+        latencies = []
+
+        # Com a API fora do ar (circuito aberto), não adianta iniciar as consultas
+        for endpoint in ('token', 'sro'):
+            breaker_state = CircuitBreaker(endpoint).get_state()
+            if breaker_state['estado'] == STATE_OPEN:
+                self.stdout.write(self.style.WARNING(
+                    f"Abortado: circuito Correios ({endpoint}) aberto. "
+                    f"Nova tentativa liberada em {breaker_state['reabre_em']}s."))
+                return self._run_stats(reabre_em=breaker_state['reabre_em'])
+
+        # Um único serviço compartilhado entre as threads. A autenticação é feita
+        # antes de distribuir as consultas para que as threads não disputem o token.
+        service = service or CorreiosService(prioridade=PRIORITY_BACKGROUND)
+        try:
+            service.get_headers()
+        except CorreiosIndisponivelError as error:
+            self.stdout.write(self.style.ERROR(f"Abortado: {error}"))
+            return self._run_stats(reabre_em=error.retry_after)
+        except Exception as error:
+            self.stdout.write(self.style.ERROR(f"Abortado: {error}"))
+            return self._run_stats(erro=True)
+
+        started_at = time.monotonic()
+        incremental = not options['full']
+
+        # Ponto de controle: retoma a execução interrompida do shard ou inicia uma nova
+        checkpoint = self._get_checkpoint(
+            shard, owner, resume=options['resume'], persist=not options['daemon'])
+        if checkpoint.ultimo_pk:
+            self.stdout.write(
+                f"Retomando a execução {checkpoint.run_id} após o id {checkpoint.ultimo_pk}...")
+            eligible_processes = eligible_processes.filter(
+                pk__gt=checkpoint.ultimo_pk)
+
+        # Percorre em ordem de id, carregando apenas os campos usados e em blocos:
+        # a memória não cresce com o total de processos elegíveis
+        process_stream = eligible_processes.order_by('pk').only(
+            *self.PROCESS_FIELDS).iterator(chunk_size=self.STREAM_CHUNK_SIZE)
+
+        # Totais já gravados no checkpoint (execução retomada)
+        checkpoint_base = (checkpoint.processados,
+                           checkpoint.atualizados, checkpoint.falhas)
+
+        # Lotes na ordem de envio ([ultimo_pk, concluido]): o checkpoint só avança
+        # até o último lote de uma sequência contínua de lotes concluídos
+        submitted_batches = deque()
+        in_flight = {}
+
+        def advance_checkpoint():
+            last_pk = None
+            while submitted_batches and submitted_batches[0][1]:
+                last_pk = submitted_batches.popleft()[0]
+            if last_pk is not None:
+                checkpoint.ultimo_pk = last_pk
+                checkpoint.processados = checkpoint_base[0] + total_processes
+                checkpoint.atualizados = checkpoint_base[1] + updated_count
+                checkpoint.falhas = checkpoint_base[2] + failed_count
+                self._save_checkpoint(checkpoint)
+
+        def handle_future(future):
+            nonlocal updated_count, failed_count, skipped_count, circuit_open, retry_after
+            batch, marker = in_flight.pop(future)
+
+            try:
+                if future.cancelled():
+                    skipped_count += len(batch)
+                    return
+
+                try:
+                    tracking_results, unchanged_codes, batch_latencies = future.result()
+                    latencies.extend(batch_latencies)
+                except CorreiosIndisponivelError as error:
+                    # Circuito aberto: o lote fica para a próxima execução
+                    skipped_count += len(batch)
+                    if not circuit_open:
+                        circuit_open = True
+                        retry_after = error.retry_after
+                        self.stdout.write(self.style.WARNING(
+                            f"-> {error} Lotes restantes ficam para a próxima execução."))
+                    return
+                except Exception as error:
+                    failed_count += len(batch)
+                    self.stdout.write(self.style.ERROR(
+                        f"-> Erro no lote ({len(batch)} processos): {error}"))
+                    marker[1] = True
+                    return
+
+                batch_updated, batch_failed = self._apply_tracking_batch(
+                    service, batch, tracking_results, unchanged_codes)
+                updated_count += batch_updated
+                failed_count += batch_failed
+                marker[1] = True
+            finally:
+                advance_checkpoint()
+
+        # Trava global perdida no meio da execução (expirou e outra execução a assumiu)
+        lock_lost = False
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for candidates in _chunked(process_stream, batch_size):
+                # Parada solicitada (daemon) ou API indisponível: não envia novos lotes
+                if self._stop_event.is_set() or circuit_open:
+                    break
+
+                if not self._refresh_run_lock(lock_key, owner):
+                    lock_lost = True
+                    self.stdout.write(self.style.ERROR(
+                        "-> Trava da execução perdida para outra execução. Interrompendo."))
+                    break
+
+                batch = self._claim_processes(
+                    candidates, respect_schedule=not options['all'])
+                claimed_elsewhere_count += len(candidates) - len(batch)
+                total_processes += len(batch)
+
+                marker = [candidates[-1].pk, not batch]
+                submitted_batches.append(marker)
+                if not batch:
+                    advance_checkpoint()
+                    continue
+
+                # As chaves dos últimos eventos são lidas aqui, na thread principal
+                last_keys = {}
+                if incremental:
+                    keys_by_process = get_last_tracking_event_keys(batch)
+                    last_keys = {
+                        service.sanitize_tracking_code(process.codigo_rastreio):
+                            keys_by_process.get(process.pk)
+                        for process in batch
+                    }
+
+                future = executor.submit(
+                    self._fetch_tracking_batch, service, batch, last_keys, incremental)
+                in_flight[future] = (batch, marker)
+
+                # Limita os lotes em andamento; os resultados são aplicados no banco
+                # (thread principal) conforme os lotes terminam
+                while len(in_flight) >= workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        handle_future(finished)
+
+            if self._stop_event.is_set() or circuit_open or lock_lost:
+                for pending in in_flight:
+                    pending.cancel()
+
+            for finished in as_completed(list(in_flight)):
+                handle_future(finished)
+
+        # Execução completa: o checkpoint não é mais retomável
+        interrupted = self._stop_event.is_set() or circuit_open or lock_lost
+        if not interrupted:
+            checkpoint.finalizado_em = timezone.now()
+            self._save_checkpoint(checkpoint)
+
+        elapsed = time.monotonic() - started_at
+        throughput = total_processes / elapsed if elapsed > 0 else 0.0
+
         # Resumo final da operação
         self.stdout.write(self.style.SUCCESS(
-            f"FIM. Processados: {total_processes}. Atualizados: {updated_count}."
+            f"FIM. Processados: {total_processes}. Atualizados: {updated_count}. "
+            f"Falhas: {failed_count}. Adiados (API indisponível): {skipped_count}. "
+            f"Reservados por outra execução: {claimed_elsewhere_count}."
         ))
+        self.stdout.write(
+            f"Tempo total: {elapsed:.1f}s | Vazão: {throughput:.2f} processos/s | "
+            f"Requisições SRO: {len(latencies)} | "
+            f"Latência API p50: {_percentile(latencies, 50) * 1000:.0f}ms, "
+            f"p95: {_percentile(latencies, 95) * 1000:.0f}ms"
+        )
+
+        # Autenticações na API nesta hora (todas as origens, se o cache for compartilhado)
+        _, auth_count = CorreiosService.get_authentication_counts(hours=1)[0]
+        self.stdout.write(f"Autenticações Correios nesta hora: {auth_count}")
+
+        return self._run_stats(
+            processados=total_processes, atualizados=updated_count,
+            falhas=failed_count, requisicoes=len(latencies), reabre_em=retry_after)
+
+    def _run_stats(self, processados=0, atualizados=0, falhas=0, requisicoes=0, reabre_em=0,
+                   erro=False):
+        """Monta o dicionário de estatísticas de uma passagem (ver _run)."""
+        return {
+            'processados': processados,
+            'atualizados': atualizados,
+            'falhas': falhas,
+            'requisicoes': requisicoes,
+            'reabre_em': reabre_em,
+            'erro': erro,
+        }
+
+    def _pass_failed(self, run_stats):
+        """
+        Indica se uma passagem falhou: abortada (erro ou circuito aberto) ou com todos
+        os processos consultados em falha.
+        """
+        if run_stats['erro'] or run_stats['reabre_em']:
+            return True
+        return bool(run_stats['processados']) and \
+            run_stats['falhas'] >= run_stats['processados']
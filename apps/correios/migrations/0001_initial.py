@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaixaCep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cep_inicial', models.CharField(max_length=8)),
+                ('cep_final', models.CharField(max_length=8)),
+                ('faixa', models.BooleanField(default=False)),
+                ('logradouro', models.CharField(blank=True, max_length=255)),
+                ('complemento', models.CharField(blank=True, max_length=100)),
+                ('bairro', models.CharField(blank=True, max_length=100)),
+                ('cidade', models.CharField(max_length=100)),
+                ('estado', models.CharField(max_length=2, verbose_name='UF')),
+            ],
+            options={
+                'verbose_name': 'Faixa de CEP',
+                'verbose_name_plural': 'Faixas de CEP',
+                'indexes': [models.Index(fields=['faixa', 'cep_inicial'], name='faixacep_faixa_inicial_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cep_inicial', 'cep_final'), name='unique_faixa_cep')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('correios', '0001_initial'),
+        ('samples', '0007_alter_tipoamostra_options_alter_tipoamostra_ordem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RastreioEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=10)),
+                ('tipo', models.CharField(max_length=10)),
+                ('data_hora', models.DateTimeField(verbose_name='Data/Hora do Evento (dtHrCriado)')),
+                ('descricao', models.CharField(blank=True, max_length=255)),
+                ('detalhe', models.TextField(blank=True)),
+                ('cidade', models.CharField(blank=True, max_length=100)),
+                ('uf', models.CharField(blank=True, max_length=2, verbose_name='UF')),
+                ('payload', models.JSONField(default=dict)),
+                ('registrado_em', models.DateTimeField(auto_now_add=True)),
+                ('processo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_rastreio', to='samples.processo')),
+            ],
+            options={
+                'verbose_name': 'Evento de Rastreio',
+                'verbose_name_plural': 'Eventos de Rastreio',
+                'ordering': ['-data_hora'],
+                'constraints': [models.UniqueConstraint(fields=('processo', 'codigo', 'tipo', 'data_hora'), name='unique_rastreio_evento')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('correios', '0002_rastreioevento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoRastreio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=32, unique=True)),
+                ('shard', models.CharField(max_length=20)),
+                ('ultimo_pk', models.BigIntegerField(default=0)),
+                ('processados', models.PositiveIntegerField(default=0)),
+                ('atualizados', models.PositiveIntegerField(default=0)),
+                ('falhas', models.PositiveIntegerField(default=0)),
+                ('iniciado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Execução de Rastreio',
+                'verbose_name_plural': 'Execuções de Rastreio',
+                'ordering': ['-iniciado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('correios', '0003_execucaorastreio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TravaExecucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('dono', models.CharField(max_length=32)),
+                ('expira_em', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Trava de Execução',
+                'verbose_name_plural': 'Travas de Execução',
+            },
+        ),
+    ]
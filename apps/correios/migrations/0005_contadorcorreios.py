@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('correios', '0004_travaexecucao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorCorreios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100, unique=True)),
+                ('valor', models.IntegerField(default=0)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Contador Correios',
+                'verbose_name_plural': 'Contadores Correios',
+            },
+        ),
+    ]
@@ -1,3 +1,203 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Cast
 
-# Create your models here.
+
+class FaixaCep(models.Model):
+    """
+    Base local de CEPs, importada de um arquivo no padrão DNE dos Correios
+    (comando 'import_zipcodes').
+
+    Cada registro representa:
+    - Um CEP específico (cep_inicial == cep_final), normalmente com logradouro; ou
+    - Uma faixa de CEPs de uma localidade (faixa=True), apenas com cidade/UF.
+
+    Os CEPs são gravados com 8 dígitos, de forma que a ordem alfabética coincide
+    com a ordem numérica e as buscas por faixa usam o índice de 'cep_inicial'.
+    """
+    cep_inicial = models.CharField(max_length=8)
+    cep_final = models.CharField(max_length=8)
+    faixa = models.BooleanField(default=False)
+
+    logradouro = models.CharField(max_length=255, blank=True)
+    complemento = models.CharField(max_length=100, blank=True)
+    bairro = models.CharField(max_length=100, blank=True)
+    cidade = models.CharField(max_length=100)
+    estado = models.CharField("UF", max_length=2)
+
+    class Meta:
+        verbose_name = "Faixa de CEP"
+        verbose_name_plural = "Faixas de CEP"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cep_inicial', 'cep_final'], name='unique_faixa_cep'),
+        ]
+        indexes = [
+            # Faixas com início <= CEP (via índice B-Tree), filtradas pelo término
+            models.Index(fields=['faixa', 'cep_inicial'],
+                         name='faixacep_faixa_inicial_idx'),
+        ]
+
+    def __str__(self):
+        if self.faixa:
+            return f"{self.cep_inicial}-{self.cep_final} ({self.cidade}/{self.estado})"
+        return f"{self.cep_inicial} - {self.logradouro} ({self.cidade}/{self.estado})"
+
+    @classmethod
+    def find(cls, zipcode):
+        """
+        Procura um CEP (8 dígitos) na base local.
+
+        Primeiro tenta o CEP exato; depois, a faixa de localidade que o contém. Se
+        houver faixas sobrepostas (ex: a de um município e a de um distrito dentro
+        dele), vale a mais estreita, que é a mais específica.
+
+        Returns:
+            A instância encontrada, ou None se o CEP não estiver coberto pela base.
+        """
+        exact_match = cls.objects.filter(
+            cep_inicial=zipcode, cep_final=zipcode).first()
+        if exact_match:
+            return exact_match
+
+        return cls.objects.filter(
+            faixa=True, cep_inicial__lte=zipcode, cep_final__gte=zipcode
+        ).order_by(
+            Cast('cep_final', models.IntegerField()) - Cast('cep_inicial', models.IntegerField()),
+            F('cep_inicial').desc(),
+        ).first()
+
+    def as_address(self, zipcode):
+        """
+        Converte o registro para o mesmo formato retornado por consult_zipcode.
+
+        Args:
+            zipcode: O CEP consultado (8 dígitos), devolvido no campo 'cep'.
+        """
+        return {
+            'logradouro': self.logradouro,
+            'bairro': self.bairro,
+            'cidade': self.cidade,
+            'estado': self.estado,
+            'cep': zipcode,
+            'complemento': self.complemento,
+        }
+
+
+class RastreioEvento(models.Model):
+    """
+    Evento de rastreamento dos Correios (API SRO) armazenado de forma estruturada.
+
+    A identidade do evento é (processo, código, tipo, data/hora de criação), e não o
+    texto exibido: mudanças de redação em 'detalhe' ou 'unidade' não geram duplicidade.
+    A Timeline (EventoTimeline) recebe apenas a projeção dos eventos realmente novos.
+    """
+    processo = models.ForeignKey(
+        'samples.Processo', on_delete=models.CASCADE, related_name='eventos_rastreio')
+
+    # Identificação do evento na API (ex: codigo='BDE', tipo='01')
+    codigo = models.CharField(max_length=10)
+    tipo = models.CharField(max_length=10)
+    data_hora = models.DateTimeField("Data/Hora do Evento (dtHrCriado)")
+
+    descricao = models.CharField(max_length=255, blank=True)
+    detalhe = models.TextField(blank=True)
+    cidade = models.CharField(max_length=100, blank=True)
+    uf = models.CharField("UF", max_length=2, blank=True)
+
+    # Resposta original da API para este evento (auditoria/reprocessamento)
+    payload = models.JSONField(default=dict)
+    registrado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-data_hora']
+        verbose_name = "Evento de Rastreio"
+        verbose_name_plural = "Eventos de Rastreio"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['processo', 'codigo', 'tipo', 'data_hora'],
+                name='unique_rastreio_evento'),
+        ]
+
+    def __str__(self):
+        return f"{self.codigo}/{self.tipo} {self.data_hora:%d/%m/%Y %H:%M} - {self.processo}"
+
+    @property
+    def chave(self):
+        """Chave de identidade do evento dentro do processo."""
+        return (self.codigo, self.tipo, self.data_hora)
+
+
+class ExecucaoRastreio(models.Model):
+    """
+    Ponto de controle (checkpoint) de uma execução do comando update_tracking.
+
+    Os processos são percorridos em ordem de id; 'ultimo_pk' guarda o maior id até o
+    qual todos os lotes já foram concluídos. Uma execução interrompida (queda, deploy,
+    API indisponível) fica sem 'finalizado_em' e pode ser retomada com --resume; se
+    ficar sem progresso por mais de uma hora, é encerrada pelo próprio comando.
+    """
+    run_id = models.CharField(max_length=32, unique=True)
+    # Fração processada, no formato do argumento --shard (ex: '0/1', '1/3')
+    shard = models.CharField(max_length=20)
+    ultimo_pk = models.BigIntegerField(default=0)
+
+    processados = models.PositiveIntegerField(default=0)
+    atualizados = models.PositiveIntegerField(default=0)
+    falhas = models.PositiveIntegerField(default=0)
+
+    iniciado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-iniciado_em']
+        verbose_name = "Execução de Rastreio"
+        verbose_name_plural = "Execuções de Rastreio"
+
+    def __str__(self):
+        return f"{self.run_id} (shard {self.shard}) - último id {self.ultimo_pk}"
+
+
+class TravaExecucao(models.Model):
+    """
+    Trava de execução compartilhada entre processos e hosts (ex: uma por shard do
+    comando update_tracking).
+
+    Fica no banco, e não no cache, porque o cache padrão (LocMemCache) é local a cada
+    processo. A trava é adquirida inserindo a linha (o 'nome' é único) ou assumindo uma
+    linha vencida com um UPDATE condicional; quem a detém renova 'expira_em' durante
+    a execução.
+    """
+    nome = models.CharField(max_length=100, unique=True)
+    # Identificador da execução que detém a trava
+    dono = models.CharField(max_length=32)
+    expira_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Trava de Execução"
+        verbose_name_plural = "Travas de Execução"
+
+    def __str__(self):
+        return f"{self.nome} ({self.dono}) até {self.expira_em}"
+
+
+class ContadorCorreios(models.Model):
+    """
+    Contador com validade (ex: cota por segundo do limitador de taxa, autenticações
+    por hora), usado quando o backend de cache não incrementa de forma atômica.
+
+    O cache.incr do DatabaseCache e do FileBasedCache é uma leitura seguida de uma
+    gravação: workers simultâneos sobrescrevem a contagem uns dos outros (e a gravação
+    troca a validade pelo timeout padrão). Aqui o incremento é um UPDATE com F().
+    """
+    chave = models.CharField(max_length=100, unique=True)
+    valor = models.IntegerField(default=0)
+    expira_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Contador Correios"
+        verbose_name_plural = "Contadores Correios"
+
+    def __str__(self):
+        return f"{self.chave} = {self.valor}"
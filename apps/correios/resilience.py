@@ -0,0 +1,331 @@
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContadorCorreios
+
+logger = logging.getLogger(__name__)
+
+
+# Famílias de endpoint da API dos Correios, cada uma com o seu próprio circuito
+ENDPOINT_FAMILIES = ('token', 'cep', 'sro', 'preco', 'prazo')
+
+STATE_CLOSED = 'fechado'
+STATE_OPEN = 'aberto'
+STATE_HALF_OPEN = 'semiaberto'
+
+# Prioridades das chamadas: interativas (usuário aguardando na tela) têm preferência
+# sobre as de background (comando update_tracking), que absorvem a limitação de taxa
+PRIORITY_INTERACTIVE = 'interativa'
+PRIORITY_BACKGROUND = 'background'
+
+# Backends de cache cujo incr é atômico. Nos demais (DatabaseCache, FileBasedCache)
+# o incr é uma leitura seguida de uma gravação, e os contadores ficam no banco
+ATOMIC_INCR_CACHE_BACKENDS = ('locmem', 'redis', 'memcached')
+
+
+def _cache_incr_is_atomic():
+    """Retorna True se o cache padrão incrementa contadores de forma atômica."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '').lower()
+    return any(name in backend for name in ATOMIC_INCR_CACHE_BACKENDS)
+
+
+def increment_counter(key, timeout):
+    """
+    Incrementa um contador com validade, de forma atômica entre threads e workers.
+
+    Usa o cache quando o backend tem incr atômico; senão, um UPDATE com F() em
+    ContadorCorreios (criando a linha, ou recriando-a se estiver vencida).
+
+    Args:
+        key: Chave do contador.
+        timeout: Validade, em segundos, a partir da criação do contador.
+
+    Returns:
+        O valor do contador após o incremento.
+    """
+    if _cache_incr_is_atomic():
+        cache.add(key, 0, timeout=timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # A chave expirou entre o add e o incr
+            cache.set(key, 1, timeout=timeout)
+            return 1
+
+    now = timezone.now()
+    counters = ContadorCorreios.objects.filter(chave=key)
+
+    if not counters.filter(expira_em__gt=now).update(valor=F('valor') + 1):
+        # Contador novo ou vencido: remove os vencidos (de todas as chaves) e cria
+        ContadorCorreios.objects.filter(expira_em__lte=now).delete()
+        try:
+            with transaction.atomic():
+                ContadorCorreios.objects.create(
+                    chave=key, valor=1, expira_em=now + timedelta(seconds=timeout))
+            return 1
+        except IntegrityError:
+            # Outro worker criou o contador ao mesmo tempo
+            counters.update(valor=F('valor') + 1)
+
+    return counters.values_list('valor', flat=True).first() or 1
+
+
+def decrement_counter(key):
+    """Desfaz um incremento de increment_counter (ignorado se o contador já expirou)."""
+    if _cache_incr_is_atomic():
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        return
+
+    ContadorCorreios.objects.filter(chave=key).update(valor=F('valor') - 1)
+
+
+def get_counters(keys):
+    """
+    Lê vários contadores de increment_counter.
+
+    Returns:
+        Dicionário {chave: valor} apenas com os contadores ainda válidos.
+    """
+    if _cache_incr_is_atomic():
+        return cache.get_many(keys)
+
+    return dict(ContadorCorreios.objects.filter(
+        chave__in=keys, expira_em__gt=timezone.now()).values_list('chave', 'valor'))
+
+
+class CorreiosIndisponivelError(Exception):
+    """
+    Lançada quando o circuito de um endpoint dos Correios está aberto.
+
+    A chamada é recusada imediatamente, sem esperar o timeout HTTP.
+    """
+
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = max(1, int(retry_after))
+        super().__init__(
+            f"API dos Correios ({endpoint}) indisponível no momento. "
+            f"Tente novamente em {self.retry_after}s.")
+
+
+class CorreiosLimiteTaxaError(CorreiosIndisponivelError):
+    """
+    Lançada quando o limite de requisições por segundo de um endpoint foi atingido e
+    a chamada não pôde aguardar a próxima janela.
+    """
+
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = max(1, int(retry_after + 0.999))
+        Exception.__init__(
+            self,
+            f"Limite de requisições à API dos Correios ({endpoint}) atingido. "
+            f"Tente novamente em {self.retry_after}s.")
+
+
+class CircuitBreaker:
+    """
+    Disjuntor (circuit breaker) de uma família de endpoints da API dos Correios.
+
+    O estado fica no cache do Django, sendo compartilhado entre threads e, com um
+    cache compartilhado (Redis, banco), entre todos os workers:
+
+    - fechado: chamadas liberadas; falhas consecutivas são contadas.
+    - aberto: após 'limite_falhas' falhas, chamadas são recusadas por 'tempo_aberto' segundos.
+    - semiaberto: passado esse tempo, uma única chamada de teste é liberada; se ela
+      funcionar o circuito fecha, se falhar ele volta a abrir.
+    """
+
+    CACHE_KEY = 'correios_circuito'
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+        breaker_settings = getattr(settings, 'CORREIOS_CIRCUIT_BREAKER', {})
+        self.failure_threshold = breaker_settings.get('limite_falhas', 5)
+        self.failure_window = breaker_settings.get('janela', 60)
+        self.open_seconds = breaker_settings.get('tempo_aberto', 30)
+
+        self._state_key = f"{self.CACHE_KEY}:{endpoint}"
+        self._failures_key = f"{self.CACHE_KEY}:{endpoint}:falhas"
+        self._probe_key = f"{self.CACHE_KEY}:{endpoint}:teste"
+
+    def _read_state(self):
+        """Retorna o registro {'aberto_ate': timestamp} do circuito aberto, ou None."""
+        return cache.get(self._state_key)
+
+    def get_state(self):
+        """
+        Retorna o estado atual do circuito.
+
+        Returns:
+            Dicionário com 'estado', 'falhas' e 'reabre_em' (segundos até liberar
+            a chamada de teste, 0 se o circuito não estiver aberto).
+        """
+        record = self._read_state()
+        failures = cache.get(self._failures_key, 0)
+
+        if not record:
+            return {'estado': STATE_CLOSED, 'falhas': failures, 'reabre_em': 0}
+
+        remaining = record['aberto_ate'] - time.time()
+        if remaining > 0:
+            return {'estado': STATE_OPEN, 'falhas': failures, 'reabre_em': int(remaining) + 1}
+
+        return {'estado': STATE_HALF_OPEN, 'falhas': failures, 'reabre_em': 0}
+
+    def is_open(self):
+        """Retorna True se as chamadas estão sendo recusadas (circuito aberto)."""
+        return self.get_state()['estado'] == STATE_OPEN
+
+    def before_request(self):
+        """
+        Verifica se a chamada pode ser feita.
+
+        Raises:
+            CorreiosIndisponivelError: Se o circuito estiver aberto, ou semiaberto com
+                a chamada de teste já em andamento em outro chamador.
+        """
+        record = self._read_state()
+        if not record:
+            return
+
+        remaining = record['aberto_ate'] - time.time()
+        if remaining > 0:
+            raise CorreiosIndisponivelError(self.endpoint, remaining)
+
+        # Semiaberto: apenas um chamador faz a chamada de teste
+        if not cache.add(self._probe_key, True, timeout=self.open_seconds):
+            raise CorreiosIndisponivelError(self.endpoint, self.open_seconds)
+
+    def release_probe(self):
+        """Libera a chamada de teste do circuito semiaberto sem registrar resultado."""
+        cache.delete(self._probe_key)
+
+    def record_success(self):
+        """Fecha o circuito e zera a contagem de falhas."""
+        # Caminho comum (circuito fechado e sem falhas): apenas uma leitura no cache
+        pending = cache.get_many([self._state_key, self._failures_key])
+        if not pending:
+            return
+
+        if self._state_key in pending:
+            logger.info(f"✅ Circuito Correios ({self.endpoint}) fechado: API respondendo.")
+        cache.delete_many([self._state_key, self._failures_key, self._probe_key])
+
+    def record_failure(self):
+        """Conta uma falha e abre o circuito ao atingir o limite (ou se a chamada de teste falhou)."""
+        cache.add(self._failures_key, 0, timeout=self.failure_window)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            # A contagem expirou entre o add e o incr
+            cache.set(self._failures_key, 1, timeout=self.failure_window)
+            failures = 1
+
+        half_open = self._read_state() is not None
+        if half_open or failures >= self.failure_threshold:
+            self.open()
+
+    def open(self):
+        """Abre o circuito por 'tempo_aberto' segundos."""
+        # O registro dura mais que o tempo aberto para permitir o estado semiaberto
+        cache.set(self._state_key, {'aberto_ate': time.time() + self.open_seconds},
+                  timeout=self.open_seconds * 10)
+        cache.delete(self._probe_key)
+        logger.warning(
+            f"⛔ Circuito Correios ({self.endpoint}) aberto por {self.open_seconds}s após falhas seguidas.")
+
+
+class RateLimiter:
+    """
+    Limitador de taxa das chamadas de uma família de endpoints da API dos Correios.
+
+    A cota ('requisicoes_por_segundo') é contada em janelas de 1 segundo com
+    increment_counter: no cache, se o backend incrementa de forma atômica (LocMem,
+    Redis, Memcached), ou em ContadorCorreios no banco (ex: com o DatabaseCache, cujo
+    incr não é atômico). Com Redis/Memcached ou no banco, a cota vale entre workers.
+
+    Chamadas interativas podem usar toda a cota da janela; as de background usam
+    apenas a parte não reservada ('reserva_interativa') e aguardam a próxima janela
+    quando ela se esgota. Assim, nos picos, quem espera é o comando em lote.
+    """
+
+    CACHE_KEY = 'correios_taxa'
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+        limit_settings = getattr(settings, 'CORREIOS_RATE_LIMIT', {})
+        # 0 (ou ausente) desativa o limite para a família
+        self.rate = limit_settings.get(
+            'requisicoes_por_segundo', {}).get(endpoint, 0)
+        reserve = limit_settings.get('reserva_interativa', 0.3)
+        self.background_rate = max(1, int(self.rate * (1 - reserve)))
+
+        self.max_wait = {
+            PRIORITY_INTERACTIVE: limit_settings.get('espera_interativa', 2),
+            PRIORITY_BACKGROUND: limit_settings.get('espera_background', 60),
+        }
+
+    def _try_acquire(self, limit):
+        """
+        Tenta consumir uma requisição da janela atual.
+
+        Returns:
+            True se a requisição cabe no limite informado.
+        """
+        window_key = f"{self.CACHE_KEY}:{self.endpoint}:{int(time.time())}"
+
+        if increment_counter(window_key, timeout=5) <= limit:
+            return True
+
+        # Devolve a contagem para não consumir a cota de quem tem prioridade
+        decrement_counter(window_key)
+        return False
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """
+        Aguarda uma vaga na cota da família, conforme a prioridade da chamada.
+
+        Args:
+            priority: PRIORITY_INTERACTIVE ou PRIORITY_BACKGROUND.
+
+        Raises:
+            CorreiosLimiteTaxaError: Se não houver vaga dentro do tempo máximo de
+                espera da prioridade ('espera_interativa' ou 'espera_background').
+        """
+        if not self.rate:
+            return
+
+        limit = self.rate if priority == PRIORITY_INTERACTIVE else self.background_rate
+        deadline = time.monotonic() + self.max_wait.get(priority, 0)
+
+        while not self._try_acquire(limit):
+            # Aguarda o início da próxima janela, com uma pequena variação aleatória
+            # para que os chamadores em espera não disputem a vaga ao mesmo tempo
+            sleep_seconds = 1 - (time.time() % 1) + random.uniform(0, 0.05)
+            if time.monotonic() + sleep_seconds > deadline:
+                raise CorreiosLimiteTaxaError(self.endpoint, sleep_seconds)
+            time.sleep(sleep_seconds)
+
+
+def get_circuit_states():
+    """
+    Retorna o estado do circuito de cada família de endpoint.
+
+    Returns:
+        Dicionário {familia: {'estado', 'falhas', 'reabre_em'}}.
+    """
+    return {endpoint: CircuitBreaker(endpoint).get_state() for endpoint in ENDPOINT_FAMILIES}
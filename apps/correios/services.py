@@ -1,14 +1,105 @@
 from django.conf import settings
 from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import requests
 import base64
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 import logging
 
+from .caching import LRUCache
+from .models import FaixaCep
+from .resilience import (
+    PRIORITY_INTERACTIVE, STATE_OPEN, CircuitBreaker, CorreiosIndisponivelError,
+    RateLimiter, get_counters, increment_counter,
+)
+
 # Configura o logger para este módulo
 logger = logging.getLogger(__name__)
 
 
+# --- SESSÃO HTTP COMPARTILHADA ---
+# Uma única Session por processo reaproveita as conexões TCP/TLS abertas com a API
+# (keep-alive), evitando um novo handshake a cada consulta de CEP, cotação ou rastreio.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def _build_http_session():
+    """
+    Cria a Session HTTP com pool de conexões dimensionado e política de retentativas.
+
+    As retentativas cobrem apenas falhas de conexão e respostas 5xx de consultas GET,
+    com backoff exponencial curto (limitado a 'backoff_max' segundos) e jitter.
+    Respostas 429 e o cabeçalho 'Retry-After' NÃO são tratados aqui: uma espera longa
+    dentro de session.request prenderia o worker e escaparia do RateLimiter e do
+    CircuitBreaker, que são quem controla a vazão e a indisponibilidade da API.
+
+    Returns:
+        Uma instância de requests.Session pronta para uso.
+    """
+    http_settings = getattr(settings, 'CORREIOS_HTTP', {})
+
+    retry_policy = Retry(
+        total=http_settings.get('max_retries', 3),
+        # Não repete em timeout de leitura: a espera já foi paga uma vez
+        read=0,
+        backoff_factor=http_settings.get('backoff_factor', 0.5),
+        backoff_jitter=http_settings.get('backoff_jitter', 0.3),
+        backoff_max=http_settings.get('backoff_max', 2),
+        status_forcelist=(500, 502, 503, 504),
+        # Respostas de erro em POST (token, preço, prazo) voltam direto ao chamador;
+        # falhas de conexão são repetidas em qualquer método (a requisição não chegou)
+        allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+
+    pool_size = http_settings.get('pool_maxsize', 20)
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry_policy,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_session():
+    """
+    Retorna a Session HTTP compartilhada pelo processo, criando-a na primeira chamada.
+
+    A Session pode ser usada por várias threads (ex: gunicorn com threads ou o pool
+    do update_tracking): nenhum estado é alterado nela após a criação (os cabeçalhos
+    são enviados a cada chamada) e o pool de conexões do urllib3 é thread-safe.
+    """
+    global _http_session
+
+    if _http_session is None:
+        with _http_session_lock:
+            # Verificação dupla: outra thread pode ter criado a Session enquanto esperávamos
+            if _http_session is None:
+                _http_session = _build_http_session()
+
+    return _http_session
+
+
+# --- CACHE DE CEP ---
+# 1ª camada: LRU em memória do processo. 2ª camada: cache compartilhado do Django.
+# Endereços de um CEP praticamente não mudam, então os TTLs podem ser longos.
+_zipcode_memory_cache = LRUCache(
+    max_size=getattr(settings, 'CORREIOS_CEP_CACHE', {}).get('lru_tamanho', 2048))
+
+# Marcador gravado no cache para CEPs que a API informou como inexistentes (404)
+ZIPCODE_NOT_FOUND = 'nao_encontrado'
+
+
 class CorreiosService:
     """
     Classe responsável por gerenciar a interação com a API CWS dos Correios.
@@ -18,10 +109,32 @@ class CorreiosService:
     # Chave para identificar e armazenar o token de autenticação no cache do Django
     CACHE_KEY = 'correios_api_token'
 
-    def __init__(self):
+    # Trava (single-flight) para que apenas um chamador renove o token por vez,
+    # mesmo entre workers diferentes (desde que o cache seja compartilhado)
+    TOKEN_LOCK_KEY = 'correios_api_token_lock'
+    TOKEN_LOCK_TIMEOUT = 30  # segundos
+    # Tempo máximo que um chamador sem token aguarda a renovação feita por outro
+    TOKEN_WAIT_SECONDS = 5
+
+    # Prefixo dos contadores de autenticações por hora (ex: 'correios_auth_count:2025120113')
+    AUTH_COUNTER_KEY = 'correios_auth_count'
+
+    # Prefixo das chaves de CEP no cache compartilhado (ex: 'correios_cep:29000000')
+    ZIPCODE_CACHE_KEY = 'correios_cep'
+
+    # Quantidade máxima de objetos aceita pela API SRO em uma única consulta
+    SRO_BATCH_SIZE = 50
+
+    def __init__(self, prioridade=PRIORITY_INTERACTIVE):
         """
         Inicializa o serviço carregando as credenciais definidas no settings do Django.
+
+        Args:
+            prioridade: PRIORITY_INTERACTIVE (padrão, telas do sistema) ou
+                PRIORITY_BACKGROUND (rotinas em lote), usada pelo limitador de taxa.
         """
+        self.prioridade = prioridade
+
         # Carrega as configurações definidas no settings.py
         credentials = getattr(settings, 'CORREIOS_CREDENTIALS', {})
 
@@ -33,20 +146,22 @@ class CorreiosService:
         self.card_number = credentials.get('cartao')
 
         # Tenta recuperar um token existente do cache para evitar reautenticação desnecessária
-        self._token = cache.get(self.CACHE_KEY)
+        self._token_record = self._read_token_record()
+        self._token = self._token_record['token'] if self._token_record else None
 
-    def get_token_timeout(self, timeout_date):
+    def get_token_timeout(self, timeout_date, safety_minutes=10):
         """
         Calcula a duração do timeout do cache em segundos com base em uma string \
-        de data/hora de expiração, subtraindo um buffer de segurança de 10 minutos.
+        de data/hora de expiração, subtraindo um buffer de segurança (padrão 10 minutos).
 
         Args:
             timeout_date: Uma string representando o horário de expiração \
             no formato 'YYYY-MM-DDTHH:MM:SS' (ex: '2025-12-01T13:35:50').
+            safety_minutes: Minutos subtraídos do horário de expiração.
 
         Returns:
             A duração do timeout em segundos (inteiro). Retorna 0 se o tempo de \
-            expiração já passou ou for muito próximo (menos de 10 minutos).
+            expiração já passou ou for muito próximo (menos que o buffer).
         """
         # Define o formato esperado da string de entrada (padrão resposta Correios)
         datetime_format = '%Y-%m-%dT%H:%M:%S'
@@ -54,10 +169,10 @@ class CorreiosService:
         # Converte a string de entrada para um objeto datetime
         timeout_date_convert = datetime.strptime(timeout_date, datetime_format)
 
-        # Define o buffer de segurança (10 minutos) usando timedelta
-        safety_buffer = timedelta(minutes=10)
+        # Define o buffer de segurança usando timedelta
+        safety_buffer = timedelta(minutes=safety_minutes)
 
-        # Calcula o horário exato em que o cache deve expirar (10 minutos antes da expiração real)
+        # Calcula o horário exato em que o cache deve expirar (antes da expiração real)
         cache_timeout = timeout_date_convert - safety_buffer
 
         # Calcula a duração restante a partir do horário atual até o horário de expiração do cache
@@ -69,6 +184,61 @@ class CorreiosService:
         # Retorna o resultado, garantindo que o valor mínimo seja 0 (para evitar timeouts negativos no Django)
         return max(0, timeout_seconds)
 
+    def _request(self, method, endpoint, url, **kwargs):
+        """
+        Executa uma chamada HTTP à API pela Session compartilhada.
+
+        Args:
+            method: Método HTTP ('GET' ou 'POST').
+            endpoint: Família do endpoint ('token', 'cep', 'sro', 'preco', 'prazo'),
+                usada para escolher o timeout configurado em CORREIOS_HTTP.
+            url: URL completa da chamada.
+            **kwargs: Parâmetros repassados ao requests (headers, params, json...).
+
+        Cada família passa pelo limitador de taxa, que pode fazer a chamada aguardar
+        conforme a prioridade do serviço, e só então pelo circuit breaker: assim a
+        chamada de teste do circuito semiaberto só é liberada para quem já tem cota.
+        Falhas seguidas (erro de conexão, timeout ou 5xx) abrem o circuito e as
+        chamadas seguintes falham na hora. Respostas 429 não contam como falha: a
+        limitação é tratada pelo limitador, e não deve derrubar a API para todos.
+
+        Returns:
+            O objeto requests.Response da chamada.
+
+        Raises:
+            CorreiosIndisponivelError: Se o circuito da família estiver aberto, ou
+                CorreiosLimiteTaxaError (subclasse) se o limite de taxa não liberar a chamada.
+        """
+        http_settings = getattr(settings, 'CORREIOS_HTTP', {})
+        read_timeout = http_settings.get('timeouts', {}).get(endpoint, 10)
+        connect_timeout = http_settings.get('connect_timeout', 3.05)
+
+        breaker = CircuitBreaker(endpoint)
+        # Circuito aberto: falha na hora, sem aguardar (nem gastar) a cota do limitador
+        breaker_state = breaker.get_state()
+        if breaker_state['estado'] == STATE_OPEN:
+            raise CorreiosIndisponivelError(endpoint, breaker_state['reabre_em'])
+
+        RateLimiter(endpoint).acquire(self.prioridade)
+        breaker.before_request()
+
+        kwargs.setdefault('timeout', (connect_timeout, read_timeout))
+        try:
+            response = get_http_session().request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        elif response.status_code == 429:
+            # Sem veredito sobre a API: libera a chamada de teste (se era uma) para
+            # que o próximo chamador possa fazê-la
+            breaker.release_probe()
+        else:
+            breaker.record_success()
+        return response
+
     def _get_auth_header(self):
         """
         Gera o cabeçalho 'Authorization' no formato Basic Auth para a autenticação inicial.
@@ -107,8 +277,8 @@ class CorreiosService:
 
         try:
             # Envia a requisição POST com timeout de 10 segundos
-            response = requests.post(
-                auth_url, json=payload, headers=headers, timeout=10)
+            response = self._request(
+                'POST', 'token', auth_url, json=payload, headers=headers)
 
             # --- BLINDAGEM ---
             # Verifica se a resposta foi bem-sucedida (Status 200 OK ou 201 Created)
@@ -120,22 +290,179 @@ class CorreiosService:
 
             # Processa a resposta JSON
             api_data = response.json()
-            self._token = api_data.get('token')
+            token = api_data.get('token')
 
             # Se o token foi recebido, calcula o tempo de vida e salva no cache
-            if self._token:
+            if token:
                 expiration_str = api_data.get('expiraEm')
-                token_timeout_seconds = self.get_token_timeout(expiration_str)
 
-                cache.set(self.CACHE_KEY, self._token,
-                          timeout=token_timeout_seconds)
+                # O token continua utilizável até 1 minuto antes de expirar, mas a
+                # renovação começa 10 minutos antes (janela de renovação antecipada)
+                valid_seconds = self.get_token_timeout(
+                    expiration_str, safety_minutes=1)
+                renew_seconds = self.get_token_timeout(expiration_str)
+
+                now = time.time()
+                self._token_record = {
+                    'token': token,
+                    'expira_em': now + valid_seconds,
+                    'renovar_em': now + renew_seconds,
+                }
+                cache.set(self.CACHE_KEY, self._token_record,
+                          timeout=valid_seconds)
+
+                self._count_authentication()
 
+            self._token = token
             return self._token
 
+        except CorreiosIndisponivelError:
+            raise
         except Exception as error:
             logger.exception(f"Erro de conexão durante autenticação: {error}")
             return None
 
+    # --- CONTROLE DO TOKEN (SINGLE-FLIGHT) ---
+
+    def _read_token_record(self):
+        """
+        Lê do cache o registro do token atual.
+
+        Returns:
+            Dicionário {'token', 'expira_em', 'renovar_em'} (timestamps em segundos),
+            ou None se não houver token em cache.
+        """
+        record = cache.get(self.CACHE_KEY)
+
+        # Compatibilidade com o formato antigo (apenas a string do token)
+        if isinstance(record, str):
+            return {'token': record, 'expira_em': None, 'renovar_em': float('inf')}
+
+        return record
+
+    def _acquire_token_lock(self):
+        """
+        Tenta adquirir a trava de renovação do token.
+
+        Returns:
+            O identificador do dono da trava, ou None se outro chamador já a possui.
+        """
+        owner = uuid.uuid4().hex
+        # cache.add só grava se a chave não existir (operação atômica no backend)
+        if cache.add(self.TOKEN_LOCK_KEY, owner, timeout=self.TOKEN_LOCK_TIMEOUT):
+            return owner
+        return None
+
+    def _release_token_lock(self, owner):
+        """Libera a trava de renovação, apenas se ela ainda pertencer a este chamador."""
+        if cache.get(self.TOKEN_LOCK_KEY) == owner:
+            cache.delete(self.TOKEN_LOCK_KEY)
+
+    def _renew_token(self, owner):
+        """Autentica na API e libera a trava ao final."""
+        try:
+            return self.authenticate()
+        finally:
+            self._release_token_lock(owner)
+
+    def _renew_token_in_background(self, owner):
+        """Renovação em background: o token atual segue em uso se a API estiver fora."""
+        try:
+            self._renew_token(owner)
+        except CorreiosIndisponivelError as error:
+            logger.warning(f"Renovação do token adiada: {error}")
+
+    def _count_authentication(self):
+        """
+        Incrementa o contador de autenticações da hora atual.
+
+        O incremento é atômico mesmo com o DatabaseCache (ver increment_counter) e
+        mantém a validade de 48h, permitindo consultas do dia anterior.
+        """
+        counter_key = f"{self.AUTH_COUNTER_KEY}:{datetime.now():%Y%m%d%H}"
+        total = increment_counter(counter_key, timeout=48 * 3600)
+
+        logger.info(
+            f"🔑 Token dos Correios renovado ({total} autenticação(ões) nesta hora).")
+
+    @classmethod
+    def get_authentication_counts(cls, hours=24):
+        """
+        Retorna a quantidade de autenticações realizadas em cada uma das últimas horas.
+
+        Args:
+            hours: Quantidade de horas a consultar (contando a hora atual).
+
+        Returns:
+            Lista de tuplas ('YYYY-MM-DD HH:00', total), da hora mais antiga para a atual.
+        """
+        now = datetime.now()
+        hour_slots = [now - timedelta(hours=offset)
+                      for offset in range(hours - 1, -1, -1)]
+        keys = [f"{cls.AUTH_COUNTER_KEY}:{slot:%Y%m%d%H}" for slot in hour_slots]
+        counters = get_counters(keys)
+
+        return [
+            (f"{slot:%Y-%m-%d %H}:00", counters.get(key, 0))
+            for slot, key in zip(hour_slots, keys)
+        ]
+
+    def _get_valid_token(self):
+        """
+        Retorna um token válido, renovando-o com no máximo um chamador por vez.
+
+        Regras:
+        1. Token fora da janela de renovação: usado diretamente.
+        2. Token na janela de renovação (ainda válido): apenas quem obtiver a trava
+           renova (em background, se CORREIOS_TOKEN_RENOVACAO_BACKGROUND estiver ativo);
+           os demais continuam usando o token atual.
+        3. Sem token: quem obtiver a trava autentica; os demais aguardam até
+           TOKEN_WAIT_SECONDS pelo novo token no cache.
+
+        Returns:
+            A string do token, ou None se não foi possível obtê-lo.
+        """
+        # Evita ler o cache a cada chamada enquanto o token local não precisa de renovação
+        record = self._token_record
+        if not record or time.time() >= record['renovar_em']:
+            record = self._read_token_record()
+            self._token_record = record
+
+        if record and time.time() < record['renovar_em']:
+            return record['token']
+
+        owner = self._acquire_token_lock()
+
+        if record:
+            # Token ainda válido: quem não obteve a trava segue usando o atual
+            if not owner:
+                return record['token']
+
+            if getattr(settings, 'CORREIOS_TOKEN_RENOVACAO_BACKGROUND', False):
+                threading.Thread(
+                    target=self._renew_token_in_background, args=(owner,), daemon=True).start()
+                return record['token']
+
+            try:
+                return self._renew_token(owner) or record['token']
+            except CorreiosIndisponivelError:
+                return record['token']
+
+        if owner:
+            return self._renew_token(owner)
+
+        # Outro chamador está autenticando: aguarda o novo token aparecer no cache
+        deadline = time.monotonic() + self.TOKEN_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            record = self._read_token_record()
+            if record:
+                self._token_record = record
+                return record['token']
+
+        # O dono da trava provavelmente falhou; última tentativa por conta própria
+        return self.authenticate()
+
     def get_headers(self):
         """
         Retorna os cabeçalhos padrão para chamadas autenticadas, renovando o token se necessário.
@@ -144,11 +471,11 @@ class CorreiosService:
             Um dicionário com Authorization (Bearer), Content-Type e Accept.
 
         Raises:
+            CorreiosIndisponivelError: Se o circuito do endpoint de token estiver aberto.
             Exception: Se não for possível obter um token válido.
         """
-        # Verifica se o token existe; se não, tenta autenticar novamente
-        if not self._token:
-            self.authenticate()
+        # Obtém o token atual ou renova (com trava single-flight) se necessário
+        self._token = self._get_valid_token()
 
         # Se ainda assim não houver token, lança exceção crítica
         if not self._token:
@@ -165,17 +492,71 @@ class CorreiosService:
 
     # --- MÉTODOS DE SERVIÇO ---
 
+    def _get_cached_zipcode(self, sanitized_zipcode):
+        """
+        Procura o CEP nas duas camadas de cache (memória local e cache compartilhado).
+
+        Returns:
+            O dicionário de endereço, o marcador ZIPCODE_NOT_FOUND, ou None se não houver cache.
+        """
+        cached = _zipcode_memory_cache.get(sanitized_zipcode)
+        if cached is not None:
+            return cached
+
+        cached = cache.get(f"{self.ZIPCODE_CACHE_KEY}:{sanitized_zipcode}")
+        if cached is not None:
+            # Promove para a camada em memória, respeitando o TTL curto dos negativos
+            cache_settings = getattr(settings, 'CORREIOS_CEP_CACHE', {})
+            timeout = cache_settings.get('ttl_memoria', 86400)
+            if cached == ZIPCODE_NOT_FOUND:
+                timeout = min(timeout, cache_settings.get('ttl_nao_encontrado', 3600))
+            _zipcode_memory_cache.set(sanitized_zipcode, cached, timeout)
+
+        return cached
+
+    def _set_cached_zipcode(self, sanitized_zipcode, value):
+        """
+        Grava o resultado da consulta de CEP nas duas camadas de cache.
+
+        Args:
+            sanitized_zipcode: CEP com 8 dígitos.
+            value: Dicionário de endereço ou o marcador ZIPCODE_NOT_FOUND (TTL curto).
+        """
+        cache_settings = getattr(settings, 'CORREIOS_CEP_CACHE', {})
+
+        if value == ZIPCODE_NOT_FOUND:
+            shared_timeout = cache_settings.get('ttl_nao_encontrado', 3600)
+            memory_timeout = shared_timeout
+        else:
+            shared_timeout = cache_settings.get('ttl', 30 * 86400)
+            memory_timeout = cache_settings.get('ttl_memoria', 86400)
+
+        cache.set(f"{self.ZIPCODE_CACHE_KEY}:{sanitized_zipcode}",
+                  value, timeout=shared_timeout)
+        _zipcode_memory_cache.set(sanitized_zipcode, value, memory_timeout)
+
     def consult_zipcode(self, zipcode):
         """
         Consulta informações de endereço via API CWS Correios.
         Endpoint: /cep/v1/enderecos/{cep}
 
+        Os resultados (inclusive CEPs inexistentes, por um período curto) ficam em cache
+        em memória e no cache compartilhado, evitando chamadas repetidas à API.
+
+        Antes da API, o CEP é procurado na base local (FaixaCep, importada via
+        'import_zipcodes'). Um CEP exato da base é retornado sem acesso à rede; um CEP
+        coberto apenas por uma faixa de localidade só é usado se a API falhar.
+
         Args:
             zipcode: O CEP a ser consultado (string ou int), com ou sem formatação.
 
         Returns:
             Um dicionário contendo logradouro, bairro, cidade, estado e cep.
             Retorna None se o CEP não for encontrado ou houver erro.
+
+        Raises:
+            CorreiosIndisponivelError: Se a API estiver com o circuito aberto e o CEP
+                não estiver na base local.
         """
         # Remove caracteres não numéricos para garantir o formato correto (8 dígitos)
         sanitized_zipcode = str(zipcode).replace(
@@ -184,6 +565,19 @@ class CorreiosService:
         if len(sanitized_zipcode) != 8:
             return None
 
+        # Consulta o cache antes de acionar a API
+        cached = self._get_cached_zipcode(sanitized_zipcode)
+        if cached == ZIPCODE_NOT_FOUND:
+            return None
+        if cached is not None:
+            # Cópia para que o chamador não altere o valor guardado em memória
+            return dict(cached)
+
+        # Base local (offline): CEP exato responde sem rede
+        local_match = FaixaCep.find(sanitized_zipcode)
+        if local_match and not local_match.faixa:
+            return local_match.as_address(sanitized_zipcode)
+
         # Monta a URL de consulta
         endpoint_url = f"{self.base_url}/cep/v1/enderecos/{sanitized_zipcode}"
 
@@ -192,13 +586,14 @@ class CorreiosService:
             headers = self.get_headers()
 
             # Realiza a chamada GET
-            response = requests.get(endpoint_url, headers=headers, timeout=10)
+            response = self._request(
+                'GET', 'cep', endpoint_url, headers=headers)
 
             if response.status_code == 200:
                 address_data = response.json()
 
                 # Mapeia a resposta da API (que usa 'localidade') para o padrão interno do sistema
-                return {
+                address = {
                     'logradouro': address_data.get('logradouro', ''),
                     'bairro': address_data.get('bairro', ''),
                     # Correios usa 'localidade'
@@ -207,44 +602,65 @@ class CorreiosService:
                     'cep': address_data.get('cep', ''),
                     'complemento': address_data.get('complemento', ''),
                 }
+                self._set_cached_zipcode(sanitized_zipcode, address)
+                return dict(address)
             elif response.status_code == 404:
                 logger.info(
                     f"CEP não encontrado na base Correios: {sanitized_zipcode}")
+                # Cache negativo: evita repetir a consulta enquanto o usuário digita
+                self._set_cached_zipcode(sanitized_zipcode, ZIPCODE_NOT_FOUND)
                 return None
             else:
                 logger.error(
                     f"Erro API CEP Correios: {response.status_code} - {response.text}")
-                return None
 
+        except CorreiosIndisponivelError:
+            # Circuito aberto: responde pela base local ou falha na hora
+            if local_match:
+                return local_match.as_address(sanitized_zipcode)
+            raise
         except Exception as error:
             logger.error(f"Erro de conexão (CEP): {error}")
-            return None
 
-    def track_object(self, tracking_code):
+        # API indisponível: usa a faixa de localidade da base local, se houver
+        if local_match:
+            return local_match.as_address(sanitized_zipcode)
+        return None
+
+    def sanitize_tracking_code(self, tracking_code):
+        """Remove caracteres especiais e padroniza o código de rastreio em maiúsculas."""
+        return str(tracking_code).replace(
+            '-', '').replace('.', '').strip().upper()
+
+    def track_object(self, tracking_code, resultado='T'):
         """
         Consulta o histórico de eventos de um objeto na API SRO (Rastreamento).
 
         Args:
             tracking_code: O código de rastreio do objeto (ex: 'AA123456789BR').
+            resultado: 'T' para todos os eventos do histórico ou 'U' para apenas o
+                último (resposta menor, usada para detectar se houve novidade).
 
         Returns:
             Um dicionário contendo os dados do objeto e a lista de eventos.
             Retorna None se houver erro ou o objeto não for encontrado.
+
+        Raises:
+            CorreiosIndisponivelError: Se a API estiver com o circuito aberto.
         """
         # Remove caracteres especiais e padroniza para maiúsculas
-        sanitized_code = str(tracking_code).replace(
-            '-', '').replace('.', '').strip().upper()
+        sanitized_code = self.sanitize_tracking_code(tracking_code)
 
         # Monta a URL do endpoint SRO
         endpoint_url = f"{self.base_url}/srorastro/v1/objetos/{sanitized_code}"
 
-        # Parâmetro 'resultado=T' solicita todos os eventos do histórico
-        query_params = {'resultado': 'T'}
+        # Parâmetro 'resultado=T' solicita todos os eventos do histórico ('U', só o último)
+        query_params = {'resultado': resultado}
 
         try:
             headers = self.get_headers()
-            response = requests.get(
-                endpoint_url, headers=headers, params=query_params, timeout=15)
+            response = self._request(
+                'GET', 'sro', endpoint_url, headers=headers, params=query_params)
 
             if response.status_code == 200:
                 tracking_data = response.json()
@@ -266,10 +682,76 @@ class CorreiosService:
                 f"⚠️ Erro API Rastreio: Status {response.status_code} - {response.text}")
             return None
 
+        except CorreiosIndisponivelError:
+            raise
         except Exception as error:
             logger.error(f"❌ Erro conexão Rastreio: {error}")
             return None
 
+    def track_objects(self, tracking_codes, resultado='T'):
+        """
+        Consulta vários objetos de uma vez na API SRO (Rastreamento em lote).
+        Endpoint: /srorastro/v1/objetos?codigosObjetos=...&codigosObjetos=...
+
+        Os códigos são divididos em blocos de até SRO_BATCH_SIZE objetos por requisição,
+        reduzindo o número de chamadas HTTP em atualizações massivas.
+
+        Args:
+            tracking_codes: Lista de códigos de rastreio (ex: ['AA123456789BR', ...]).
+            resultado: 'T' (todos os eventos) ou 'U' (apenas o último), como em track_object.
+
+        Returns:
+            Um dicionário {codigo_sanitizado: dados_do_objeto}. Objetos não encontrados
+            ou blocos que falharam ficam com valor None.
+
+        Raises:
+            CorreiosIndisponivelError: Se a API estiver com o circuito aberto.
+        """
+        # Remove duplicados preservando a ordem de entrada
+        sanitized_codes = list(dict.fromkeys(
+            self.sanitize_tracking_code(code) for code in tracking_codes if code))
+
+        results = {code: None for code in sanitized_codes}
+        endpoint_url = f"{self.base_url}/srorastro/v1/objetos"
+
+        for start in range(0, len(sanitized_codes), self.SRO_BATCH_SIZE):
+            batch = sanitized_codes[start:start + self.SRO_BATCH_SIZE]
+
+            # O parâmetro 'codigosObjetos' é repetido uma vez para cada código
+            query_params = [('codigosObjetos', code) for code in batch]
+            query_params.append(('resultado', resultado))
+
+            try:
+                headers = self.get_headers()
+                response = self._request(
+                    'GET', 'sro', endpoint_url, headers=headers, params=query_params)
+
+                if response.status_code != 200:
+                    logger.error(
+                        f"⚠️ Erro API Rastreio (lote): Status {response.status_code} - {response.text}")
+                    continue
+
+                for object_info in response.json().get('objetos', []):
+                    code = str(object_info.get('codObjeto', '')).upper()
+                    if code not in results:
+                        continue
+
+                    # Mesma regra do track_object: mensagem indica erro lógico do objeto
+                    if 'mensagem' in object_info:
+                        logger.warning(
+                            f"⚠️ Aviso Correios ({code}): {object_info['mensagem']}")
+                        continue
+
+                    results[code] = object_info
+
+            except CorreiosIndisponivelError:
+                # Os blocos seguintes também seriam recusados
+                raise
+            except Exception as error:
+                logger.error(f"❌ Erro conexão Rastreio (lote): {error}")
+
+        return results
+
     # MÉTODO 3: Cotação de Preço e Prazo
     def calculate_prices(self, payload):
         """
@@ -281,8 +763,8 @@ class CorreiosService:
 
         try:
             headers = self.get_headers()
-            response = requests.post(
-                url, json=payload, headers=headers, timeout=10)
+            response = self._request(
+                'POST', 'preco', url, json=payload, headers=headers)
 
             if response.status_code == 200:
                 return response.json()
@@ -291,6 +773,8 @@ class CorreiosService:
                 f"Erro API Preço: {response.status_code} - {response.text}")
             return []
 
+        except CorreiosIndisponivelError:
+            raise
         except Exception as e:
             logger.error(f"Erro conexão Preço: {e}")
             return []
@@ -305,8 +789,8 @@ class CorreiosService:
 
         try:
             headers = self.get_headers()
-            response = requests.post(
-                url, json=payload, headers=headers, timeout=10)
+            response = self._request(
+                'POST', 'prazo', url, json=payload, headers=headers)
 
             if response.status_code == 200:
                 return response.json()
@@ -315,6 +799,8 @@ class CorreiosService:
                 f"Erro API Prazo: {response.status_code} - {response.text}")
             return []
 
+        except CorreiosIndisponivelError:
+            raise
         except Exception as e:
             logger.error(f"Erro conexão Prazo: {e}")
             return []
@@ -14,4 +14,9 @@ urlpatterns = [
     path('api/cotacao/<int:pk>/',
          views.api_calculate_shipping_view, name='api_cotacao'),
 
+    path('api/cotacao/lote/', views.api_batch_quote_view,
+         name='api_cotacao_lote'),
+
+    path('api/status/', views.api_correios_status_view, name='api_status'),
+
 ]
@@ -3,10 +3,34 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.utils import timezone
 from apps.samples.models import Processo
-from .logic import update_process_tracking
+from .logic import (
+    refresh_process_tracking, normalize_package_profile, get_cached_shipping_quote,
+    get_shipping_services, compare_shipping_quotes,
+)
+from .resilience import STATE_OPEN, CorreiosIndisponivelError, get_circuit_states
 from .services import CorreiosService
-from datetime import datetime
+
+
+def _unavailable_response(error):
+    """
+    Resposta padrão (503) para chamadas recusadas pelo circuit breaker dos Correios.
+
+    Args:
+        error: A CorreiosIndisponivelError lançada pelo serviço.
+
+    Returns:
+        JsonResponse com status 503 e cabeçalho Retry-After.
+    """
+    response = JsonResponse({
+        'status': 'error',
+        'message': str(error),
+        'indisponivel': True,
+        'retry_after': error.retry_after,
+    }, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
 
 
 @login_required
@@ -15,6 +39,9 @@ def api_tracking_update_view(request, pk):
     Endpoint de API para forçar a atualização de rastreio de um processo específico.
     Geralmente acionado via AJAX pelo botão 'Atualizar Rastreio' no frontend.
 
+    Consultas feitas há menos de CORREIOS_RASTREIO_INTERVALO_MINIMO segundos são
+    reaproveitadas ("verificado há N segundos") em vez de chamar a API novamente.
+
     Args:
         request: Objeto HttpRequest padrão do Django.
         pk: Chave primária (ID) do Processo a ser atualizado.
@@ -33,20 +60,46 @@ def api_tracking_update_view(request, pk):
         }, status=400)
 
     try:
-        # Executa a lógica de negócio centralizada
-        changes_detected = update_process_tracking(processo)
+        # Executa a lógica de negócio centralizada. Cliques repetidos e usuários
+        # simultâneos no mesmo processo compartilham uma única consulta à API.
+        refresh = refresh_process_tracking(processo)
+
+        if refresh['em_andamento']:
+            return JsonResponse({
+                'status': 'info',
+                'message': "Uma atualização deste rastreio já está em andamento. Tente novamente em instantes."
+            })
 
-        if changes_detected:
+        checked_at = refresh['consultado_em']
+        seconds_ago = max(0, int((timezone.now() - checked_at).total_seconds()))
+        response_data = {
+            'consultado_em': checked_at.isoformat(),
+            'verificado_ha': seconds_ago,
+            'reaproveitado': refresh['reaproveitado'],
+        }
+
+        if refresh['atualizado']:
             return JsonResponse({
                 'status': 'success',
-                'message': "Rastreamento atualizado! Novas movimentações encontradas."
+                'message': "Rastreamento atualizado! Novas movimentações encontradas.",
+                **response_data,
+            })
+        elif refresh['reaproveitado']:
+            return JsonResponse({
+                'status': 'info',
+                'message': f"Rastreio verificado há {seconds_ago} segundo(s). Nenhuma novidade nos Correios.",
+                **response_data,
             })
         else:
             return JsonResponse({
                 'status': 'info',
-                'message': "Consulta realizada. Nenhuma novidade nos Correios."
+                'message': "Consulta realizada. Nenhuma novidade nos Correios.",
+                **response_data,
             })
 
+    except CorreiosIndisponivelError as error:
+        return _unavailable_response(error)
+
     except Exception as error:
         # Captura erros genéricos para não quebrar o frontend, mas retorna status 500
         return JsonResponse({
@@ -94,6 +147,9 @@ def api_consult_zipcode_view(request):
         else:
             return JsonResponse({'status': 'error', 'message': 'CEP não encontrado.'}, status=404)
 
+    except CorreiosIndisponivelError as error:
+        return _unavailable_response(error)
+
     except Exception as error:
         return JsonResponse({'status': 'error', 'message': str(error)}, status=500)
 
@@ -102,6 +158,7 @@ def api_consult_zipcode_view(request):
 def api_calculate_shipping_view(request, pk):
     """
     Calcula frete chamando APIs distintas de Preço e Prazo e unificando a resposta.
+    Cotações da mesma rota e perfil de pacote são reaproveitadas até o fim do expediente.
     """
     try:
         processo = get_object_or_404(Processo, pk=pk)
@@ -128,94 +185,121 @@ def api_calculate_shipping_view(request, pk):
         if len(cep_destino) != 8:
             return JsonResponse({'status': 'error', 'message': "CEP destino inválido."}, status=400)
 
-        # 3. Definição dos Serviços
-        servicos_para_cotar = [
-            {'coProduto': '03220', 'nome': 'SEDEX'},
-            {'coProduto': '03298', 'nome': 'PAC'}
-        ]
-
-        data_atual = datetime.now().strftime('%d/%m/%Y')
-
-        # 4. Montagem dos Payloads (Separados conforme Manual)
-
-        # Payload PREÇO (Usa 'parametrosProduto')
-        lista_preco = []
-        # Payload PRAZO (Usa 'parametrosPrazo')
-        lista_prazo = []
-
-        for i, servico in enumerate(servicos_para_cotar):
-            # Item comum
-            base_item = {
-                "coProduto": servico['coProduto'],
-                "nuRequisicao": str(i + 1),
-                "cepOrigem": cep_origem,
-                "cepDestino": cep_destino,
-                "dtEvento": data_atual
-            }
-
-            # Item Específico de Preço (Dimensões, Peso, Valor)
-            item_preco = base_item.copy()
-            item_preco.update({
-                "psObjeto": ps_objeto,
-                "tpObjeto": formato,
-                "comprimento": comprimento,
-                "altura": altura,
-                "largura": largura,
-                "vlDeclarado": valor_declarado,
-            })
-            lista_preco.append(item_preco)
+        # 3. Normalização do pacote em faixas de peso/dimensão (chave do cache)
+        try:
+            perfil = normalize_package_profile(
+                ps_objeto, formato, comprimento, altura, largura, valor_declarado)
+        except (TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'message': "Peso, dimensões ou valor inválidos."}, status=400)
 
-            # Item Específico de Prazo (Só precisa dos CEPs e Código)
-            item_prazo = base_item.copy()
-            lista_prazo.append(item_prazo)
+        # 4. Cotação (reaproveita a do dia para a mesma rota e perfil de pacote)
+        opcoes_formatadas, dados_cache = get_cached_shipping_quote(
+            cep_origem, cep_destino, perfil)
 
-        payload_preco = {"idLote": "1", "parametrosProduto": lista_preco}
-        payload_prazo = {"idLote": "1", "parametrosPrazo": lista_prazo}
+        if not opcoes_formatadas:
+            return JsonResponse({'status': 'error', 'message': 'Serviços indisponíveis para este trecho.'})
 
-        # 5. Chamadas aos Serviços
-        service = CorreiosService()
+        return JsonResponse({
+            'status': 'success',
+            'data': opcoes_formatadas,
+            # Parcial: preço ou prazo não respondeu (ver campos *_indisponivel de cada opção)
+            'parcial': any(
+                opcao['preco_indisponivel'] or opcao['prazo_indisponivel']
+                for opcao in opcoes_formatadas
+            ),
+            # Indica se a cotação veio do cache e quando foi obtida na API
+            'cache': dados_cache is not None,
+            'cotado_em': dados_cache['cotado_em'] if dados_cache else None,
+        })
+
+    except CorreiosIndisponivelError as error:
+        return _unavailable_response(error)
 
-        # Chama API Preço
-        res_precos = service.calculate_prices(payload_preco)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-        # Chama API Prazo
-        res_prazos = service.calculate_deadlines(payload_prazo)
 
-        # 6. Unificação dos Resultados
-        opcoes_formatadas = []
+# Quantidade máxima de processos por cotação em lote
+BATCH_QUOTE_MAX_PROCESSES = 500
 
-        # Transforma listas em dicionários indexados pelo 'coProduto' para facilitar busca
-        # Ex: {'03220': {dados_sedex...}, '03298': {dados_pac...}}
-        mapa_precos = {
-            p.get('coProduto'): p for p in res_precos} if res_precos else {}
-        mapa_prazos = {
-            p.get('coProduto'): p for p in res_prazos} if res_prazos else {}
 
-        for servico in servicos_para_cotar:
-            cod = servico['coProduto']
+@login_required
+def api_batch_quote_view(request):
+    """
+    Cota o frete de vários processos de uma vez (ex: toda a expedição do dia).
 
-            dados_preco = mapa_precos.get(cod, {})
-            dados_prazo = mapa_prazos.get(cod, {})
+    Espera um JSON com 'processos' (lista de IDs), 'servicos' (opcional, lista de
+    códigos coProduto; padrão SEDEX e PAC) e o pacote ('peso', 'formato',
+    'comprimento', 'altura', 'largura' e 'valor_declarado' opcional), comum a todos.
 
-            # Checa erros individuais
-            erro_preco = dados_preco.get(
-                'msgErro', '') or dados_preco.get('erro', '')
-            # API Prazo as vezes retorna erro em campos diferentes, ajustar conforme teste real
+    Returns:
+        JsonResponse com 'data': uma linha por processo com as opções de cada serviço
+        e os destaques 'mais_barato' e 'mais_rapido' (ver compare_shipping_quotes).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': "Método não permitido."}, status=405)
 
-            if erro_preco:
-                continue  # Pula se deu erro no cálculo
+    try:
+        data = json.loads(request.body)
 
-            opcoes_formatadas.append({
-                'servico': servico['nome'],
-                'preco': dados_preco.get('pcFinal', '---'),
-                'prazo': str(dados_prazo.get('prazoEntrega', '-')),
-                'entrega_prevista': dados_prazo.get('dataMaxima', '')
-            })
+        # 1. Validação e Extração
+        try:
+            process_ids = [int(pk) for pk in data['processos']]
+            perfil = normalize_package_profile(
+                data['peso'], data['formato'], data['comprimento'],
+                data['altura'], data['largura'], data.get('valor_declarado', '0'))
+        except KeyError as e:
+            return JsonResponse({'status': 'error', 'message': f"Campo faltando: {str(e)}"}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'message': "Processos, peso, dimensões ou valor inválidos."}, status=400)
 
-        if not opcoes_formatadas:
-            return JsonResponse({'status': 'error', 'message': 'Serviços indisponíveis para este trecho.'})
+        if not process_ids:
+            return JsonResponse({'status': 'error', 'message': "Nenhum processo informado."}, status=400)
+        if len(process_ids) > BATCH_QUOTE_MAX_PROCESSES:
+            return JsonResponse({
+                'status': 'error',
+                'message': f"Informe no máximo {BATCH_QUOTE_MAX_PROCESSES} processos por cotação."
+            }, status=400)
+
+        # 2. Processos (na ordem informada) e serviços
+        processos_por_id = Processo.objects.select_related(
+            'cliente').in_bulk(process_ids)
+        processos = [processos_por_id[pk] for pk in dict.fromkeys(process_ids)
+                     if pk in processos_por_id]
+        servicos = get_shipping_services(data.get('servicos'))
+
+        # 3. Cotação em lote (destinos repetidos e já cotados no dia não vão à API)
+        try:
+            tabela = compare_shipping_quotes(processos, perfil, servicos)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-        return JsonResponse({'status': 'success', 'data': opcoes_formatadas})
+        return JsonResponse({
+            'status': 'success',
+            'servicos': [servico['nome'] for servico in servicos],
+            'data': tabela,
+            'nao_encontrados': [pk for pk in process_ids if pk not in processos_por_id],
+        })
+
+    except CorreiosIndisponivelError as error:
+        return _unavailable_response(error)
 
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+def api_correios_status_view(request):
+    """
+    Informa o estado dos circuitos da integração com os Correios.
+
+    Returns:
+        JsonResponse com 'disponivel' (nenhum circuito aberto) e 'circuitos', no
+        formato {familia: {'estado', 'falhas', 'reabre_em'}}.
+    """
+    circuit_states = get_circuit_states()
+    return JsonResponse({
+        'status': 'success',
+        'disponivel': all(state['estado'] != STATE_OPEN for state in circuit_states.values()),
+        'circuitos': circuit_states,
+    })
@@ -1,8 +1,8 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from apps.samples.models import Processo, EventoTimeline, Comentario
 
 
@@ -38,7 +38,7 @@ def dashboard_view(request):
 
         # 3. Qualidade: Ocorrências/Problemas reportados pela equipe
         ocorrencias = Comentario.objects.filter(
-            encaminhar_gestao=True).order_by('-data')
+            encaminhar_gestao=True).select_related('processo', 'autor').order_by('-data')
         context['kpi_ocorrencias'] = ocorrencias.count()
         context['lista_ocorrencias'] = ocorrencias[:10]  # Top 10 recentes
 
@@ -81,18 +81,27 @@ def dashboard_view(request):
         context['gestor_status_colors'] = colors
 
         # Gráfico 2: Evolução Semanal (Barras)
-        # Calcula a entrada de processos nos últimos 7 dias
-        hoje = timezone.now().date()
+        # Calcula a entrada de processos nos últimos 7 dias (no fuso local)
+        hoje = timezone.localdate()
         dias = []
-        qtds = []
+        inicios = []
 
-        for i in range(7, 0, -1):
+        for i in range(7, -1, -1):
             data_alvo = hoje - timedelta(days=i)
-            # Filtra pela data de criação (ignorando hora)
-            qtd = Processo.objects.filter(data_criacao__date=data_alvo).count()
-
+            inicios.append(timezone.make_aware(datetime.combine(data_alvo, time.min)))
             dias.append(data_alvo.strftime('%d/%m'))
-            qtds.append(qtd)
+        dias.pop()  # O último início marca apenas o fim do período (hoje, 00:00)
+
+        # Uma única consulta por intervalo de data_criacao (usa o índice da coluna),
+        # em vez de uma contagem com data_criacao__date (sem índice) por dia
+        contagens = Processo.objects.filter(
+            data_criacao__gte=inicios[0], data_criacao__lt=inicios[-1]
+        ).aggregate(**{
+            f'dia_{i}': Count('id', filter=Q(
+                data_criacao__gte=inicios[i], data_criacao__lt=inicios[i + 1]))
+            for i in range(7)
+        })
+        qtds = [contagens[f'dia_{i}'] for i in range(7)]
 
         context['gestor_weekly_labels'] = dias
         context['gestor_weekly_data'] = qtds
@@ -118,7 +127,7 @@ def dashboard_view(request):
         # Mostra atualizações (rastreio, status) feitas por OUTRAS pessoas/sistemas
         context['ultimas_atualizacoes'] = EventoTimeline.objects.filter(
             processo__in=meus_processos
-        ).exclude(
+        ).select_related('processo__cliente').exclude(
             autor=user  # Não mostra o que eu mesmo fiz
         ).order_by('-data')[:6]
 
@@ -147,6 +156,6 @@ def dashboard_view(request):
         meus_atribuidos = Processo.objects.filter(responsavel_separacao=user)
         context['ultimas_atividades'] = EventoTimeline.objects.filter(
             processo__in=meus_atribuidos
-        ).order_by('-data')[:6]
+        ).select_related('processo').order_by('-data')[:6]
 
     return render(request, 'dashboard/dashboard.html', context)
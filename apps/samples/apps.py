@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def _garantir_indice_busca(sender, using, **kwargs):
+    """Refaz o índice textual de processos no SQLite, se o migrate o descartou."""
+    from django.db import connections
+    from .search import criar_indice_busca
+
+    criar_indice_busca(connections[using])
 
 
 class SamplesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.samples'
+
+    def ready(self):
+        from .search import invalidar_versao_busca_clientes
+
+        post_migrate.connect(_garantir_indice_busca, sender=self)
+
+        # Cliente criado, alterado ou removido: a busca do autocomplete relê a versão
+        cliente = self.get_model('Cliente')
+        post_save.connect(invalidar_versao_busca_clientes, sender=cliente)
+        post_delete.connect(invalidar_versao_busca_clientes, sender=cliente)
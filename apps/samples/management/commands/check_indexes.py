@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.samples.models import Processo, EventoTimeline, FILTRO_RASTREIO_ATIVO
+
+
+class Command(BaseCommand):
+    """
+    Verifica, via EXPLAIN, se as consultas mais frequentes usam os seus índices.
+
+    Uso: python manage.py check_indexes [-v 2]
+
+    Cada consulta é montada como nas views e comandos que a executam, e o plano do
+    banco precisa citar o índice esperado. Com -v 2, o plano completo é impresso.
+
+    No PostgreSQL a verificação roda com 'enable_seqscan = off': com tabelas pequenas
+    o planejador prefere ler a tabela inteira, mas aqui interessa saber se o índice
+    PODE atender a consulta (ou seja, se filtro e índice são compatíveis).
+
+    Índices parciais são verificados apenas no PostgreSQL: o SQLite só os usa quando
+    a consulta traz os valores literais da condição, e o Django envia parâmetros.
+    """
+    help = 'Verifica com EXPLAIN se as consultas mais frequentes usam os índices esperados'
+
+    def _hot_queries(self):
+        """
+        Consultas verificadas.
+
+        Returns:
+            Lista de tuplas (descrição, queryset, nome do índice esperado, parcial).
+        """
+        agora = timezone.now()
+        # Valores de exemplo: o plano não depende deles
+        usuario_id = 1
+        processo_id = 1
+
+        return [
+            (
+                "Lista geral de processos (cursor por data_criacao, id)",
+                Processo.objects.order_by('-data_criacao', '-id')[:6],
+                'samples_proc_lista_idx', False,
+            ),
+            (
+                "Lista do Vendedor (criado_por + data_criacao)",
+                Processo.objects.filter(criado_por_id=usuario_id).order_by(
+                    '-data_criacao', '-id')[:6],
+                'samples_proc_vendedor_idx', False,
+            ),
+            (
+                "Processos atribuídos ao Separador (responsavel_separacao + status)",
+                Processo.objects.filter(responsavel_separacao_id=usuario_id).exclude(
+                    status__in=['entregue', 'cancelado']),
+                'samples_proc_separador_idx', False,
+            ),
+            (
+                "Fila de espera do Separador (responsável nulo + status)",
+                Processo.objects.filter(
+                    status='nao_atribuido', responsavel_separacao__isnull=True),
+                'samples_proc_separador_idx', False,
+            ),
+            (
+                "Gráfico semanal do dashboard (intervalo de data_criacao)",
+                Processo.objects.filter(
+                    data_criacao__gte=agora - timedelta(days=7), data_criacao__lt=agora),
+                'samples_proc_lista_idx', False,
+            ),
+            (
+                "update_tracking: envios ativos dos Correios vencidos (índice parcial)",
+                Processo.objects.filter(FILTRO_RASTREIO_ATIVO).filter(
+                    Q(proxima_consulta_rastreio__isnull=True) |
+                    Q(proxima_consulta_rastreio__lte=agora)
+                ).order_by('pk'),
+                'samples_proc_rastreio_idx', True,
+            ),
+            (
+                "Timeline do processo (processo + data)",
+                EventoTimeline.objects.filter(processo_id=processo_id).order_by('-data')[:6],
+                'samples_timeline_proc_idx', False,
+            ),
+        ]
+
+    def _explain(self, queryset):
+        """Retorna o plano de execução da consulta como texto."""
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def handle(self, *args, **options):
+        failures = 0
+        is_postgresql = connection.vendor == 'postgresql'
+
+        for description, queryset, index_name, partial in self._hot_queries():
+            if partial and not is_postgresql:
+                self.stdout.write(self.style.WARNING(
+                    f"PULADO {description}: índice parcial, verificado apenas no PostgreSQL"))
+                continue
+
+            plan = self._explain(queryset)
+            used = index_name in plan
+
+            if used:
+                self.stdout.write(self.style.SUCCESS(f"OK     {description} -> {index_name}"))
+            else:
+                failures += 1
+                self.stdout.write(self.style.ERROR(
+                    f"FALHA  {description}: o plano não usa {index_name}"))
+
+            if not used or options['verbosity'] >= 2:
+                for line in plan.splitlines():
+                    self.stdout.write(f"         {line}")
+
+        if failures:
+            raise CommandError(
+                f"{failures} consulta(s) sem o índice esperado. "
+                f"Verifique se as migrações foram aplicadas ('python manage.py migrate').")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"FIM. Consultas verificadas usam os índices esperados ({connection.vendor})."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0007_alter_tipoamostra_options_alter_tipoamostra_ordem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processo',
+            name='proxima_consulta_rastreio',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='processo',
+            name='ultima_consulta_rastreio',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:11
+
+import logging
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# Cópias congeladas (de apps.core.utils e apps.samples.search na época desta migração):
+# a migração não pode depender do código atual, que pode mudar depois
+GIN_INDEX = 'samples_processo_busca_gin'
+SEARCH_CONFIG = 'portuguese'
+FTS_TABLE = 'samples_processo_busca'
+
+FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        texto_busca, content='samples_processo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, texto_busca) VALUES (new.id, new.texto_busca);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto_busca)
+        VALUES ('delete', old.id, old.texto_busca);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF texto_busca ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto_busca)
+        VALUES ('delete', old.id, old.texto_busca);
+        INSERT INTO {FTS_TABLE}(rowid, texto_busca) VALUES (new.id, new.texto_busca);
+    END
+    """,
+]
+
+
+def normalizar_texto_busca(*partes):
+    """Sem acentos, minúsculo e apenas letras e números, com as partes separadas por espaço."""
+    texto = ' '.join(str(parte) for parte in partes if parte)
+    sem_acentos = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caractere)
+    )
+    return re.sub(r'[\W_]+', ' ', sem_acentos.lower()).strip()
+
+
+def preencher_texto_busca(apps, schema_editor):
+    """Monta o texto de busca dos processos já existentes."""
+    Processo = apps.get_model('samples', 'Processo')
+
+    lote = []
+    processos = Processo.objects.using(schema_editor.connection.alias).select_related(
+        'cliente').only(
+        'id', 'codigo', 'titulo', 'descricao', 'codigo_rastreio',
+        'codigo_pedido_iniflex', 'cliente__nome')
+    for processo in processos.iterator(chunk_size=500):
+        processo.texto_busca = normalizar_texto_busca(
+            processo.codigo, processo.titulo, processo.descricao,
+            processo.codigo_rastreio, processo.codigo_pedido_iniflex,
+            processo.cliente.nome)
+        lote.append(processo)
+        if len(lote) >= 500:
+            Processo.objects.bulk_update(lote, ['texto_busca'])
+            lote = []
+    if lote:
+        Processo.objects.bulk_update(lote, ['texto_busca'])
+
+
+def criar_indice(apps, schema_editor):
+    """GIN/tsvector no PostgreSQL; tabela FTS5 com triggers no SQLite."""
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        # Mesma expressão usada por apps.samples.search, para o índice ser aproveitado
+        schema_editor.add_index(apps.get_model('samples', 'Processo'), GinIndex(
+            SearchVector('texto_busca', config=SEARCH_CONFIG), name=GIN_INDEX))
+    elif connection.vendor == 'sqlite':
+        try:
+            for sql in FTS_SQL:
+                schema_editor.execute(sql, params=None)
+            schema_editor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')", params=None)
+        except Exception as e:
+            # SQLite compilado sem FTS5: a busca usa LIKE sobre texto_busca
+            logger.warning(f"⚠️ Índice FTS5 de processos indisponível: {e}")
+
+
+def remover_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{GIN_INDEX}"')
+    elif connection.vendor == 'sqlite':
+        for sufixo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{sufixo}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0008_processo_agenda_rastreio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processo',
+            name='texto_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(preencher_texto_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:14
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import Max
+
+# Cópias congeladas (de apps.core.utils e apps.samples.search na época desta migração):
+# a migração não pode depender do código atual, que pode mudar depois
+TRGM_INDEX = 'samples_cliente_trgm_gin'
+
+
+def normalizar_texto_busca(*partes):
+    """Sem acentos, minúsculo e apenas letras e números, com as partes separadas por espaço."""
+    texto = ' '.join(str(parte) for parte in partes if parte)
+    sem_acentos = ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caractere)
+    )
+    return re.sub(r'[\W_]+', ' ', sem_acentos.lower()).strip()
+
+
+def preencher_busca_clientes(apps, schema_editor):
+    """Monta o texto de busca e o último uso dos clientes já existentes."""
+    Cliente = apps.get_model('samples', 'Cliente')
+
+    lote = []
+    clientes = Cliente.objects.using(schema_editor.connection.alias).annotate(
+        ultimo_processo=Max('processos__data_criacao'))
+    for cliente in clientes.iterator(chunk_size=500):
+        cliente.texto_busca = normalizar_texto_busca(cliente.nome, cliente.responsavel)
+        cliente.ultimo_uso = cliente.ultimo_processo
+        lote.append(cliente)
+        if len(lote) >= 500:
+            Cliente.objects.bulk_update(lote, ['texto_busca', 'ultimo_uso'])
+            lote = []
+    if lote:
+        Cliente.objects.bulk_update(lote, ['texto_busca', 'ultimo_uso'])
+
+
+def criar_indice(apps, schema_editor):
+    """Extensão pg_trgm e índice GIN de trigramas, apenas no PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Import tardio: depende do driver do PostgreSQL
+    from django.contrib.postgres.indexes import GinIndex
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    schema_editor.add_index(apps.get_model('samples', 'Cliente'), GinIndex(
+        fields=['texto_busca'], opclasses=['gin_trgm_ops'], name=TRGM_INDEX))
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{TRGM_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0009_processo_texto_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='texto_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='ultimo_uso',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_busca_clientes, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
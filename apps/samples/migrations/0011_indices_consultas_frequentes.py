@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0010_cliente_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventotimeline',
+            index=models.Index(fields=['processo', '-data'], name='samples_timeline_proc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processo',
+            index=models.Index(fields=['-data_criacao', '-id'], name='samples_proc_lista_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processo',
+            index=models.Index(fields=['criado_por', '-data_criacao', '-id'], name='samples_proc_vendedor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processo',
+            index=models.Index(fields=['responsavel_separacao', 'status'], name='samples_proc_separador_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processo',
+            index=models.Index(condition=models.Q(('tipo_transporte', 'correios'), models.Q(('status__in', ['entregue', 'cancelado', 'nao_entregue']), _negated=True), ('codigo_rastreio__isnull', False), models.Q(('codigo_rastreio', ''), _negated=True)), fields=['proxima_consulta_rastreio'], name='samples_proc_rastreio_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Remove os índices simples das FKs que passaram a ser a primeira coluna de um
+    índice composto (0011). Separada da 0011 para que os índices novos já existam
+    quando os antigos forem removidos.
+    """
+
+    dependencies = [
+        ('samples', '0011_indices_consultas_frequentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventotimeline',
+            name='processo',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='samples.processo'),
+        ),
+        migrations.AlterField(
+            model_name='processo',
+            name='criado_por',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='processos_criados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='processo',
+            name='responsavel_separacao',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='processos_atribuidos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
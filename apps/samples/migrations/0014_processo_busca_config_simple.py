@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:02
+
+from django.db import migrations
+
+GIN_INDEX = 'samples_processo_busca_gin'
+
+
+def _recriar_indice(apps, schema_editor, config):
+    """Recria o índice GIN da busca de processos com a configuração informada (só PostgreSQL)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Import tardio: depende do driver do PostgreSQL
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{GIN_INDEX}"')
+    schema_editor.add_index(apps.get_model('samples', 'Processo'), GinIndex(
+        SearchVector('texto_busca', config=config), name=GIN_INDEX))
+
+
+def usar_config_simple(apps, schema_editor):
+    _recriar_indice(apps, schema_editor, 'simple')
+
+
+def usar_config_portuguese(apps, schema_editor):
+    _recriar_indice(apps, schema_editor, 'portuguese')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0013_cliente_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.RunPython(usar_config_simple, usar_config_portuguese),
+    ]
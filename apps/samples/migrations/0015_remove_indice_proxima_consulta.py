@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('samples', '0014_processo_busca_config_simple'),
+    ]
+
+    operations = [
+        # Já coberto pelo índice parcial samples_proc_rastreio_idx (envios ativos)
+        migrations.AlterField(
+            model_name='processo',
+            name='proxima_consulta_rastreio',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from apps.core.validators import validar_tamanho_arquivo, validar_extensao_segura
+from apps.core.utils import normalizar_texto_busca
+from .search import invalidar_versao_busca_clientes
 
 # ==============================================================================
 # 1. MODELOS AUXILIARES
@@ -45,6 +47,37 @@ class Cliente(models.Model):
     estado = models.CharField("UF", max_length=2)
     cep = models.CharField(max_length=10)
 
+    # --- BUSCA (AUTOCOMPLETE) ---
+    # Nome e responsável normalizados (sem acentos, minúsculo), mantidos pelo save()
+    texto_busca = models.TextField(blank=True, default='', editable=False)
+    # Data do último processo criado para o cliente: desempata o autocomplete
+    ultimo_uso = models.DateTimeField(null=True, blank=True, editable=False)
+    # Última alteração: junto com o total de clientes, forma a versão da busca
+    # (ver samples.search), compartilhada por todos os workers via banco
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        """
+        Atualiza o texto de busca do autocomplete de clientes.
+
+        Ao renomear o cliente, atualiza também o texto de busca dos seus processos
+        (o nome do cliente faz parte da busca de processos).
+        """
+        self.texto_busca = normalizar_texto_busca(self.nome, self.responsavel)
+
+        nome_anterior = None
+        if self.pk:
+            nome_anterior = Cliente.objects.filter(
+                pk=self.pk).values_list('nome', flat=True).first()
+
+        super().save(*args, **kwargs)
+
+        if nome_anterior is not None and nome_anterior != self.nome:
+            for processo in self.processos.only(*Processo.CAMPOS_BUSCA):
+                processo.cliente = self
+                Processo.objects.filter(pk=processo.pk).update(
+                    texto_busca=processo.montar_texto_busca())
+
     def __str__(self):
         return self.nome
 
@@ -53,6 +86,45 @@ class Cliente(models.Model):
 # 2. MODELO PRINCIPAL
 # ==============================================================================
 
+# Status em que o processo não muda mais (rastreio encerrado)
+STATUS_FINALIZADOS = ['entregue', 'cancelado', 'nao_entregue']
+
+# Envios dos Correios em andamento, com código de rastreio: processos consultados pelo
+# update_tracking. Usado também como condição do índice parcial 'samples_proc_rastreio_idx'
+# (a consulta precisa usar exatamente este filtro para o índice ser aproveitado).
+FILTRO_RASTREIO_ATIVO = (
+    models.Q(tipo_transporte='correios') &
+    ~models.Q(status__in=STATUS_FINALIZADOS) &
+    models.Q(codigo_rastreio__isnull=False) &
+    ~models.Q(codigo_rastreio='')
+)
+
+
+class ProcessoQuerySet(models.QuerySet):
+    """Consultas reutilizáveis de processos."""
+
+    def para_listagem(self):
+        """
+        Projeção usada pelas tabelas de processos (linha-tabela-processo.html).
+
+        Carrega apenas as colunas exibidas, junta cliente e responsável pela separação
+        na mesma consulta e busca os tipos de amostra de todas as linhas em uma única
+        consulta extra. Uma página custa sempre 2 consultas, independente do tamanho.
+        """
+        return self.select_related(
+            'cliente', 'responsavel_separacao'
+        ).prefetch_related(
+            models.Prefetch(
+                'tipos_amostra', queryset=TipoAmostra.objects.only('id', 'nome'))
+        ).only(
+            'id', 'codigo', 'titulo', 'prioridade', 'status', 'codigo_rastreio',
+            'data_criacao',
+            'cliente__nome', 'cliente__responsavel',
+            'responsavel_separacao__username', 'responsavel_separacao__first_name',
+            'responsavel_separacao__last_name', 'responsavel_separacao__foto',
+        )
+
+
 # REQUISITO: Script do Banco de Dados
 # A classe abaixo define a tabela, chaves primárias (id automático) e estrangeiras
 class Processo(models.Model):
@@ -124,10 +196,13 @@ class Processo(models.Model):
         related_name='processos'
     )
 
+    # As duas FKs abaixo não têm índice próprio: são a primeira coluna dos índices
+    # compostos 'samples_proc_vendedor_idx' e 'samples_proc_separador_idx' (ver Meta)
     criado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
-        related_name='processos_criados'
+        related_name='processos_criados',
+        db_index=False
     )
 
     responsavel_separacao = models.ForeignKey(
@@ -135,7 +210,8 @@ class Processo(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='processos_atribuidos'
+        related_name='processos_atribuidos',
+        db_index=False
     )
 
     # --- CONTROLE DE FLUXO ---
@@ -147,15 +223,73 @@ class Processo(models.Model):
 
     codigo_rastreio = models.CharField(max_length=50, blank=True, null=True)
 
+    # --- AGENDA DE CONSULTA DE RASTREIO (CORREIOS) ---
+    # Definidas automaticamente a cada consulta (ver apps.correios.logic).
+    # O comando update_tracking consulta apenas processos com a próxima consulta vencida.
+    ultima_consulta_rastreio = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    proxima_consulta_rastreio = models.DateTimeField(
+        null=True, blank=True, editable=False)
+
+    # --- BUSCA ---
+    # Texto normalizado (sem acentos, minúsculo) dos campos pesquisáveis, mantido pelo
+    # save(). Indexado por FTS5 (SQLite) ou GIN/tsvector (PostgreSQL): ver samples.search
+    texto_busca = models.TextField(blank=True, default='', editable=False)
+
     # --- DATAS DE AUDITORIA ---
     data_criacao = models.DateTimeField(auto_now_add=True)
     ultima_atualizacao = models.DateTimeField(auto_now=True)
 
+    objects = ProcessoQuerySet.as_manager()
+
+    class Meta:
+        # Índices dos caminhos de consulta mais usados (verificáveis com
+        # 'python manage.py check_indexes')
+        indexes = [
+            # Lista geral (paginação por cursor) e gráfico semanal do dashboard
+            models.Index(fields=['-data_criacao', '-id'],
+                         name='samples_proc_lista_idx'),
+            # Lista e KPIs do Vendedor
+            models.Index(fields=['criado_por', '-data_criacao', '-id'],
+                         name='samples_proc_vendedor_idx'),
+            # Processos atribuídos ao Separador e fila de espera (responsável nulo)
+            models.Index(fields=['responsavel_separacao', 'status'],
+                         name='samples_proc_separador_idx'),
+            # update_tracking: índice parcial apenas com os envios ativos dos Correios
+            # (processos de carga/balcão e finalizados ficam fora do índice)
+            models.Index(fields=['proxima_consulta_rastreio'],
+                         condition=FILTRO_RASTREIO_ATIVO,
+                         name='samples_proc_rastreio_idx'),
+        ]
+
+    # Campos que compõem o texto de busca (além do nome do cliente)
+    CAMPOS_BUSCA = (
+        'codigo', 'titulo', 'descricao', 'codigo_rastreio', 'codigo_pedido_iniflex',
+        'cliente_id',
+    )
+
+    def montar_texto_busca(self):
+        """Monta o texto de busca normalizado a partir dos campos pesquisáveis."""
+        return normalizar_texto_busca(
+            self.codigo, self.titulo, self.descricao, self.codigo_rastreio,
+            self.codigo_pedido_iniflex, self.cliente.nome if self.cliente_id else '',
+        )
+
     def save(self, *args, **kwargs):
         """
         Sobrescreve o método save para gerar o código sequencial único.
         Formato: PRC-{ANO}-{ID_SEQUENCIAL}
+
+        Também atualiza o texto de busca, exceto em instâncias carregadas sem os
+        campos pesquisáveis (ex: .only() no update_tracking), que não os alteram.
         """
+        if not self.get_deferred_fields().intersection(self.CAMPOS_BUSCA):
+            self.texto_busca = self.montar_texto_busca()
+
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and set(update_fields).intersection(self.CAMPOS_BUSCA):
+                kwargs['update_fields'] = set(update_fields) | {'texto_busca'}
+
         if not self.codigo:
             # 1. Salva inicialmente para obter o ID do banco de dados
             super().save(*args, **kwargs)
@@ -163,6 +297,13 @@ class Processo(models.Model):
             # 2. Gera o código formatado usando o ID recém-criado
             ano_atual = timezone.now().year
             self.codigo = f"PRC-{ano_atual}-{self.id:04d}"
+            self.texto_busca = self.montar_texto_busca()
+
+            # Cliente usado agora sobe no autocomplete (atualizado_em muda a versão da busca)
+            agora = timezone.now()
+            Cliente.objects.filter(pk=self.cliente_id).update(
+                ultimo_uso=agora, atualizado_em=agora)
+            invalidar_versao_busca_clientes()
 
             # 3. Salva novamente, forçando update para não duplicar registro
             kwargs['force_insert'] = False
@@ -249,8 +390,9 @@ class EventoTimeline(models.Model):
     Histórico imutável de ações (Log de auditoria visual).
     Registra mudanças de status, atribuições e edições críticas.
     """
+    # Sem índice próprio: coberta pelo índice composto 'samples_timeline_proc_idx'
     processo = models.ForeignKey(
-        Processo, on_delete=models.CASCADE, related_name='timeline')
+        Processo, on_delete=models.CASCADE, related_name='timeline', db_index=False)
     titulo = models.CharField(max_length=100)  # Ex: "Status Alterado"
     # Ex: "De Pendente para Entregue"
     descricao = models.TextField(blank=True, null=True)
@@ -261,5 +403,12 @@ class EventoTimeline(models.Model):
     # Ícone Bootstrap para renderização (Ex: 'bi-check-lg')
     icone = models.CharField(max_length=50, default='bi-circle')
 
+    class Meta:
+        indexes = [
+            # Timeline do processo e feeds do dashboard (eventos mais recentes)
+            models.Index(fields=['processo', '-data'],
+                         name='samples_timeline_proc_idx'),
+        ]
+
     def __str__(self):
         return f"{self.titulo} - {self.processo}"
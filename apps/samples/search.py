@@ -0,0 +1,478 @@
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import F, Max, Q
+from django.db.models.expressions import RawSQL
+
+from apps.core.utils import termos_busca
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# BUSCA TEXTUAL DE PROCESSOS
+# ==============================================================================
+# O campo Processo.texto_busca guarda, já sem acentos e em minúsculo, os campos
+# pesquisáveis (código, título, descrição, rastreio, pedido Iniflex e cliente).
+# Cada banco usa o seu índice textual sobre ele:
+# - PostgreSQL: índice GIN sobre to_tsvector('simple', texto_busca).
+# - SQLite: tabela virtual FTS5 mantida por triggers.
+# A configuração 'simple' não reduz as palavras ao radical nem descarta stopwords
+# ("de", "para"), casando os mesmos termos que o FTS5 do SQLite.
+# - Outros bancos (ou SQLite sem FTS5): LIKE sobre texto_busca, sem JOIN com cliente.
+
+FTS_TABLE = 'samples_processo_busca'
+GIN_INDEX = 'samples_processo_busca_gin'
+SEARCH_CONFIG = 'simple'
+
+# Tabelas FTS5 já verificadas, por alias de conexão
+_fts_disponivel = {}
+
+_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        texto_busca, content='samples_processo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, texto_busca) VALUES (new.id, new.texto_busca);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto_busca)
+        VALUES ('delete', old.id, old.texto_busca);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF texto_busca ON samples_processo BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto_busca)
+        VALUES ('delete', old.id, old.texto_busca);
+        INSERT INTO {FTS_TABLE}(rowid, texto_busca) VALUES (new.id, new.texto_busca);
+    END
+    """,
+]
+
+
+def criar_indice_busca(connection):
+    """
+    Cria (se ainda não existir) o índice textual de processos no SQLite.
+
+    Chamado pela migração e após cada 'migrate': no SQLite, alterações de coluna
+    recriam a tabela samples_processo e descartam os triggers, que são refeitos aqui
+    (com a reconstrução do índice a partir de texto_busca).
+
+    Args:
+        connection: Conexão do Django. Bancos que não sejam SQLite são ignorados
+            (no PostgreSQL o índice GIN é criado pela migração).
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        # Banco migrado para antes da criação de texto_busca: nada a indexar
+        colunas = connection.introspection.get_table_description(cursor, 'samples_processo')
+        if 'texto_busca' not in {coluna.name for coluna in colunas}:
+            return
+
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{FTS_TABLE}_%'])
+        if cursor.fetchone()[0] == 3:
+            return
+
+        try:
+            for sql in _FTS_SQL:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        except Exception as e:
+            # SQLite compilado sem FTS5: a busca usa LIKE sobre texto_busca
+            logger.warning(f"⚠️ Índice FTS5 de processos indisponível: {e}")
+            return
+
+    _fts_disponivel.pop(connection.alias, None)
+    logger.info("🔎 Índice FTS5 de processos criado/reconstruído.")
+
+
+def remover_indice_busca(connection):
+    """Remove o índice textual de processos do SQLite (reversão da migração)."""
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for sufixo in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{sufixo}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_disponivel.pop(connection.alias, None)
+
+
+def _sqlite_fts_disponivel(connection):
+    """Retorna True se a tabela FTS5 de processos existe nesta conexão."""
+    if connection.alias not in _fts_disponivel:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_disponivel[connection.alias] = cursor.fetchone() is not None
+    return _fts_disponivel[connection.alias]
+
+
+def buscar_processos(queryset, texto, ordenar_por_relevancia=False):
+    """
+    Filtra processos pelo texto digitado, usando o índice textual do banco.
+
+    Todos os termos precisam aparecer (E lógico) e cada termo casa por prefixo
+    ("amost" encontra "amostras"). Acentos e maiúsculas são ignorados.
+
+    Args:
+        queryset: Queryset de Processo a filtrar.
+        texto: Texto digitado pelo usuário.
+        ordenar_por_relevancia: Se True, anota 'relevancia' e ordena pelos
+            resultados mais relevantes (depois, mais recentes).
+
+    Returns:
+        Queryset filtrado (o original, se o texto não tiver termos pesquisáveis).
+    """
+    termos = termos_busca(texto)
+    if not termos:
+        return queryset
+
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        # Import tardio: depende do driver do PostgreSQL
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        # Os termos são apenas letras e números (normalizados), seguros no formato raw
+        consulta = SearchQuery(
+            ' & '.join(f'{termo}:*' for termo in termos),
+            search_type='raw', config=SEARCH_CONFIG)
+        vetor = SearchVector('texto_busca', config=SEARCH_CONFIG)
+
+        queryset = queryset.annotate(busca_vetor=vetor).filter(busca_vetor=consulta)
+        if ordenar_por_relevancia:
+            queryset = queryset.annotate(
+                relevancia=SearchRank(vetor, consulta)
+            ).order_by('-relevancia', '-data_criacao')
+        return queryset
+
+    if connection.vendor == 'sqlite' and _sqlite_fts_disponivel(connection):
+        consulta = ' '.join(f'"{termo}"*' for termo in termos)
+
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (consulta,)))
+        if ordenar_por_relevancia:
+            # bm25: menor é mais relevante; invertido para ordenar como no PostgreSQL
+            queryset = queryset.annotate(relevancia=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = samples_processo.id",
+                (consulta,))
+            ).order_by('-relevancia', '-data_criacao')
+        return queryset
+
+    # Fallback: sem índice textual, ao menos dispensa o JOIN e os vários OR
+    for termo in termos:
+        queryset = queryset.filter(texto_busca__contains=termo)
+    return queryset
+
+
+# ==============================================================================
+# AUTOCOMPLETE DE CLIENTES
+# ==============================================================================
+# Cliente.texto_busca guarda nome e responsável (A/C) normalizados. Cada termo
+# digitado precisa aparecer como início de palavra ("sao" casa com "sao paulo" e
+# "saoluis", não com "brasao"), a mesma regra nos dois bancos. O resultado é ordenado
+# pela similaridade de trigramas com o texto digitado e pelo uso mais recente
+# (Cliente.ultimo_uso):
+# - PostgreSQL: pg_trgm, com índice GIN (gin_trgm_ops) sobre texto_busca.
+# - Demais bancos: índice de trigramas em memória, atualizado quando a versão muda.
+# A versão vem do banco (total de clientes e maior Cliente.atualizado_em), para que
+# uma alteração feita em um worker seja vista por todos, qualquer que seja o cache.
+# Para não consultá-la a cada tecla, a versão lida fica alguns segundos em cache
+# (descartada na hora quando um cliente é alterado neste worker). As respostas ficam
+# em cache por versão.
+
+TRGM_INDEX = 'samples_cliente_trgm_gin'
+CLIENTES_RESULTADO_KEY = 'clientes_busca'
+CLIENTES_VERSAO_KEY = 'clientes_busca_versao'
+# Atraso máximo (segundos) para um worker ver a alteração de cliente feita em outro
+CLIENTES_VERSAO_TTL = 5
+CLIENTES_CACHE_TTL = 300
+CLIENTES_LIMITE = 10
+
+
+def _versao_busca_clientes():
+    """
+    Versão atual da busca de clientes, lida do banco no máximo a cada
+    CLIENTES_VERSAO_TTL segundos.
+
+    São duas consultas separadas de propósito: cada uma é atendida direto por um
+    índice, enquanto o COUNT e o MAX juntos obrigam a ler a tabela inteira.
+
+    Returns:
+        Tupla (total de clientes, maior atualizado_em ou None). Criar, alterar ou usar
+        um cliente muda o atualizado_em; remover muda o total.
+    """
+    versao = cache.get(CLIENTES_VERSAO_KEY)
+    if versao is not None:
+        return versao
+
+    from .models import Cliente
+
+    marca = Cliente.objects.aggregate(marca=Max('atualizado_em'))['marca']
+    versao = (Cliente.objects.count(), marca)
+    cache.set(CLIENTES_VERSAO_KEY, versao, timeout=CLIENTES_VERSAO_TTL)
+    return versao
+
+
+def invalidar_versao_busca_clientes(**kwargs):
+    """
+    Descarta a versão da busca de clientes em cache, para que a próxima busca a
+    leia do banco. Chamado ao salvar, usar ou remover um cliente (aceita os
+    argumentos dos sinais post_save/post_delete).
+    """
+    cache.delete(CLIENTES_VERSAO_KEY)
+
+
+def _chave_versao(versao):
+    """Representação da versão usada nas chaves do cache (sem espaços)."""
+    total, marca = versao
+    return f"{total}-{marca.timestamp() if marca else 0}"
+
+
+def _trigramas(texto):
+    """
+    Trigramas das palavras do texto, no mesmo formato do pg_trgm: cada palavra
+    recebe dois espaços no início e um no fim ('ab' -> '  a', ' ab', 'ab ').
+    """
+    trigramas = set()
+    for palavra in texto.split():
+        palavra = f'  {palavra} '
+        trigramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return trigramas
+
+
+def _trigramas_consulta(termo):
+    """
+    Trigramas exigidos de um termo digitado (possivelmente incompleto).
+
+    O termo é tratado como início de palavra, sem o espaço final: 'sao' exige
+    '  s', ' sa' e 'sao', casando com 'sao' e 'saopaulo'.
+    """
+    palavra = f'  {termo}'
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+def _similaridade(trigramas_a, trigramas_b):
+    """Similaridade de trigramas (tamanho da interseção / tamanho da união), como no pg_trgm."""
+    if not trigramas_a or not trigramas_b:
+        return 0.0
+    return len(trigramas_a & trigramas_b) / len(trigramas_a | trigramas_b)
+
+
+class IndiceClientes:
+    """
+    Índice invertido de trigramas dos clientes, mantido em memória (por processo).
+
+    Usado quando o banco não tem pg_trgm (SQLite no desenvolvimento). É carregado com
+    uma única consulta e, quando a versão da busca muda, atualizado apenas nos clientes
+    alterados (atualizado_em a partir da última marca vista, com uma margem para
+    transações que gravaram antes e terminaram depois). Se o total de clientes não
+    bater (remoções), é recarregado por completo.
+
+    Todo candidato contém os trigramas do texto digitado, então a similaridade
+    (interseção / união) depende apenas do número de trigramas do cliente: quanto
+    menor o texto do cliente, mais parecido com o termo. Esse número é calculado na
+    carga, o que deixa a ordenação barata mesmo com milhares de candidatos.
+    """
+
+    # Acima deste número de clientes alterados, recarregar tudo é mais barato
+    MAX_ALTERACOES_INCREMENTAIS = 500
+    # Margem (segundos) ao buscar os alterados desde a última marca
+    MARGEM_ALTERACOES = 60
+
+    def __init__(self):
+        self.versao = None
+        # {id: (texto_busca, número de trigramas, último uso como timestamp)}
+        self.clientes = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _registrar(clientes, postings, pk, texto, uso):
+        trigramas = _trigramas(texto)
+        clientes[pk] = (texto, len(trigramas), uso.timestamp() if uso else 0)
+        for trigrama in trigramas:
+            postings.setdefault(trigrama, set()).add(pk)
+
+    def _carregar(self, versao):
+        from .models import Cliente
+
+        clientes = {}
+        postings = {}
+        for pk, texto, uso in Cliente.objects.values_list(
+                'id', 'texto_busca', 'ultimo_uso').iterator(chunk_size=2000):
+            self._registrar(clientes, postings, pk, texto, uso)
+
+        self.clientes, self.postings = clientes, postings
+        self.versao = versao
+
+    def _atualizar(self, versao):
+        """
+        Leva o índice até a versão informada (total, marca), lida do banco.
+
+        Aplica apenas os clientes alterados desde a marca atual; recarrega tudo na
+        primeira carga, com muitas alterações ou se o total não bater (remoções).
+        """
+        from .models import Cliente
+
+        marca_atual = self.versao[1] if self.versao else None
+        if marca_atual is None:
+            return self._carregar(versao)
+
+        alterados = list(Cliente.objects.filter(
+            atualizado_em__gte=marca_atual - timedelta(seconds=self.MARGEM_ALTERACOES)
+        ).values_list('id', 'texto_busca', 'ultimo_uso')[:self.MAX_ALTERACOES_INCREMENTAIS + 1])
+        if len(alterados) > self.MAX_ALTERACOES_INCREMENTAIS:
+            return self._carregar(versao)
+
+        for pk, texto, uso in alterados:
+            texto_anterior = self.clientes.pop(pk, ('',))[0]
+            for trigrama in _trigramas(texto_anterior):
+                self.postings.get(trigrama, set()).discard(pk)
+            self._registrar(self.clientes, self.postings, pk, texto, uso)
+
+        if len(self.clientes) != versao[0]:
+            return self._carregar(versao)
+        self.versao = versao
+
+    def buscar(self, termos, versao, limite=CLIENTES_LIMITE):
+        """
+        Retorna os ids dos clientes que contêm todos os termos como início de palavra.
+
+        Ordem: mais termos digitados como palavra inteira, maior similaridade de
+        trigramas e uso mais recente.
+        """
+        with self._lock:
+            if self.versao != versao:
+                self._atualizar(versao)
+
+            # Intersecta a partir da lista mais curta (trigrama mais raro)
+            listas = sorted(
+                (self.postings.get(trigrama, set())
+                 for termo in termos for trigrama in _trigramas_consulta(termo)),
+                key=len)
+            if not listas or not listas[0]:
+                return []
+
+            candidatos = set(listas[0])
+            for ids in listas[1:]:
+                candidatos &= ids
+                if not candidatos:
+                    return []
+
+            # Os trigramas são necessários mas não suficientes: confirma os termos no texto
+            prefixos = [f' {termo}' for termo in termos]
+            palavras = [f' {termo} ' for termo in termos]
+            ranqueados = []
+            for pk in candidatos:
+                texto, total_trigramas, uso = self.clientes[pk]
+                texto = f' {texto} '
+                if all(prefixo in texto for prefixo in prefixos):
+                    inteiras = sum(1 for palavra in palavras if palavra in texto)
+                    ranqueados.append((-inteiras, total_trigramas, -uso, pk))
+
+        return [item[-1] for item in heapq.nsmallest(limite, ranqueados)]
+
+
+_indice_clientes = IndiceClientes()
+
+
+def _buscar_clientes_banco(termos, versao, limite):
+    """Busca os ids dos clientes no banco (pg_trgm) ou no índice em memória."""
+    from .models import Cliente
+
+    if connection.vendor != 'postgresql':
+        return _indice_clientes.buscar(termos, versao, limite)
+
+    # Import tardio: depende do driver do PostgreSQL
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    queryset = Cliente.objects.all()
+    for termo in termos:
+        # Termo como início de palavra (mesma regra do índice em memória). Os dois
+        # LIKE ('termo%' e '% termo%') são atendidos pelo índice GIN de trigramas
+        queryset = queryset.filter(
+            Q(texto_busca__startswith=termo) | Q(texto_busca__contains=f' {termo}'))
+
+    return list(queryset.annotate(
+        similaridade=TrigramWordSimilarity(' '.join(termos), 'texto_busca')
+    ).order_by(
+        '-similaridade', F('ultimo_uso').desc(nulls_last=True), 'id'
+    ).values_list('id', flat=True)[:limite])
+
+
+def buscar_clientes(texto, limite=CLIENTES_LIMITE):
+    """
+    Busca clientes por nome ou responsável para o autocomplete, sem diferenciar acentos.
+
+    As respostas ficam em cache por termo. Enquanto o usuário digita ("sa", "sao",
+    "sao p"...), um termo mais longo reaproveita o resultado de um prefixo já em cache
+    quando esse resultado estava completo (menos que 'limite' clientes): basta
+    filtrá-lo, sem consultar o banco.
+
+    Args:
+        texto: Texto digitado.
+        limite: Número máximo de clientes retornados.
+
+    Returns:
+        Lista de ids de Cliente, do mais relevante para o menos relevante.
+    """
+    termos = termos_busca(texto)
+    if not termos:
+        return []
+
+    versao = _versao_busca_clientes()
+    normalizado = ' '.join(termos)
+
+    def chave(consulta):
+        return (f"{CLIENTES_RESULTADO_KEY}:{_chave_versao(versao)}:{limite}:"
+                f"{consulta.replace(' ', '_')}")
+
+    # Termo atual e seus prefixos (do maior para o menor, até 2 caracteres)
+    consultas = [normalizado[:tamanho].strip()
+                 for tamanho in range(len(normalizado), 1, -1)]
+    consultas = list(dict.fromkeys(consulta for consulta in consultas if consulta))
+    em_cache = cache.get_many([chave(consulta) for consulta in consultas])
+
+    resultado = em_cache.get(chave(normalizado))
+    if resultado is not None:
+        return [pk for pk, _ in resultado]
+
+    for consulta in consultas[1:]:
+        anterior = em_cache.get(chave(consulta))
+        if anterior is not None and len(anterior) < limite:
+            prefixos = [f' {termo}' for termo in termos]
+            resultado = [(pk, texto_cliente) for pk, texto_cliente in anterior
+                         if all(prefixo in f' {texto_cliente}' for prefixo in prefixos)]
+            # Reordena pela similaridade com o termo completo (a ordem do prefixo é
+            # mantida entre os empates, preservando o critério de uso recente)
+            trigramas_busca = _trigramas(normalizado)
+            resultado.sort(key=lambda item: -_similaridade(
+                trigramas_busca, _trigramas(item[1])))
+            break
+
+    if resultado is None:
+        from .models import Cliente
+
+        ids = _buscar_clientes_banco(termos, versao, limite)
+        textos = dict(Cliente.objects.filter(pk__in=ids).values_list('id', 'texto_busca'))
+        resultado = [(pk, textos[pk]) for pk in ids if pk in textos]
+
+    cache.set(chave(normalizado), resultado, timeout=CLIENTES_CACHE_TTL)
+    return [pk for pk, _ in resultado]
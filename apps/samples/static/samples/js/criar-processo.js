@@ -21,13 +21,23 @@ document.addEventListener("DOMContentLoaded", function () {
   // 1. BUSCA DE CLIENTES (AUTOCOMPLETE)
   // =========================================================
   if (btnSearch) {
-    btnSearch.addEventListener("click", function () {
-      const term = document.getElementById("cliente-search").value;
+    const searchInput = document.getElementById("cliente-search");
+    let debounceTimer = null;
+    let buscaEmAndamento = null;
+
+    function buscarClientes() {
+      const term = searchInput.value.trim();
       const searchUrl = btnSearch.getAttribute("data-url"); // URL definida no HTML
 
       if (term.length < 2) return; // Evita buscas muito curtas
 
-      fetch(`${searchUrl}?term=${term}`)
+      // Cancela a busca anterior: apenas a resposta do último termo é exibida
+      if (buscaEmAndamento) buscaEmAndamento.abort();
+      buscaEmAndamento = new AbortController();
+
+      fetch(`${searchUrl}?term=${encodeURIComponent(term)}`, {
+        signal: buscaEmAndamento.signal,
+      })
         .then((res) => res.json())
         .then((data) => {
           const resultsDiv = document.getElementById("search-results");
@@ -63,7 +73,18 @@ document.addEventListener("DOMContentLoaded", function () {
 
             resultsDiv.appendChild(item);
           });
+        })
+        .catch((err) => {
+          if (err.name !== "AbortError") console.error("Erro na busca:", err);
         });
+    }
+
+    btnSearch.addEventListener("click", buscarClientes);
+
+    // Autocomplete: busca enquanto digita, aguardando uma pausa de 250ms
+    searchInput.addEventListener("input", function () {
+      clearTimeout(debounceTimer);
+      debounceTimer = setTimeout(buscarClientes, 250);
     });
   }
 
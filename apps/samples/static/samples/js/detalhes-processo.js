@@ -174,15 +174,23 @@ if (btnCotacao) {
             const row = document.createElement("tr");
 
             // Lógica de cor para o prazo (Destaque visual)
-            const prazoTexto =
+            let prazoTexto =
               servico.prazo === "1"
                 ? "1 dia útil"
                 : `${servico.prazo} dias úteis`;
 
+            // Resposta parcial: a API de prazo ou de preço não respondeu
+            if (servico.prazo_indisponivel) {
+              prazoTexto = '<span class="text-muted">Indisponível</span>';
+            }
+            const precoTexto = servico.preco_indisponivel
+              ? '<span class="text-muted fw-normal">Indisponível</span>'
+              : `R$ ${servico.preco}`;
+
             row.innerHTML = `
                 <td class="fw-bold text-start">${servico.servico}</td>
                 <td>${prazoTexto}</td>
-                <td class="text-success fw-bold">R$ ${servico.preco}</td>
+                <td class="text-success fw-bold">${precoTexto}</td>
                 <td class="small text-muted">${
                   servico.entrega_prevista || "-"
                 }</td>
@@ -190,6 +198,21 @@ if (btnCotacao) {
             tableBody.appendChild(row);
           });
 
+          // Aviso de cotação reaproveitada (cache do dia)
+          const avisoCache = document.getElementById("avisoCotacaoCache");
+          if (avisoCache) {
+            if (result.cache && result.cotado_em) {
+              const horario = new Date(result.cotado_em).toLocaleTimeString(
+                "pt-BR",
+                { hour: "2-digit", minute: "2-digit" }
+              );
+              avisoCache.textContent = `Cotação reaproveitada (consultada às ${horario}).`;
+              avisoCache.classList.remove("d-none");
+            } else {
+              avisoCache.classList.add("d-none");
+            }
+          }
+
           feedbackDiv.classList.remove("d-none");
         } else {
           alert("Erro na cotação: " + result.message);
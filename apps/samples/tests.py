@@ -1,3 +1,98 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from apps.accounts.models import UsuarioCustomizado
+from .models import Cliente, Processo, TipoAmostra
+
+
+# Sem o manifest do collectstatic nos testes; total sempre contado (sem cache)
+@override_settings(
+    LISTAGEM_CONTAGEM_CACHE_TTL=0,
+    STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+)
+class ListagemProcessosConsultasTests(TestCase):
+    """
+    Garante que a listagem de processos não volta a ter N+1: o número de consultas
+    de uma página é fixo para cada perfil, independente de quantos processos existem
+    e de quantos tipos de amostra cada um tem.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gestor = UsuarioCustomizado.objects.create_user(
+            username='gestor', password='senha', funcao='Gestor')
+        cls.vendedor = UsuarioCustomizado.objects.create_user(
+            username='vendedor', password='senha', funcao='Vendedor')
+        cls.separador = UsuarioCustomizado.objects.create_user(
+            username='separador', password='senha', funcao='Separador')
+
+        cls.cliente = Cliente.objects.create(
+            nome='Café São Paulo', responsavel='Ana', logradouro='Rua A', numero='1',
+            bairro='Centro', cidade='Vitória', estado='ES', cep='29000-000')
+        cls.tipos = [TipoAmostra.objects.create(nome=nome, ordem=ordem)
+                     for ordem, nome in enumerate(['Grãos', 'Solúvel', 'Torrado'])]
+
+        cls._criar_processos(6)
+
+    @classmethod
+    def _criar_processos(cls, quantidade):
+        """Cria processos visíveis para os três perfis, com vários tipos de amostra."""
+        for indice in range(quantidade):
+            for criado_por, responsavel in (
+                    (cls.vendedor, None),
+                    (cls.vendedor, cls.separador),
+                    (cls.gestor, cls.separador),
+                    (cls.vendedor, cls.gestor)):
+                processo = Processo.objects.create(
+                    titulo=f'Amostras {indice}', descricao='Envio de amostras',
+                    cliente=cls.cliente, criado_por=criado_por,
+                    responsavel_separacao=responsavel, tipo_transporte='correios',
+                    codigo_rastreio=f'AA{indice:09d}BR')
+                processo.tipos_amostra.set(cls.tipos)
+
+    def setUp(self):
+        cache.clear()
+
+    def _assert_consultas_da_listagem(self, usuario, consultas):
+        """Confere o número de consultas antes e depois de dobrar a quantidade de processos."""
+        self.client.force_login(usuario)
+        url = reverse('samples:lista_processos')
+
+        with self.assertNumQueries(consultas):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+        self._criar_processos(6)
+        with self.assertNumQueries(consultas):
+            self.client.get(url, {'cursor': response.context['page_obj'].next_cursor})
+
+    def test_listagem_vendedor(self):
+        # Sessão, usuário, página, tipos de amostra da página e total
+        self._assert_consultas_da_listagem(self.vendedor, 5)
+
+    def test_listagem_separador(self):
+        self._assert_consultas_da_listagem(self.separador, 5)
+
+    def test_listagem_gestor(self):
+        # Sessão e usuário, mais página, tipos e total de cada lista (Meus e Todos)
+        self._assert_consultas_da_listagem(self.gestor, 8)
+
+    def test_para_listagem_carrega_a_linha_em_duas_consultas(self):
+        with self.assertNumQueries(2):
+            processos = list(Processo.objects.order_by('-data_criacao').para_listagem()[:10])
+            for processo in processos:
+                # Campos usados por linha-tabela-processo.html
+                processo.codigo, processo.titulo, processo.get_status_display()
+                processo.get_prioridade_display(), processo.codigo_rastreio
+                processo.cliente.nome, processo.cliente.responsavel
+                if processo.responsavel_separacao:
+                    processo.responsavel_separacao.get_full_name()
+                [tipo.nome for tipo in processo.tipos_amostra.all()]
+
+        self.assertEqual(len(processos), 10)
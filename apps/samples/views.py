@@ -8,8 +8,11 @@ from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
 import json
 
+from apps.core.pagination import KeysetPaginator, get_cached_count
+
 from .models import Processo, Cliente, Anexo, EventoTimeline, Comentario
 from .forms import ProcessoForm, ClienteForm, AnexoForm
+from .search import buscar_processos, buscar_clientes
 
 # ==============================================================================
 # BLOCO 1: VIEWS DE PROCESSOS (CRUD E VISUALIZAÇÃO)
@@ -46,47 +49,45 @@ def process_list_view(request):
     prioridade_filter = request.GET.get('prioridade')
 
     if query_term:
-        base_qs = base_qs.filter(
-            Q(codigo__icontains=query_term) |
-            Q(titulo__icontains=query_term) |
-            Q(codigo_rastreio__icontains=query_term) |
-            Q(cliente__nome__icontains=query_term)
-        )
+        # Busca indexada (código, título, descrição, rastreio, pedido e cliente)
+        base_qs = buscar_processos(base_qs, query_term)
     if status_filter:
         base_qs = base_qs.filter(status=status_filter)
     if prioridade_filter:
         base_qs = base_qs.filter(prioridade=prioridade_filter)
 
-    # Ordenação padrão: Mais recentes primeiro
-    base_qs = base_qs.order_by('-data_criacao')
+    # Ordenação padrão: Mais recentes primeiro (a paginação por cursor desempata pelo id)
+    base_qs = base_qs.order_by('-data_criacao', '-id')
+
+    # Colunas e relacionamentos da tabela carregados de uma vez (sem N+1 por linha)
+    listagem_qs = base_qs.para_listagem()
 
     # --- 3. SEPARAÇÃO ESPECIAL PARA GESTOR ---
     # O Gestor vê uma lista separada ("Meus Processos") e "Todos os Processos"
     meus_processos_page_obj = None
+    total_count = 0
 
     if user.funcao == 'Gestor':
         # Filtra processos onde o gestor atua diretamente
-        meus_qs = base_qs.filter(
-            Q(criado_por=user) | Q(responsavel_separacao=user)
-        )
+        filtro_meus = Q(criado_por=user) | Q(responsavel_separacao=user)
+        meus_qs = listagem_qs.filter(filtro_meus)
         # Remove "Meus Processos" da lista geral para não duplicar visualmente
-        processos_qs = base_qs.exclude(id__in=meus_qs.values('id'))
+        processos_qs = listagem_qs.exclude(filtro_meus)
 
-        # Paginação exclusiva para "Meus Processos"
-        mp_paginator = Paginator(meus_qs, 5)
-        meus_processos_page_obj = mp_paginator.get_page(
-            request.GET.get('mp_page'))
+        # Paginação por cursor exclusiva para "Meus Processos"
+        meus_processos_page_obj = KeysetPaginator(meus_qs, 5).get_page(
+            request.GET.get('mp_cursor'))
+        total_count += get_cached_count(meus_qs)
     else:
-        processos_qs = base_qs
+        processos_qs = listagem_qs
 
     # --- 4. PAGINAÇÃO DA LISTA PRINCIPAL ---
-    paginator = Paginator(processos_qs, 5)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    # Por cursor (data_criacao, id): sem COUNT(*) nem OFFSET a cada página
+    page_obj = KeysetPaginator(processos_qs, 5).get_page(
+        request.GET.get('cursor'))
 
-    # Cálculo do total real para exibição
-    total_count = paginator.count
-    if meus_processos_page_obj:
-        total_count += meus_processos_page_obj.paginator.count
+    # Total aproximado para exibição (contagem em cache por alguns segundos)
+    total_count += get_cached_count(processos_qs)
 
     context = {
         'meus_processos': meus_processos_page_obj,
@@ -446,14 +447,17 @@ def search_clientes_api(request):
     """
     API de Autocomplete para busca de clientes.
     Retorna JSON compatível com o frontend (criar-processo.js).
+
+    A busca ignora acentos ("Sao Paulo" encontra "São Paulo") e ordena por
+    similaridade e uso recente (ver samples.search.buscar_clientes).
     """
     term = request.GET.get('term', '')
     if len(term) < 2:
         return JsonResponse({'results': []})
 
-    clientes = Cliente.objects.filter(
-        Q(nome__icontains=term) | Q(responsavel__icontains=term)
-    )[:10]
+    ids = buscar_clientes(term)
+    clientes_por_id = Cliente.objects.in_bulk(ids)
+    clientes = [clientes_por_id[pk] for pk in ids if pk in clientes_por_id]
 
     results = []
     for c in clientes:
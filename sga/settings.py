@@ -175,6 +175,24 @@ MESSAGE_TAGS = {
     messages.ERROR: 'danger',
 }
 
+# Cache (token dos Correios, circuitos e resultados de busca)
+# Padrão: memória local, isolada por processo. Com vários workers/dynos, use um
+# backend compartilhado, de preferência com incremento atômico (Redis/Memcached), ex:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e
+# CACHE_LOCATION=redis://127.0.0.1:6379/1.
+# O DatabaseCache (CACHE_LOCATION=sga_cache, requer 'createcachetable') também serve,
+# mas o incr dele não é atômico: nesse caso os contadores (limite de taxa e
+# autenticações por hora) ficam na tabela ContadorCorreios (ver correios.resilience).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='sga-cache'),
+    }
+}
+
+# Listagens: segundos em que o total de registros exibido fica em cache (0 = sempre contar)
+LISTAGEM_CONTAGEM_CACHE_TTL = config('LISTAGEM_CONTAGEM_CACHE_TTL', default=60, cast=int)
+
 # Correios
 CORREIOS_CREDENTIALS = {
     'usuario': config('CORREIOS_USER', default=''),
@@ -184,6 +202,90 @@ CORREIOS_CREDENTIALS = {
     'url_base': config('CORREIOS_URL_BASE', default='https://api.correios.com.br'),
 }
 
+# Conexões HTTP com a API dos Correios (pool keep-alive, timeouts e retentativas)
+CORREIOS_HTTP = {
+    'pool_maxsize': config('CORREIOS_HTTP_POOL_MAXSIZE', default=20, cast=int),
+    'max_retries': config('CORREIOS_HTTP_MAX_RETRIES', default=3, cast=int),
+    'backoff_factor': config('CORREIOS_HTTP_BACKOFF', default=0.5, cast=float),
+    'backoff_jitter': config('CORREIOS_HTTP_BACKOFF_JITTER', default=0.3, cast=float),
+    # Espera máxima (segundos) entre retentativas; 429 fica com o limitador de taxa
+    'backoff_max': config('CORREIOS_HTTP_BACKOFF_MAX', default=2, cast=float),
+    'connect_timeout': config('CORREIOS_TIMEOUT_CONEXAO', default=3.05, cast=float),
+    # Timeout de leitura (segundos) por família de endpoint
+    'timeouts': {
+        'token': config('CORREIOS_TIMEOUT_TOKEN', default=10, cast=float),
+        'cep': config('CORREIOS_TIMEOUT_CEP', default=5, cast=float),
+        'sro': config('CORREIOS_TIMEOUT_SRO', default=15, cast=float),
+        'preco': config('CORREIOS_TIMEOUT_PRECO', default=10, cast=float),
+        'prazo': config('CORREIOS_TIMEOUT_PRAZO', default=10, cast=float),
+    },
+}
+
+# Renova o token em uma thread de background quando ele entra na janela de
+# renovação (10 min antes do 'expiraEm'), sem bloquear a requisição atual
+CORREIOS_TOKEN_RENOVACAO_BACKGROUND = config(
+    'CORREIOS_TOKEN_RENOVACAO_BACKGROUND', default=False, cast=bool)
+
+# Circuit breaker por família de endpoint (token, cep, sro, preco, prazo): após
+# 'limite_falhas' falhas em 'janela' segundos, as chamadas falham na hora por
+# 'tempo_aberto' segundos, sem esperar o timeout HTTP
+CORREIOS_CIRCUIT_BREAKER = {
+    'limite_falhas': config('CORREIOS_CIRCUITO_LIMITE_FALHAS', default=5, cast=int),
+    'janela': config('CORREIOS_CIRCUITO_JANELA', default=60, cast=int),
+    'tempo_aberto': config('CORREIOS_CIRCUITO_TEMPO_ABERTO', default=30, cast=int),
+}
+
+# Limite de requisições por segundo à API, por família de endpoint (0 = sem limite).
+# Uma fração da cota fica reservada às chamadas interativas (telas); o comando
+# update_tracking usa apenas o restante e aguarda quando ele se esgota
+CORREIOS_RATE_LIMIT = {
+    'requisicoes_por_segundo': {
+        'token': config('CORREIOS_LIMITE_TOKEN', default=1, cast=int),
+        'cep': config('CORREIOS_LIMITE_CEP', default=10, cast=int),
+        'sro': config('CORREIOS_LIMITE_SRO', default=5, cast=int),
+        'preco': config('CORREIOS_LIMITE_PRECO', default=5, cast=int),
+        'prazo': config('CORREIOS_LIMITE_PRAZO', default=5, cast=int),
+    },
+    'reserva_interativa': config('CORREIOS_LIMITE_RESERVA_INTERATIVA', default=0.3, cast=float),
+    # Tempo máximo (segundos) de espera por uma vaga, por prioridade
+    'espera_interativa': config('CORREIOS_LIMITE_ESPERA_INTERATIVA', default=2, cast=float),
+    'espera_background': config('CORREIOS_LIMITE_ESPERA_BACKGROUND', default=60, cast=float),
+}
+
+# Intervalo mínimo (segundos) entre consultas de rastreio pelo botão "Atualizar Rastreio"
+CORREIOS_RASTREIO_INTERVALO_MINIMO = config(
+    'CORREIOS_RASTREIO_INTERVALO_MINIMO', default=60, cast=int)
+
+# Cache de consultas de CEP (TTLs em segundos)
+CORREIOS_CEP_CACHE = {
+    'lru_tamanho': config('CORREIOS_CEP_CACHE_LRU', default=2048, cast=int),
+    'ttl_memoria': config('CORREIOS_CEP_CACHE_TTL_MEMORIA', default=86400, cast=int),
+    'ttl': config('CORREIOS_CEP_CACHE_TTL', default=30 * 86400, cast=int),
+    'ttl_nao_encontrado': config('CORREIOS_CEP_CACHE_TTL_NAO_ENCONTRADO', default=3600, cast=int),
+}
+
+# Cache de cotações de frete: faixas de arredondamento do pacote (gramas / cm)
+# e horário em que as cotações do dia expiram
+CORREIOS_COTACAO_CACHE = {
+    'faixa_peso': config('CORREIOS_COTACAO_FAIXA_PESO', default=100, cast=int),
+    'faixa_dimensao': config('CORREIOS_COTACAO_FAIXA_DIMENSAO', default=5, cast=int),
+}
+CORREIOS_COTACAO_FIM_EXPEDIENTE = config(
+    'CORREIOS_COTACAO_FIM_EXPEDIENTE', default='18:00')
+
+# Tempo máximo (segundos) para as consultas de preço e prazo, feitas em paralelo
+CORREIOS_COTACAO_TIMEOUT = config(
+    'CORREIOS_COTACAO_TIMEOUT', default=12, cast=float)
+
+# Itens (destino x serviço) por requisição de cotação em lote às APIs de Preço e Prazo
+CORREIOS_COTACAO_LOTE_MAXIMO = config(
+    'CORREIOS_COTACAO_LOTE_MAXIMO', default=50, cast=int)
+
+# Requisições simultâneas de uma cotação em lote (as demais aguardam na fila),
+# para não esgotar de uma vez a cota do limitador de taxa (CORREIOS_RATE_LIMIT)
+CORREIOS_COTACAO_CONCORRENCIA = config(
+    'CORREIOS_COTACAO_CONCORRENCIA', default=4, cast=int)
+
 CEP_ORIGEM_EMPRESA = config('CEP_ORIGEM_EMPRESA', default='00000000')
 
 